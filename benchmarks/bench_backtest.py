@@ -0,0 +1,39 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.backtester import backtest_portfolio
+
+
+def synthetic_prices(n_days, n_tickers, seed=0):
+    rng = np.random.default_rng(seed)
+    log_rets = rng.normal(0.0003, 0.02, size=(n_days, n_tickers))
+    dates = pd.bdate_range("2000-01-03", periods=n_days)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    return pd.DataFrame(100 * np.exp(np.cumsum(log_rets, axis=0)), index=dates, columns=tickers)
+
+
+def time_backtest(prices, rebalance_freq, repeat=3):
+    w = np.ones(prices.shape[1]) / prices.shape[1]
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backtest_portfolio(prices, lambda *_: w, rebalance_freq=rebalance_freq)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    # Runtime should grow linearly in T (rows) and N (columns)
+    rows = []
+    for n_tickers in [50, 500]:
+        for n_days in [252, 1260, 2520, 5040]:
+            prices = synthetic_prices(n_days, n_tickers)
+            for freq in ["D", "ME"]:
+                seconds = time_backtest(prices, freq)
+                rows.append({"T": n_days, "N": n_tickers, "Freq": freq, "Seconds": round(seconds, 4)})
+                print(rows[-1])
+    print(pd.DataFrame(rows).pivot_table(index=["N", "T"], columns="Freq", values="Seconds"))
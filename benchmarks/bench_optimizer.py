@@ -0,0 +1,39 @@
+import sys
+import os
+import time
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.optimizer import MeanVarianceOptimizer, optimize_weights
+
+
+def synthetic_inputs(n_dates, n_assets, seed=0):
+    rng = np.random.default_rng(seed)
+    expected_returns = rng.normal(0.0005, 0.001, size=(n_dates, n_assets))
+    covariances = np.empty((n_dates, n_assets, n_assets))
+    for d in range(n_dates):
+        rets = rng.normal(0, 0.02, size=(60, n_assets))
+        covariances[d] = np.cov(rets, rowvar=False)
+    return expected_returns, covariances
+
+
+if __name__ == "__main__":
+    # Rebuilding the problem per date vs one parametrized, warm-started problem
+    for n_assets in [20, 50, 100]:
+        n_dates = 50
+        expected_returns, covariances = synthetic_inputs(n_dates, n_assets)
+        max_weight = 0.1
+
+        start = time.perf_counter()
+        for d in range(n_dates):
+            optimize_weights(expected_returns[d], covariances[d], max_weight=max_weight)
+        rebuild = time.perf_counter() - start
+
+        optimizer = MeanVarianceOptimizer(n_assets)
+        start = time.perf_counter()
+        optimizer.solve_batch(expected_returns, covariance_matrices=covariances, max_weight=max_weight)
+        reuse = time.perf_counter() - start
+
+        print({"N": n_assets, "Dates": n_dates, "Rebuild (s)": round(rebuild, 3),
+               "Reuse (s)": round(reuse, 3), "Speedup": round(rebuild / reuse, 1)})
+        print("  ", optimizer.summary())
@@ -0,0 +1,132 @@
+import sys
+import os
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import run_pipeline
+from src.instrumentation import Profiler, profiling
+from src.price_cache import csv_price_source
+
+# Run history is kept out of the source tree, next to the other generated outputs
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "..", "output", "benchmarks", "results.json")
+SECTORS = ["Information Technology", "Financials", "Health Care", "Energy", "Industrials", "Utilities"]
+
+
+def synthetic_universe(directory, n_tickers, n_days, seed=0):
+    """Write a fundamentals CSV and a wide price CSV; returns their paths and the date range."""
+    rng = np.random.default_rng(seed)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    fundamentals = pd.DataFrame({
+        "Ticker": tickers,
+        "ROE": rng.normal(0.15, 0.08, n_tickers),
+        "PE": rng.lognormal(3.0, 0.5, n_tickers),
+        "DE": rng.lognormal(-0.5, 0.7, n_tickers),
+        "Mcap": rng.lognormal(10.0, 1.5, n_tickers),
+        "FF": rng.uniform(0.3, 1.0, n_tickers),
+        "Sector": rng.choice(SECTORS, n_tickers),
+    })
+    dates = pd.bdate_range("2000-01-03", periods=n_days)
+    log_rets = rng.normal(0.0003, 0.02, size=(n_days, n_tickers))
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(log_rets, axis=0)), index=pd.Index(dates, name="Date"),
+                          columns=tickers)
+    fundamentals_path = os.path.join(directory, "fundamentals.csv")
+    prices_path = os.path.join(directory, "prices.csv")
+    fundamentals.to_csv(fundamentals_path, index=False)
+    prices.to_csv(prices_path)
+    return fundamentals_path, prices_path, dates[0], dates[-1] + pd.Timedelta(days=1)
+
+
+def run_once(fundamentals_path, prices_path, start, end, top_n, trace_memory=False):
+    # Stands in for the network, so reading the file is not part of the timed pipeline
+    fetch_fn = csv_price_source(prices_path)
+    # A fresh price cache per run, so the download stage always includes the cache fill
+    with tempfile.TemporaryDirectory() as cache_dir, profiling(Profiler(trace_memory=trace_memory)) as profiler:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with profiler.stage("total"):
+                run_pipeline(fundamentals_path, "Market Cap", start, end, max_weight=0.6, cache_dir=cache_dir,
+                             fetch_fn=fetch_fn, top_n=top_n)
+    return profiler.report()
+
+
+def bench(n_tickers, n_days, top_n, repeat=3):
+    """Best-of-`repeat` stage timings, plus peak memory from one separate traced run."""
+    with tempfile.TemporaryDirectory() as directory:
+        fundamentals_path, prices_path, start, end = synthetic_universe(directory, n_tickers, n_days)
+        reports = [run_once(fundamentals_path, prices_path, start, end, top_n) for _ in range(repeat)]
+        # Tracing slows allocation-heavy code down, so it is kept out of the timed runs
+        traced = run_once(fundamentals_path, prices_path, start, end, top_n, trace_memory=True)
+    return {
+        "N": n_tickers,
+        "T": n_days,
+        "top_n": top_n,
+        "timings": {name: min(r["timings"][name] for r in reports) for name in reports[0]["timings"]},
+        "counters": reports[0]["counters"],
+        "peak_memory_bytes": traced["peak_memory_bytes"],
+    }
+
+
+def version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(previous, current):
+    # Stage timing change against the last recorded run of the same size
+    for row in current["results"]:
+        match = next((r for r in previous["results"] if (r["N"], r["T"], r["top_n"]) == (row["N"], row["T"], row["top_n"])), None)
+        if match is None:
+            continue
+        for name, seconds in row["timings"].items():
+            before = match["timings"].get(name)
+            if before:
+                print(f"N={row['N']} T={row['T']} {name}: {before:.4f}s -> {seconds:.4f}s "
+                      f"({100 * (seconds / before - 1):+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every stage of the index pipeline on synthetic data.")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--days", type=int, nargs="+", default=[1260, 5040])
+    parser.add_argument("--top-n", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSON file the run is appended to")
+    args = parser.parse_args()
+
+    record = {
+        "version": version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": [],
+    }
+    for n_tickers in args.tickers:
+        for n_days in args.days:
+            row = bench(n_tickers, n_days, min(args.top_n, n_tickers), args.repeat)
+            record["results"].append(row)
+            print({"N": n_tickers, "T": n_days, **{k: round(v, 4) for k, v in row["timings"].items()},
+                   "Peak MB": round(max(row["peak_memory_bytes"].values()) / 2 ** 20, 1)})
+
+    history = []
+    if os.path.exists(args.output):
+        with open(args.output) as f:
+            history = json.load(f)
+    if history:
+        compare(history[-1], record)
+    history.append(record)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(history, f, indent=2)
@@ -1,19 +1,65 @@
 import sys
 import os
+import time
 import matplotlib.pyplot as plt
 import numpy as np
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import streamlit as st
 import pandas as pd
-from src.optimizer import optimize_weights
+from src.optimizer import optimize_weights, MeanVarianceOptimizer
+from src.covariance import LedoitWolfCovariance
+from src.alignment import align_prices
+from src.attribution import attribution_report
 from src.backtester import backtest_portfolio, calculate_performance,calculate_turnover, plot_returns
-from src.data_utils import compute_fundamental_scores, get_sector_matrix
+from src.data_utils import compute_fundamental_scores, get_sector_matrix, sector_map_from_frame
+from src.scoring_engine import score_stocks
+from src.cache import BackgroundRunner, file_hash, frame_hash, memoize, read_csv_cached
 
 st.set_page_config(layout="wide")
+
+
+@st.cache_resource
+def get_backtest_runner():
+    # One runner per server process, so jobs and their results survive reruns
+    return BackgroundRunner(max_workers=1, max_results=16)
+
+
+def run_backtest_job(prices_wide_selected, top_tickers, max_weight, sector_cap, benchmark_levels=None, exposures=None,
+                     sector_map=None, progress=None):
+    # Gaps, IPOs and delistings are masked per date rather than dropping dates or tickers
+    prices_wide_selected = align_prices(prices_wide_selected)
+    sector_matrix_selected = get_sector_matrix(top_tickers, sector_map)
+    covariance_estimator = LedoitWolfCovariance(len(top_tickers), window=63)
+    optimizer = MeanVarianceOptimizer(len(top_tickers), n_factors=covariance_estimator.window,
+                                      sector_matrix=sector_matrix_selected)
+
+    def weight_fn(scores, sector_matrix, covariance, valid):
+        # Factored Ledoit-Wolf covariance, rolled forward by the backtester. Securities that
+        # cannot be held on the date get a cap of 0, so the other caps hold on the rest.
+        factor, specific_variance = covariance.factor()
+        return optimizer.solve(scores, factor=factor, specific_variance=specific_variance,
+                               max_weight=np.where(valid, max_weight, 0.0), sector_cap=sector_cap)
+
+    skip_log = []
+    pf_returns, weights_dict = backtest_portfolio(prices_wide_selected, weight_fn=weight_fn, rebalance_freq='D',
+                                                  covariance_estimator=covariance_estimator, progress=progress,
+                                                  skip_log=skip_log, sector_map=sector_map)
+    return {
+        "returns": pf_returns,
+        "skipped": pd.DataFrame(skip_log, columns=["date", "kind", "reason"]),
+        "weights": weights_dict,
+        "metrics": calculate_performance(pf_returns),
+        "turnover": calculate_turnover(weights_dict),
+        # Computed with the run so the dashboard only renders it
+        "attribution": attribution_report(weights_dict, prices_wide_selected, rebalance_freq='D', sector_map=sector_map,
+                                          exposures=exposures, benchmark=benchmark_levels),
+    }
+
+
 st.title("Fundamental Index Strategy (with Constraints)")
 
-data_source = st.selectbox("Select Data Source", ["Use default CSV Data", "Use yfinance", "Use Financial Modeling Prep API", "Upload Custom CSV/Excel"])
+data_source = st.selectbox("Select Data Source", ["Use default CSV Data", "Use yfinance", "Use Financial Modeling Prep API", "Upload Custom CSV/Excel", "Use Price Panel"])
 weighing_strategy = st.selectbox("Select Weighting Strategy", ["Equal Weight", "Market Cap Weight", "Free Float Market Cap", "Score Based", "Mean-Variance Optimized"])
 
 prices = None  # initialize
@@ -21,23 +67,14 @@ fundamentals= None  # initialize
 index500 = None  # initialize
 if data_source == "Use default CSV Data":
     try:
-        # Load price data in wide format (Date + multiple ticker columns)
-        prices_wide = pd.read_csv("data/price_data.csv", parse_dates=["Date"])
-        # Convert from wide to long format: (Date, Ticker, Close)
-        prices = prices_wide.melt(id_vars=["Date"], var_name="Ticker", value_name="Close")
-        # Now prices looks like:
-        # Date        Ticker   Close
-        # 2024-07-01  AAPL     198.1
-        # 2024-07-01  MSFT     342.2
-        # ...
+        # Load price data in wide format (Date index + one column per ticker), cached on file content
+        prices = read_csv_cached("data/price_data.csv", parse_dates=["Date"], index_col="Date")
         # Get latest prices (most recent date)
-        latest_date = prices["Date"].max()
-        latest_prices = prices[prices["Date"] == latest_date]
+        latest_prices = prices.iloc[-1].rename("Latest_Price")
         # Load fundamentals
-        fundamentals = pd.read_csv("data/dummy_fundamentals.csv")
+        fundamentals = read_csv_cached("data/dummy_fundamentals.csv")
         # Merge on Ticker
-        combined_data = fundamentals.merge(latest_prices, on="Ticker")
-        combined_data.rename(columns={0: "Latest_Price"}, inplace=True)
+        combined_data = fundamentals.merge(latest_prices, left_on="Ticker", right_index=True)
         if weighing_strategy == "Equal Weight":
             combined_data["Weight"] = 1 / len(combined_data)
         elif weighing_strategy == "Score-Based":
@@ -64,9 +101,9 @@ elif data_source == "Upload Custom CSV/Excel":
 
         if uploaded_prices.name.endswith('.csv'):
 
-            prices = pd.read_csv(uploaded_prices, index_col=0, parse_dates=True)
-            fundamentals = pd.read_csv(uploaded_fundamentals, index_col=0)
-            index500 = pd.read_csv(uploaded_index500, index_col=0, parse_dates=True)
+            prices = read_csv_cached(uploaded_prices, index_col=0, parse_dates=True)
+            fundamentals = read_csv_cached(uploaded_fundamentals, index_col=0)
+            index500 = read_csv_cached(uploaded_index500, index_col=0, parse_dates=True)
             st.success("Custom data loaded successfully!")
             st.write("Price Data:")
             st.dataframe(prices.tail())
@@ -80,7 +117,8 @@ elif data_source == "Upload Custom CSV/Excel":
 
 elif data_source == "Use yfinance":
 
-    import yfinance as yf
+    from src.price_fetcher import download_price_data, yfinance_price_data
+    from src.price_cache import DEFAULT_CACHE_DIR
 
     tickers_input = st.text_input("Enter tickers separated by space (e.g., AAPL MSFT GOOGL)")
     start_date = st.date_input("Start Date")
@@ -88,20 +126,26 @@ elif data_source == "Use yfinance":
     if st.button("Fetch from yfinance"):
         tickers = tickers_input.upper().split()
 
-        data = yf.download(tickers, start=start_date, end=end_date)['Adj Close']
-        if 'Adj Close' in data.columns:
-            prices = data['Adj Close']
-        else:
-            # If only one ticker, data is single-level columns
-            prices = data
-            prices = data.dropna(axis=1)
+        failures = {}
+
+        def fetch_yfinance(batch, start, end):
+            batch_prices, batch_failures = yfinance_price_data(batch, start, end)
+            failures.update(batch_failures)
+            return batch_prices
+
+        # Served from the local cache; only missing date ranges hit yfinance
+        prices = download_price_data(tickers, start_date, end_date, cache_dir=DEFAULT_CACHE_DIR, fetch_fn=fetch_yfinance)
+        for ticker, error in failures.items():
+            st.warning(f"Data not available for {ticker}: {error}")
+        # Tickers with IPO or delisting gaps are kept; align_prices masks the dates they have no price
 
         st.write("Fetched Data:")
         st.dataframe(prices.tail())
 
 elif data_source == "Use Financial Modeling Prep API":
 
-    import requests
+    from src.price_fetcher import download_price_data, fmp_price_data
+    from src.price_cache import DEFAULT_CACHE_DIR
 
     api_key = st.text_input("Enter your FMP API Key", type="password")
     tickers_input = st.text_input("Enter tickers separated by comma (e.g., AAPL,MSFT,GOOGL)")
@@ -110,27 +154,39 @@ elif data_source == "Use Financial Modeling Prep API":
     end_date = st.date_input("End Date")
 
     if st.button("Fetch from FMP"):
-        tickers = tickers_input.upper().split(',')
-        dfs = []
-
-        for ticker in tickers:
-            url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}?from={start_date}&to={end_date}&apikey={api_key}"
-            r = requests.get(url)
-            data = r.json()
-            try:
-                hist = pd.DataFrame(data['historical'])
-                hist['date'] = pd.to_datetime(hist['date'])
-                hist.set_index('date', inplace=True)
-                close_prices = hist[['close']].rename(columns={'close': ticker})
-                dfs.append(close_prices)
-
-            except:
-                st.warning(f"Data not available for {ticker}")
-
-        if dfs:
-            prices = pd.concat(dfs, axis=1).sort_index()
+        tickers = [t.strip() for t in tickers_input.upper().split(',') if t.strip()]
+        failures = {}
+
+        def fetch_fmp(batch, start, end):
+            # Concurrent, rate-limited requests for whatever the cache is missing
+            batch_prices, batch_failures = fmp_price_data(batch, start, end, api_key)
+            failures.update(batch_failures)
+            return batch_prices
+
+        prices = download_price_data(tickers, start_date, end_date, cache_dir=DEFAULT_CACHE_DIR, fetch_fn=fetch_fmp)
+        for ticker, error in failures.items():
+            st.warning(f"Data not available for {ticker}: {error}")
+
+        if not prices.empty:
             st.write("Fetched Data:")
             st.dataframe(prices.tail())
+        else:
+            prices = None
+
+elif data_source == "Use Price Panel":
+
+    from src.price_panel import PricePanel, import_prices
+
+    panel_dir = st.text_input("Price panel directory", "data/price_panel")
+    source_file = st.text_input("Import from CSV/Excel (optional)")
+    if source_file and st.button("Import Prices"):
+        import_prices(source_file, panel_dir)
+    if os.path.exists(os.path.join(panel_dir, "meta.json")):
+        # Memory-mapped: only the slice the backtest selects is ever read
+        prices = PricePanel.open(panel_dir)
+        st.write(f"Price panel: {prices.shape[0]} dates x {prices.shape[1]} tickers")
+        st.dataframe(prices.slice(start=prices.dates[-5]).to_frame())
+
 else:
     st.warning("Please select a data source.")
 
@@ -139,76 +195,113 @@ max_weight = st.slider("Max weight per stock", 0.01, 0.3, 0.1, 0.01)
 sector_cap = st.slider("Max sector cap", 0.05, 0.5, 0.25, 0.05)
 
 if prices is not None:
-    prices = prices.dropna(axis=1)  # clean missing securities
-
-    # Pivot to wide format for backtesting
-    prices_wide = prices.pivot(index="Date", columns="Ticker", values="Close")
-    st.write(prices_wide.head())
-    st.write(prices_wide.info())
+    if isinstance(prices, pd.DataFrame):
+        # Prices stay in wide format (Date index, one column per ticker) for every source
+        # Securities with gaps are kept; the backtest masks the dates they cannot be held
+        prices_wide = prices
+        st.write(prices_wide.head())
+    else:
+        prices_wide = prices
 
-    tickers = prices['Ticker'].unique().tolist()
-    fundamentals= pd.read_csv("data/dummy_fundamentals.csv") 
+    tickers = prices_wide.columns.tolist() if isinstance(prices_wide, pd.DataFrame) else prices_wide.tickers
+    fundamentals_path = "data/dummy_fundamentals.csv"
+    fundamentals = read_csv_cached(fundamentals_path)
     fundamentals = fundamentals.set_index('Ticker')
     if not set(tickers).issubset(set(fundamentals.index)):
         st.error("Fundamentals data is missing for some tickers.")
-    
+        tickers = [t for t in tickers if t in fundamentals.index]
+
     if len(tickers) == 0:
         st.warning("No valid tickers found in the data.")
         st.stop()
 
-    if fundamentals is not None:
-        selected_fundamentals = fundamentals.loc[tickers].dropna()
-        scores_array = compute_fundamental_scores(selected_fundamentals)
-        # Wrap scores_array into a DataFrame
-        scores_df = pd.DataFrame({
-            "Ticker": selected_fundamentals.index,
-            "Score": scores_array
-        }).set_index("Ticker")
-    else:
-        scores_array = compute_fundamental_scores(pd.DataFrame({'Ticker': tickers}))
-        scores_df = pd.DataFrame({
-            "Ticker": tickers,
-            "Score": scores_array
-        }).set_index("Ticker")
+    # Scores only depend on the fundamentals file and the ticker set
+    scores_df = memoize(
+        ("scores", file_hash(fundamentals_path), tuple(tickers)),
+        lambda: score_stocks(fundamentals.loc[tickers].dropna().reset_index())[["Ticker", "Score"]].set_index("Ticker"),
+    )
 
     # Select top N tickers (for example, top 3 by score)
     top_n = 3
-    top_tickers = scores_df.sort_values(by="Score", ascending=False).index[:top_n].tolist()
+    top_tickers = scores_df.index[:top_n].tolist()
 
     # Filter prices_wide and scores to only top tickers
-    prices_wide_selected = prices_wide[top_tickers]
+    if isinstance(prices_wide, pd.DataFrame):
+        prices_wide_selected = prices_wide[top_tickers]
+        prices_key = frame_hash(prices_wide_selected)
+    else:
+        # Zero-copy view of the selected tickers
+        prices_wide_selected = prices_wide.slice(tickers=top_tickers)
+        prices_key = prices_wide_selected.cache_key
     scores_selected = scores_df.loc[top_tickers]
 
-    # Also, ensure sector_matrix is for top tickers
-    sector_matrix_selected = get_sector_matrix(top_tickers)
+    benchmark = benchmark_levels = None
+    if index500 is not None:
+        benchmark_levels = index500.iloc[:, 0].sort_index()
+        benchmark = benchmark_levels.pct_change().dropna()
 
-    def weight_fn(scores, sector_matrix):
-        # Ensure sector_matrix is symmetric
-        sector_matrix = 0.5 * (sector_matrix + sector_matrix.T)
-        # Make sector_matrix positive semidefinite
-        min_eig = np.min(np.linalg.eigvals(sector_matrix))
-        if min_eig < 0:
-            sector_matrix += np.eye(sector_matrix.shape[0]) * (-min_eig + 1e-8)
-        return optimize_weights(scores, sector_matrix, max_weight=max_weight)
+    # Factor exposures for the attribution report: fundamentals z-scored across the selection
+    factor_columns = [c for c in ("ROE", "PE", "DE") if c in fundamentals.columns]
+    exposures = fundamentals.loc[top_tickers, factor_columns].astype(float)
+    exposures = (exposures - exposures.mean()) / exposures.std(ddof=0).replace(0, 1)
+    # Sector caps and the sector attribution use the loaded fundamentals' own sectors
+    sector_map = sector_map_from_frame(fundamentals.loc[top_tickers].reset_index())
+
+    # Identical inputs map to the same key, so moving a slider back re-renders from the memoized run
+    runner = get_backtest_runner()
+    backtest_key = ("backtest", prices_key, tuple(top_tickers), max_weight, sector_cap, index500 is not None,
+                    tuple(sorted(sector_map.items())))
 
     if st.button("Run Backtest"):
-        with st.spinner("Running backtest..."):
-                pf_returns, weights_dict = backtest_portfolio(prices_wide_selected, weight_fn=weight_fn, rebalance_freq='D')
-                metrics = calculate_performance(pf_returns)
-                turnover = calculate_turnover(weights_dict)
-
-                index_values=backtest(prices,combined_data)
-                benchmark= uploaded_index500()
-                comparison_df=align_with_benchmark(index_values, benchmark)
-                
-                st.subheader("Backtest Performance Stats")
-                st.write(metrics)
-                st.metric("CAGR", f"{metrics['CAGR']*100:.2f}%")
-                st.metric("Volatility", f"{metrics['Volatility']*100:.2f}%")
-                st.metric("Sharpe Ratio", f"{metrics['Sharpe Ratio']:.2f}")
-                st.metric("Max Drawdown", f"{metrics['Max Drawdown']*100:.2f}%")
-                st.metric("Average Turnover", f"{turnover:.2f}")
-
-                st.write("**Cumulative Return Chart**")
-                fig = plot_returns(pf_returns, benchmark_returns=benchmark)
-                st.pyplot(fig)
\ No newline at end of file
+        runner.submit(backtest_key, run_backtest_job, prices_wide_selected, top_tickers, max_weight, sector_cap,
+                      benchmark_levels, exposures, sector_map)
+
+    job = runner.get(backtest_key)
+    if job is not None:
+        status = job.status
+        if status in ("running", "cancelling"):
+            st.progress(job.fraction, text=f"Running backtest... {job.done_steps}/{job.total_steps} rebalances")
+            if st.button("Cancel Backtest"):
+                job.cancel()
+            time.sleep(0.5)
+            st.rerun()
+        elif status == "cancelled":
+            st.warning("Backtest cancelled.")
+        elif status == "failed":
+            st.error(f"Backtest failed: {job.future.exception()}")
+        else:
+            result = job.result()
+            pf_returns = result["returns"]
+            metrics = result["metrics"]
+            turnover = result["turnover"]
+
+            st.subheader("Backtest Performance Stats")
+            st.write(metrics)
+            st.metric("CAGR", f"{metrics['CAGR']*100:.2f}%")
+            st.metric("Volatility", f"{metrics['Volatility']*100:.2f}%")
+            st.metric("Sharpe Ratio", f"{metrics['Sharpe Ratio']:.2f}")
+            st.metric("Max Drawdown", f"{metrics['Max Drawdown']*100:.2f}%")
+            st.metric("Average Turnover", f"{turnover:.2f}")
+            if not result["skipped"].empty:
+                st.write(f"**Skipped rebalances** ({len(result['skipped'])})")
+                st.dataframe(result["skipped"])
+
+            st.write("**Cumulative Return Chart**")
+            fig = plot_returns(pf_returns, benchmark_returns=benchmark)
+            st.pyplot(fig)
+            # pyplot keeps every figure alive until it is closed
+            plt.close(fig)
+
+            attribution = result["attribution"]
+            st.subheader("Risk and Return Attribution")
+            st.write("**Ex-ante volatility contribution by sector** (annualized)")
+            st.area_chart(attribution["sector_risk"])
+            st.write("**Risk contribution by security, latest rebalance**")
+            st.dataframe(attribution["security_risk"].dropna().tail(1).T.rename(columns=lambda d: "Contribution"))
+            if "exposures" in attribution:
+                st.write("**Factor exposures**")
+                st.line_chart(attribution["exposures"])
+            st.write("**Brinson attribution by sector** (sum over all holding periods)")
+            st.bar_chart(pd.DataFrame({term: attribution[term].sum()
+                                       for term in ("allocation", "selection", "interaction")}))
+            st.dataframe(attribution["risk"])
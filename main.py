@@ -1,11 +1,13 @@
 import numpy as np
-import pandas as pd
-from src.data_loader import load_data_from_csv
-from src.scoring_engine import score_stocks
+from src.screening import screen_universe
 from src.price_fetcher import download_price_data
-from src.optimizer import optimize_weights
+from src.analytics import compare_to_benchmark
+from src.alignment import align_prices, mask_weights
+from src.price_panel import as_price_frame
 from src.backtester import backtest_portfolio, calculate_performance
-from src.weighting_stratergies import equal_weight, market_cap_weight, ff_market_cap_weight
+from src.data_utils import sector_map_from_frame
+from src.weighting_stratergies import build_weights
+from src.instrumentation import profiling, stage
 
 
 def main(
@@ -14,44 +16,70 @@ def main(
     start_date="2023-01-01",
     end_date="2024-01-01",
     max_weight=0.6,
-    indxx_benchmark_path=None         # Optional Excel for TRI comparison
+    indxx_benchmark_path=None,        # Optional Excel for TRI comparison
+    cache_dir=None,                   # Price cache directory, see download_price_data
+    fetch_fn=None,                    # Price source, defaults to yfinance
+    profile=False,                    # Print per-stage timings and counters
+    profile_path=None,                # Also write them to this JSON file
+    top_n=50,                         # Number of top-scored stocks in the index
+    screening=None                    # Eligibility filters for screen_universe, e.g. {"min_mcap": 1e9}
 ):
-
-    # 1. Load fundamental data from CSV
-    df = load_data_from_csv(csv_path)
-
-    # 2. Score stocks (you can update logic inside score_stocks)
-    scored_df = score_stocks(df)
-    top_stocks = scored_df.head(50)  # Select top 50 after scoring
+    if not profile:
+        return run_pipeline(csv_path, weight_strategy, start_date, end_date, max_weight,
+                            indxx_benchmark_path, cache_dir, fetch_fn, top_n, screening)
+
+    with profiling() as profiler:
+        with stage("total"):
+            result = run_pipeline(csv_path, weight_strategy, start_date, end_date, max_weight,
+                                  indxx_benchmark_path, cache_dir, fetch_fn, top_n, screening)
+    report = profiler.report()
+    print("\n Profile:")
+    for name, seconds in report["timings"].items():
+        print(f"{name}: {seconds:.4f}s ({report['calls'][name]} calls)")
+    for name, value in report["counters"].items():
+        print(f"{name}: {value}")
+    if profile_path:
+        profiler.save(profile_path)
+    return result
+
+
+def run_pipeline(csv_path, weight_strategy, start_date, end_date, max_weight, indxx_benchmark_path=None,
+                 cache_dir=None, fetch_fn=None, top_n=50, screening=None):
+
+    # 1-2. Stream the fundamentals CSV through the eligibility filters and keep the top N by score
+    #      (factor definitions can be passed to screen_universe through `screening`)
+    with stage("screen_universe"):
+        top_stocks, exclusions = screen_universe(csv_path, top_n=top_n, **(screening or {}))
     print("\n Top Scored Stocks:\n", top_stocks[['Ticker', 'Score']])
+    if len(exclusions):
+        print(f"\n Excluded {len(exclusions)} securities:\n", exclusions["Reason"].value_counts())
 
     # 3. Get tickers and price data
     tickers = top_stocks['Ticker'].tolist()
-    price_df = download_price_data(tickers, start=start_date, end=end_date)
+    with stage("download_prices"):
+        price_df = download_price_data(tickers, start=start_date, end=end_date, cache_dir=cache_dir, fetch_fn=fetch_fn)
 
     # 4. Choose weights
-    n = len(top_stocks)
-    if weight_strategy == "Equal":
-        weights = equal_weight(n)
-
-    elif weight_strategy == "Market Cap":
-        weights = market_cap_weight(top_stocks["Mcap"].values)
-
-    elif weight_strategy == "FF Market Cap":
-        weights = ff_market_cap_weight(top_stocks["Mcap"].values, top_stocks["FF"].values)
-
-    else:
-        raise ValueError("Unknown weight strategy!")
+    with stage("weighting"):
+        weights = build_weights(top_stocks, weight_strategy, max_weight)
 
     print(f"\n Weights ({weight_strategy}):\n", np.round(weights, 4))
 
     # 5. Define the weight function (for dynamic rebalancing, if needed)
-    def weight_fn(scores, cov_matrix):
-        return weights  # Fixed weights in this version
+    def weight_fn(scores, cov_matrix, valid):
+        # Fixed weights in this version, over the stocks that can be held on the date
+        return mask_weights(weights, valid, max_weight)
 
     # 6. Backtest
-    portfolio_returns, weight_df = backtest_portfolio(price_df, weight_fn)
-    stats = calculate_performance(portfolio_returns)
+    with stage("backtest"):
+        # Missing prices are masked per date instead of dropping every date any stock lacks
+        # (tickers that failed to download are empty columns, never valid)
+        price_df = align_prices(as_price_frame(price_df).reindex(columns=tickers))
+        # Sectors of the screened fundamentals, for weight functions with sector constraints
+        portfolio_returns, weight_df = backtest_portfolio(price_df, weight_fn,
+                                                          sector_map=sector_map_from_frame(top_stocks))
+    with stage("performance"):
+        stats = calculate_performance(portfolio_returns)
 
     print("\n Portfolio Stats:")
 
@@ -60,15 +88,10 @@ def main(
 
     # 7. Compare against Indxx 500 benchmark
     if indxx_benchmark_path:
-        indxx_df = pd.read_excel(indxx_benchmark_path, parse_dates=["Date"])
-        indxx_df.set_index("Date", inplace=True)
-        merged = pd.merge(
-            portfolio_returns.rename("Custom_Index"),
-            indxx_df["Rebase Value"].rename("Indxx_500"),
-            left_index=True,
-            right_index=True,
-            how="inner"
-        )
+        relative, merged = compare_to_benchmark(portfolio_returns, indxx_benchmark_path)
+        print("\n Versus Indxx 500:")
+        for k in ("Tracking Error", "Information Ratio", "Beta", "Correlation"):
+            print(f"{k}: {relative[k].iloc[0]:.4f}")
         merged.plot(title="Custom Index vs Indxx 500", figsize=(10, 5))
 
     return top_stocks, weights, portfolio_returns
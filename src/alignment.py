@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+from src.price_panel import PricePanel, as_price_frame
+from src.weighting_stratergies import capped_weight
+
+
+class AlignedPrices:
+    """
+    A price panel on one date grid with validity masks instead of dropped rows or columns.
+
+        values   T x N prices with every gap filled (forward, and backward before the first
+                 price), so holdings can always be valued and nothing is NaN
+        valid    T x N bool, where a security may be bought: inside its listing window,
+                 observed or forward-filled within the limit, and not stale
+        listed   T x N bool, between the first and last price (or the given listing dates)
+        stale    T x N bool, price unchanged for `stale_after` rows or more
+
+    Both masks are built once; slicing by date or ticker keeps them in step with the prices.
+    """
+
+    def __init__(self, values, valid, listed, stale, index, columns):
+        self.values = values
+        self.valid = valid
+        self.listed = listed
+        self.stale = stale
+        self.index = pd.DatetimeIndex(index)
+        self.columns = pd.Index(columns)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def to_frame(self):
+        """Filled prices as a DataFrame over the same memory."""
+        return pd.DataFrame(self.values, index=self.index, columns=self.columns, copy=False)
+
+    def select(self, tickers=None, start=None, end=None):
+        """Subset by tickers and/or date range (inclusive); a date range alone is a view."""
+        rows = slice(*self.index.slice_indexer(start, end).indices(len(self.index))[:2])
+        cols = slice(None) if tickers is None else self.columns.get_indexer(tickers)
+        if tickers is not None and np.any(cols < 0):
+            raise KeyError(f"Tickers not in the panel: {list(np.asarray(tickers)[cols < 0])}")
+        arrays = [a[rows][:, cols] for a in (self.values, self.valid, self.listed, self.stale)]
+        return AlignedPrices(*arrays, self.index[rows], self.columns[cols])
+
+    def summary(self):
+        """One row per security: listing window and how many rows were filled, stale or unusable."""
+        first = np.where(self.listed.any(axis=0), self.listed.argmax(axis=0), -1)
+        last = np.where(self.listed.any(axis=0), len(self.index) - 1 - self.listed[::-1].argmax(axis=0), -1)
+        dates = self.index.append(pd.DatetimeIndex([pd.NaT]))
+        return pd.DataFrame({
+            "First Date": dates[first],
+            "Last Date": dates[last],
+            "Listed Rows": self.listed.sum(axis=0),
+            "Stale Rows": self.stale.sum(axis=0),
+            "Invalid Listed Rows": (self.listed & ~self.valid).sum(axis=0),
+        }, index=self.columns)
+
+
+def align_prices(prices, ffill_limit=5, stale_after=None, listings=None):
+    """
+    Build validity masks and a gap-free price matrix for a wide price panel with missing
+    values, IPOs and delistings, in a single pass and one copy of the prices.
+    Args:
+        prices (pd.DataFrame, PricePanel or dict): Wide prices with NaN where a security has
+            no price; a dict of ticker -> price Series is aligned on the union of their dates.
+        ffill_limit (int): Rows a missing price may be carried forward and still count as
+                           valid; longer gaps make the security unusable until it trades again.
+        stale_after (int): Rows with an unchanged price after which it is treated as stale
+                           (suspended or not updating); None disables the check.
+        listings (pd.DataFrame): Optional 'Listing Date' / 'Delisting Date' per ticker (index),
+                                 narrowing the windows inferred from the first and last prices.
+    Returns:
+        AlignedPrices
+    """
+    if isinstance(prices, dict):
+        prices = pd.concat(prices, axis=1).sort_index()
+    if isinstance(prices, PricePanel):
+        # Read in the panel's own dtype; the filled matrix keeps it
+        raw, index, columns = prices.to_numpy(), prices.index, pd.Index(prices.tickers)
+    else:
+        raw, index, columns = prices.to_numpy(dtype=float), prices.index, prices.columns
+    n_rows, n = raw.shape
+    observed = ~np.isnan(raw)
+    # Row numbers as int32 and in-place accumulations keep the temporaries at half the price matrix
+    t = np.arange(n_rows, dtype=np.int32)[:, None]
+
+    # Listing window: first to last observed price
+    has_price = observed.any(axis=0)
+    first = np.where(has_price, observed.argmax(axis=0), n_rows)
+    last = np.where(has_price, n_rows - 1 - observed[::-1].argmax(axis=0), -1)
+    listed = (t >= first) & (t <= last)
+    if listings is not None:
+        listings = listings.reindex(columns)
+        for column, after in (("Listing Date", True), ("Delisting Date", False)):
+            if column in listings:
+                bound = index.searchsorted(pd.to_datetime(listings[column]).to_numpy(), side='left')
+                known = listings[column].notna().to_numpy()
+                listed &= ~known | ((t >= bound) if after else (t < bound))
+
+    # Last observed row of every cell
+    last_obs = np.where(observed, t, np.int32(-1))
+    np.maximum.accumulate(last_obs, axis=0, out=last_obs)
+    valid = listed & (last_obs >= t - ffill_limit) & (last_obs >= 0)
+    # One gather fills every gap: forward from the last observation, backward before the first
+    np.copyto(last_obs, np.minimum(first, n_rows - 1).astype(np.int32), where=last_obs < 0)
+    values = np.take_along_axis(raw, last_obs, axis=0)
+    del last_obs
+    # Securities without any price get a flat placeholder; they are never valid
+    values[:, ~has_price] = 1.0
+
+    stale = np.zeros_like(valid)
+    if stale_after is not None:
+        changed = np.ones_like(valid)
+        # A listing starts a fresh run; the back-filled rows before it are not a price history
+        changed[1:] = (values[1:] != values[:-1]) | ~listed[:-1]
+        last_change = np.where(changed, t, np.int32(0))
+        np.maximum.accumulate(last_change, axis=0, out=last_change)
+        stale = listed & (last_change <= t - stale_after)
+        valid &= ~stale
+    return AlignedPrices(values, valid, listed, stale, index, columns)
+
+
+def price_matrix_and_mask(prices):
+    """
+    Frame, price matrix and validity mask for the backtesters. Aligned prices keep every
+    date and carry their mask. A PricePanel is used in place, in its own dtype (the frame
+    is a view of the memory map); one with missing prices is aligned with align_prices.
+    DataFrames keep the old behaviour of dropping dates where any security is missing
+    (mask None).
+    """
+    if isinstance(prices, PricePanel):
+        matrix = prices.to_numpy()
+        # A NaN anywhere in a row makes its sum NaN, without a T x N temporary
+        if np.isnan(matrix.sum(axis=1)).any():
+            prices = align_prices(prices)
+        else:
+            return pd.DataFrame(matrix, index=prices.index, columns=prices.tickers, copy=False), matrix, None
+    if isinstance(prices, AlignedPrices):
+        return prices.to_frame(), prices.values, prices.valid
+    prices = as_price_frame(prices).dropna()
+    return prices, prices.to_numpy(dtype=float), None
+
+
+def mask_weights(weights, valid_row, max_weight=None):
+    """
+    Restrict fixed target weights to the securities that can be held on a date: the
+    others are zeroed and the rest rescaled to the same total. With `max_weight`, the
+    cap is applied again over the valid names (excess redistributed pro rata), so the
+    result is what capped weighting of the valid names alone would give.
+    """
+    masked = np.where(valid_row, weights, 0.0)
+    total = masked.sum()
+    if total <= 0:
+        raise ValueError("No valid securities with positive weight on this date.")
+    masked *= np.sum(weights) / total
+    if max_weight is not None:
+        # Capped over the valid names only, so the cap is checked against their number
+        masked[valid_row] = capped_weight(masked[valid_row], max_weight)
+    return masked
+
+
+def masked_returns(price_matrix, valid=None):
+    """
+    Daily returns for covariance and risk estimates. A security that is not valid at
+    both ends of a return row (before listing, after delisting, in a long gap or stale)
+    gets the mean return of the valid ones that day instead of the flat return of its
+    filled prices, so it never looks riskless.
+    Returns:
+        np.ndarray: (T - 1) x N returns, in the dtype of the prices.
+    """
+    returns = price_matrix[1:] / price_matrix[:-1] - 1
+    if valid is None:
+        return returns
+    usable = valid[1:] & valid[:-1]
+    count = usable.sum(axis=1)
+    mean = np.divide(np.where(usable, returns, 0).sum(axis=1), count, out=np.zeros(len(returns)), where=count > 0)
+    np.copyto(returns, mean[:, None].astype(returns.dtype), where=~usable)
+    return returns
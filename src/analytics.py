@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def _as_matrix(returns):
+    # Strategies x dates matrix from a dates x strategies DataFrame (or a single Series)
+    if isinstance(returns, pd.Series):
+        returns = returns.to_frame(returns.name or "Portfolio")
+    return np.ascontiguousarray(returns.to_numpy(dtype=float).T), list(returns.columns), returns.index
+
+
+def _benchmark_row(benchmark, dates):
+    # 1 x T benchmark returns aligned to the strategy dates, NaN where it has no value
+    return benchmark.reindex(dates).to_numpy(dtype=float)[None, :]
+
+
+def _window_sum(x, window):
+    # Sums over every trailing window from one cumulative sum: O(T) for any window length
+    c = np.cumsum(x, axis=-1)
+    out = c[..., window - 1:].copy()
+    out[..., 1:] -= c[..., :-window]
+    return out
+
+
+def _drawdowns(growth):
+    # Drawdown from the running peak, and how many periods each point has been under water
+    drawdown = growth / np.maximum.accumulate(growth, axis=-1) - 1
+    t = np.arange(growth.shape[-1])
+    last_peak = np.maximum.accumulate(np.where(drawdown >= 0, t, 0), axis=-1)
+    return drawdown, t - last_peak
+
+
+def _rolling_max_drawdown(r, window, max_elements=1 << 22):
+    log_growth = np.cumsum(np.log1p(r), axis=1)
+    # Growth inside each window, starting from the close before the window
+    start = np.concatenate([np.zeros((len(r), 1)), log_growth[:, :-window]], axis=1)
+    views = np.lib.stride_tricks.sliding_window_view(log_growth, window, axis=1)
+    out = np.empty(start.shape)
+    # Bound the materialized strategies x windows x window block
+    step = max(1, max_elements // (len(r) * window))
+    for lo in range(0, start.shape[1], step):
+        paths = views[:, lo:lo + step] - start[:, lo:lo + step, None]
+        peaks = np.maximum(np.maximum.accumulate(paths, axis=-1), 0)
+        out[:, lo:lo + step] = np.expm1((paths - peaks).min(axis=-1))
+    return out
+
+
+def return_stats(returns, periods_per_year=TRADING_DAYS):
+    """
+    CAGR, volatility, Sharpe ratio and max drawdown over the last axis of a return array,
+    so one call covers every strategy, sweep configuration or simulated path.
+    Args:
+        returns (np.ndarray): (..., T) periodic returns.
+        periods_per_year (int): Periods per year used to annualize.
+    Returns:
+        dict: Statistic name -> (...) array.
+    """
+    r = np.asarray(returns, dtype=float)
+    growth = np.cumprod(1 + r, axis=-1)
+    cagr = growth[..., -1] ** (periods_per_year / r.shape[-1]) - 1
+    volatility = r.std(axis=-1) * np.sqrt(periods_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, cagr / volatility, np.nan)
+    return {
+        "CAGR": cagr,
+        "Volatility": volatility,
+        # Same definition as calculate_performance: CAGR over annualized volatility
+        "Sharpe Ratio": sharpe,
+        "Max Drawdown": (growth / np.maximum.accumulate(growth, axis=-1) - 1).min(axis=-1),
+    }
+
+
+def tracking_error(active_returns, periods_per_year=TRADING_DAYS):
+    """Annualized standard deviation of active returns over the last axis, ignoring NaN."""
+    active = np.asarray(active_returns, dtype=float)
+    valid = ~np.isnan(active)
+    count = valid.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(valid, active, 0.0).sum(axis=-1) / count
+        centered = np.where(valid, active - mean[..., None], 0.0)
+        return np.sqrt((centered ** 2).sum(axis=-1) / count * periods_per_year)
+
+
+def performance_stats(returns, benchmark=None, periods_per_year=TRADING_DAYS):
+    """
+    Performance statistics for many strategies in one vectorized pass.
+    Args:
+        returns (pd.DataFrame): Periodic returns, dates x strategies (a Series is one strategy).
+        benchmark (pd.Series): Benchmark returns; relative statistics use the dates where it has a value.
+        periods_per_year (int): Periods per year used to annualize.
+    Returns:
+        pd.DataFrame: One row per strategy with CAGR, Volatility, Sharpe Ratio, Sortino Ratio,
+                      Max Drawdown and Max Drawdown Duration (periods), plus Tracking Error,
+                      Information Ratio, Beta and Correlation when a benchmark is given.
+    """
+    r, names, dates = _as_matrix(returns)
+    core = return_stats(r, periods_per_year)
+    downside = np.sqrt(np.mean(np.minimum(r, 0) ** 2, axis=1)) * np.sqrt(periods_per_year)
+    _, underwater = _drawdowns(np.cumprod(1 + r, axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = {
+            "CAGR": core["CAGR"],
+            "Volatility": core["Volatility"],
+            "Sharpe Ratio": core["Sharpe Ratio"],
+            "Sortino Ratio": np.where(downside > 0, core["CAGR"] / downside, np.nan),
+            "Max Drawdown": core["Max Drawdown"],
+            "Max Drawdown Duration": underwater.max(axis=1),
+        }
+        if benchmark is not None:
+            b = _benchmark_row(benchmark, dates)
+            valid = ~np.isnan(b) & ~np.isnan(r)
+            count = valid.sum(axis=1)
+            active = np.where(valid, r - b, 0.0)
+            active_mean = active.sum(axis=1) / count
+            tracking_error = np.sqrt((active ** 2).sum(axis=1) / count - active_mean ** 2) * np.sqrt(periods_per_year)
+            rc = np.where(valid, r - (np.where(valid, r, 0).sum(axis=1) / count)[:, None], 0.0)
+            bc = np.where(valid, b - (np.where(valid, b, 0).sum(axis=1) / count)[:, None], 0.0)
+            cov = (rc * bc).sum(axis=1)
+            var_r, var_b = (rc ** 2).sum(axis=1), (bc ** 2).sum(axis=1)
+            stats.update({
+                "Tracking Error": tracking_error,
+                "Information Ratio": active_mean * periods_per_year / tracking_error,
+                "Beta": cov / var_b,
+                "Correlation": cov / np.sqrt(var_r * var_b),
+            })
+    return pd.DataFrame(stats, index=pd.Index(names, name="Strategy"))
+
+
+def rolling_stats(returns, window, benchmark=None, periods_per_year=TRADING_DAYS):
+    """
+    Trailing-window versions of performance_stats. Every moment-based statistic comes
+    from windowed sums of cumulative sums, so the cost is O(T) whatever the window.
+    Max drawdown depends on the path inside each window and is computed on a sliding
+    view (O(T * window), still vectorized across strategies).
+    Args:
+        returns (pd.DataFrame): Periodic returns, dates x strategies.
+        window (int): Window length in periods.
+        benchmark (pd.Series): Benchmark returns for the relative statistics (needs no gaps).
+        periods_per_year (int): Periods per year used to annualize.
+    Returns:
+        dict: Statistic name -> DataFrame (window end dates x strategies).
+    """
+    r, names, dates = _as_matrix(returns)
+    if not 1 < window <= r.shape[1]:
+        raise ValueError(f"Window must be between 2 and the number of periods ({r.shape[1]}).")
+    # Variances are shift invariant; centering first keeps the cumulative sums well conditioned
+    rc = r - r.mean(axis=1, keepdims=True)
+    mean = _window_sum(rc, window) / window
+    variance = np.maximum(_window_sum(rc ** 2, window) / window - mean ** 2, 0)
+    volatility = np.sqrt(variance * periods_per_year)
+    cagr = np.exp(_window_sum(np.log1p(r), window) * periods_per_year / window) - 1
+    downside = np.sqrt(_window_sum(np.minimum(r, 0) ** 2, window) / window * periods_per_year)
+    max_drawdown = _rolling_max_drawdown(r, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = {
+            "CAGR": cagr,
+            "Volatility": volatility,
+            "Sharpe Ratio": cagr / volatility,
+            "Sortino Ratio": cagr / downside,
+            "Max Drawdown": max_drawdown,
+        }
+        if benchmark is not None:
+            b = _benchmark_row(benchmark, dates)
+            if np.isnan(b).any():
+                raise ValueError("Benchmark returns must cover every date for rolling statistics.")
+            bc = b - b.mean()
+            active = rc - bc
+            active_mean = _window_sum(active, window) / window
+            tracking_variance = np.maximum(_window_sum(active ** 2, window) / window - active_mean ** 2, 0)
+            tracking_error = np.sqrt(tracking_variance * periods_per_year)
+            b_mean = _window_sum(bc, window) / window
+            cov = _window_sum(rc * bc, window) / window - mean * b_mean
+            var_b = _window_sum(bc ** 2, window) / window - b_mean ** 2
+            # Undo the centering for the mean active return
+            raw_active_mean = active_mean + (r.mean(axis=1, keepdims=True) - b.mean())
+            stats.update({
+                "Tracking Error": tracking_error,
+                "Information Ratio": raw_active_mean * periods_per_year / tracking_error,
+                "Beta": cov / var_b,
+                "Correlation": cov / np.sqrt(variance * var_b),
+            })
+    index = dates[window - 1:]
+    return {name: pd.DataFrame(values.T, index=index, columns=names) for name, values in stats.items()}
+
+
+def compare_to_benchmark(portfolio_returns, benchmark_path):
+    """
+    Relative statistics against the Indxx benchmark file (Excel or CSV with 'Date' and 'Rebase Value').
+    Returns:
+        (pd.DataFrame, pd.DataFrame): performance_stats of the index against the benchmark, and
+        both level series rebased to 1 on their first common date.
+    """
+    read = pd.read_csv if str(benchmark_path).lower().endswith(".csv") else pd.read_excel
+    indxx_df = read(benchmark_path, parse_dates=["Date"]).set_index("Date").sort_index()
+    indxx_returns = indxx_df["Rebase Value"].pct_change()
+    relative = performance_stats(portfolio_returns.rename("Custom_Index"), benchmark=indxx_returns)
+    merged = pd.merge(
+        (1 + portfolio_returns).cumprod().rename("Custom_Index"),
+        indxx_df["Rebase Value"].rename("Indxx_500"),
+        left_index=True,
+        right_index=True,
+        how="inner"
+    )
+    # Both rebased to 1 on the first common date
+    return relative, merged / merged.iloc[0]
+
@@ -0,0 +1,199 @@
+import json
+
+import numpy as np
+import pandas as pd
+from src.analytics import TRADING_DAYS
+from src.data_utils import get_sector_matrix
+from src.alignment import masked_returns, price_matrix_and_mask
+from src.backtester import _as_scheduler
+
+
+def _weight_matrix(weights, prices, rebalance_freq='D', lookback=21):
+    # Rebalance dates -> price rows the weights were set at, using the backtester's own
+    # schedule (resample labels are not trading dates); drift dates are trading dates
+    planned = {date: offset for offset, (date, _) in _as_scheduler(rebalance_freq, lookback).plan(prices.index).items()}
+    dates = pd.DatetimeIndex(sorted(weights))
+    offsets = np.array([planned[d] if d in planned else prices.index.get_loc(d) for d in dates])
+    return dates, offsets, np.vstack([np.asarray(weights[d], dtype=float) for d in dates])
+
+
+def risk_contributions(returns, offsets, weight_matrix, window=63, benchmark_returns=None, max_elements=1 << 22):
+    """
+    Ex-ante risk of every rebalance's weights from the sample covariance of the `window`
+    daily returns known on that date, for all dates in a few batched einsum products.
+    The N x N covariances are never formed: with X the demeaned window, the marginal risk
+    is X.T @ (X @ w) / (window - 1).
+    Args:
+        returns (np.ndarray): T x N daily returns, row i from price row i to i + 1.
+        offsets (np.ndarray): Price row of each rebalance (returns before it are known).
+        weight_matrix (np.ndarray): D x N weights.
+        benchmark_returns (np.ndarray): Length-T benchmark returns for the ex-ante beta.
+    Returns:
+        dict: "contributions" (D x N, daily volatility contributions that sum to
+              "volatility"), "volatility" (D,) and, with a benchmark, "beta" (D,).
+              Dates with fewer than `window` returns of history are NaN.
+    """
+    n_dates, n = weight_matrix.shape
+    contributions = np.full((n_dates, n), np.nan)
+    volatility = np.full(n_dates, np.nan)
+    beta = np.full(n_dates, np.nan)
+    ready = np.flatnonzero(offsets >= window)
+    views = np.lib.stride_tricks.sliding_window_view(returns, window, axis=0)   # (T - window + 1) x N x window
+    # Bound the materialized dates x N x window block
+    step = max(1, max_elements // (n * window))
+    for lo in range(0, len(ready), step):
+        rows = ready[lo:lo + step]
+        x = views[offsets[rows] - window]
+        x = x - x.mean(axis=-1, keepdims=True)
+        w = weight_matrix[rows]
+        portfolio = np.einsum('dnl,dn->dl', x, w)
+        marginal = np.einsum('dnl,dl->dn', x, portfolio) / (window - 1)
+        vol = np.sqrt(np.einsum('dn,dn->d', w, marginal))
+        contributions[rows] = w * marginal / np.where(vol > 0, vol, 1)[:, None]
+        volatility[rows] = vol
+        if benchmark_returns is not None:
+            bench = np.lib.stride_tricks.sliding_window_view(benchmark_returns, window)[offsets[rows] - window]
+            bench = bench - bench.mean(axis=-1, keepdims=True)
+            beta[rows] = np.einsum('dl,dl->d', portfolio, bench) / np.einsum('dl,dl->d', bench, bench)
+    out = {"contributions": contributions, "volatility": volatility}
+    if benchmark_returns is not None:
+        out["beta"] = beta
+    return out
+
+
+def brinson(period_returns, weight_matrix, benchmark_weights, sector_matrix):
+    """
+    Brinson-Fachler attribution of every holding period at once.
+    Args:
+        period_returns (np.ndarray): D x N security returns over each holding period.
+        weight_matrix, benchmark_weights (np.ndarray): D x N portfolio and benchmark weights
+                                                       at the start of each period.
+        sector_matrix (np.ndarray): S x N one-hot sector membership.
+    Returns:
+        dict: "allocation", "selection" and "interaction" (D x S), which add up to the
+              portfolio return minus the benchmark return of each period, plus
+              "portfolio" and "benchmark" period returns (D,).
+    """
+    wp = np.einsum('dn,sn->ds', weight_matrix, sector_matrix)
+    wb = np.einsum('dn,sn->ds', benchmark_weights, sector_matrix)
+    rb_total = np.einsum('dn,dn->d', benchmark_weights, period_returns)
+    # Sector returns; a sector a side does not hold gets the other side's return (its terms vanish)
+    rb = np.divide((benchmark_weights * period_returns) @ sector_matrix.T, wb, out=np.zeros_like(wb), where=wb != 0)
+    rp = np.divide((weight_matrix * period_returns) @ sector_matrix.T, wp, out=rb.copy(), where=wp != 0)
+    return {
+        "allocation": (wp - wb) * (rb - rb_total[:, None]),
+        "selection": wb * (rp - rb),
+        "interaction": (wp - wb) * (rp - rb),
+        "portfolio": np.einsum('dn,dn->d', weight_matrix, period_returns),
+        "benchmark": rb_total,
+    }
+
+
+def attribution_report(weights, prices, rebalance_freq='D', lookback=21, window=63, sector_map=None,
+                       exposures=None, benchmark=None, benchmark_weights=None, periods_per_year=TRADING_DAYS):
+    """
+    Risk and return attribution for every rebalance of a backtest.
+    Args:
+        weights (dict): Rebalance date -> weights, as returned by backtest_portfolio.
+        prices (pd.DataFrame, PricePanel or AlignedPrices): The price panel the backtest ran on.
+        rebalance_freq (str or RebalanceScheduler), lookback: As passed to backtest_portfolio,
+            to place the rebalance dates.
+        window (int): Daily returns in each ex-ante covariance estimate.
+        sector_map (dict): Ticker -> sector (e.g. data_utils.load_sector_map); without it every
+                           security is in UNKNOWN_SECTOR.
+        exposures (pd.DataFrame): Tickers x factors exposures (e.g. z-scored fundamentals).
+        benchmark (pd.Series): Benchmark levels (e.g. the Indxx 500 rebased values).
+        benchmark_weights (pd.Series or pd.DataFrame): Benchmark holdings for the Brinson
+            decomposition, per ticker or per (date, ticker); defaults to equal weights over
+            the securities valid on each rebalance date. A level-only benchmark such as Indxx 500 has no holdings, so the
+            gap between this holdings benchmark and it is reported as "Benchmark Mismatch".
+    Returns:
+        dict: DataFrames indexed by rebalance date: "risk" (annualized volatility, beta,
+              active return and its Brinson totals), "security_risk" and "sector_risk"
+              (annualized volatility contributions), "sector_weights", "exposures",
+              "allocation", "selection" and "interaction" (per sector, per period).
+    """
+    prices, price_matrix, valid = price_matrix_and_mask(prices)
+    tickers = prices.columns
+    # Risk estimates do not see the flat filled prices of securities that are not valid
+    returns = masked_returns(price_matrix, valid)
+    dates, offsets, weight_matrix = _weight_matrix(weights, prices, rebalance_freq, lookback)
+
+    bench_levels = bench_returns = None
+    if benchmark is not None:
+        bench_levels = benchmark.sort_index().reindex(prices.index, method='ffill').to_numpy(dtype=float)
+        bench_returns = bench_levels[1:] / bench_levels[:-1] - 1
+    risk = risk_contributions(returns, offsets, weight_matrix, window, bench_returns)
+    annualize = np.sqrt(periods_per_year)
+
+    sector_matrix, sectors = get_sector_matrix(tickers, sector_map, return_sectors=True)
+    sector_matrix = sector_matrix.toarray()
+    # Holding periods run from each rebalance to the next one (the last to the end of the data)
+    ends = np.append(offsets[1:], len(price_matrix) - 1)
+    period_returns = price_matrix[ends] / price_matrix[offsets] - 1
+    if benchmark_weights is None:
+        held = np.ones(weight_matrix.shape) if valid is None else valid[offsets].astype(float)
+        bench_matrix = held / held.sum(axis=1, keepdims=True)
+    elif isinstance(benchmark_weights, pd.DataFrame):
+        bench_matrix = benchmark_weights.reindex(columns=tickers, fill_value=0).reindex(dates, method='ffill')
+        bench_matrix = bench_matrix.to_numpy(dtype=float)
+    else:
+        bench_matrix = np.broadcast_to(benchmark_weights.reindex(tickers, fill_value=0).to_numpy(dtype=float),
+                                       weight_matrix.shape)
+    terms = brinson(period_returns, weight_matrix, bench_matrix, sector_matrix)
+
+    summary = pd.DataFrame({
+        "Volatility": risk["volatility"] * annualize,
+        "Portfolio Return": terms["portfolio"],
+        "Benchmark Return": terms["benchmark"],
+        "Allocation": terms["allocation"].sum(axis=1),
+        "Selection": terms["selection"].sum(axis=1),
+        "Interaction": terms["interaction"].sum(axis=1),
+    }, index=dates)
+    if benchmark is not None:
+        summary.insert(1, "Beta", risk["beta"])
+        # Active return against the level benchmark = Brinson terms + the holdings benchmark's gap to it
+        summary["Index Benchmark Return"] = bench_levels[ends] / bench_levels[offsets] - 1
+        summary["Benchmark Mismatch"] = summary["Benchmark Return"] - summary["Index Benchmark Return"]
+
+    report = {
+        "risk": summary,
+        "security_risk": pd.DataFrame(risk["contributions"] * annualize, index=dates, columns=tickers),
+        "sector_risk": pd.DataFrame(risk["contributions"] @ sector_matrix.T * annualize, index=dates, columns=sectors),
+        "sector_weights": pd.DataFrame(weight_matrix @ sector_matrix.T, index=dates, columns=sectors),
+    }
+    if exposures is not None:
+        exposures = exposures.reindex(tickers)
+        report["exposures"] = pd.DataFrame(np.einsum('dn,nf->df', weight_matrix, exposures.fillna(0).to_numpy(dtype=float)),
+                                           index=dates, columns=exposures.columns)
+    for term in ("allocation", "selection", "interaction"):
+        report[term] = pd.DataFrame(terms[term], index=dates, columns=sectors)
+    for frame in report.values():
+        frame.index.name = "Date"
+    return report
+
+
+def save_report(report, path):
+    """
+    Store an attribution report in one compressed .npz file (float32 tables plus their
+    labels), small enough to ship with a backtest result and read back by the dashboard.
+    """
+    arrays = {}
+    labels = {}
+    for name, frame in report.items():
+        arrays[name] = frame.to_numpy(dtype=np.float32)
+        arrays[name + "__dates"] = frame.index.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        labels[name] = [str(c) for c in frame.columns]
+    arrays["__labels"] = np.frombuffer(json.dumps(labels).encode(), dtype=np.uint8)
+    np.savez_compressed(path, **arrays)
+
+
+def load_report(path):
+    """Read a report written by save_report."""
+    with np.load(path) as data:
+        labels = json.loads(data["__labels"].tobytes().decode())
+        return {
+            name: pd.DataFrame(data[name].astype(float), columns=columns,
+                               index=pd.DatetimeIndex(data[name + "__dates"].astype("datetime64[ns]"), name="Date"))
+            for name, columns in labels.items()
+        }
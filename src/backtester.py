@@ -2,91 +2,210 @@ import pandas as pd
 
 import numpy as np
 
-import matplotlib.pyplot as plt
 from src.data_utils import compute_fundamental_scores, get_sector_matrix
-def backtest_portfolio(prices, weight_fn, rebalance_freq='D'):
+from src.analytics import performance_stats
+from src.alignment import masked_returns, price_matrix_and_mask
+from src import instrumentation
+from src.rebalance_scheduler import RebalanceScheduler
+from src.holdings_simulator import drifted_returns, simulate_holdings
+from src.scoring_engine import DEFAULT_FACTORS, compute_scores
 
-    rets = prices.pct_change().dropna()
 
-    weights = {}
-
-    portfolio_returns = []
+def _point_in_time_scores(prices, offsets, fundamentals, factors):
+    # Score rebalance cross-sections from data available on the date of the close
+    # the portfolio trades at
+    factors = factors or DEFAULT_FACTORS
+    cube = fundamentals.asof(prices.index[offsets], prices.columns, [f["column"] for f in factors])
+    return compute_scores(cube, factors)
 
-    for date in rets.resample(rebalance_freq).first().index:
 
+def _collect_weights(prices, price_matrix, weight_fn, schedule, covariance_estimator=None, fundamentals=None,
+                     factors=None, progress=None, skip_log=None, valid=None, sector_map=None):
+    # Walk the schedule lazily: only the events it yields are scored and weighted
+    weights = {}
+    rows = []
+    weight_rows = []
+    if covariance_estimator is not None:
+        # Securities that cannot be held do not enter the estimate with flat filled prices
+        returns = masked_returns(price_matrix, valid)
+        fed = 0
+    # The universe is the same at every rebalance. Sectors come from the caller or the
+    # fundamentals being backtested; without either every security is in UNKNOWN_SECTOR.
+    if sector_map is None and fundamentals is not None:
+        sector_map = getattr(fundamentals, "sectors", None)
+    sector_matrix = get_sector_matrix(prices.columns, sector_map)
+    scores = target = None
+    score_rows = {}
+    if fundamentals is not None:
+        # Scheduled reconstitutions are known up front, so score them in one as-of join
+        planned = [row for row, (_, kind) in schedule.plan(prices.index).items() if kind == "reconstitution"]
+        if planned:
+            score_rows = dict(zip(planned, _point_in_time_scores(prices, planned, fundamentals, factors)))
+    events = schedule.events(prices.index, price_matrix, skip_log=skip_log)
+    applied = None
+    while True:
         try:
-
-            sub_prices = prices.loc[:date].dropna()
-            if len(sub_prices) < 21:
-                print(f"Skipped {date}: Not enough data points for backtest.")
-                continue
-
-            latest = sub_prices.iloc[-1]
-
-            past = sub_prices.iloc[-21:]
-
-            scores = compute_fundamental_scores(latest)  # define in data_utils
-
-            sector_matrix = get_sector_matrix(latest.index)  # define in data_utils
-
-            w = weight_fn(scores, sector_matrix)
-
-            weights[date] = w
-            future_window= rets.loc[date:]
-            if len(future_window) < 5:
-                print(f"Skipped {date}: Not enough future data points for backtest.")
-                continue
-            future_returns =future_window.iloc[:30]
-
-            pf_returns = (future_returns @ w).dropna()
-            if pf_returns.empty:
-                print(f"Skipped {date}: No returns data available.")
-                continue
-
-            portfolio_returns.append(pf_returns)
-
-            
-
+            event = events.send(applied)
+        except StopIteration:
+            break
+        applied = None
+        try:
+            if event.kind == "drift":
+                # Back to the last target, no rescoring or optimization
+                w = target
+            else:
+                if event.kind == "reconstitution" or scores is None:
+                    if fundamentals is None:
+                        scores = compute_fundamental_scores(prices.iloc[event.offset])  # define in data_utils
+                    elif event.offset in score_rows:
+                        scores = score_rows[event.offset]
+                    else:
+                        scores = _point_in_time_scores(prices, [event.offset], fundamentals, factors)[0]
+                # With a validity mask, weight_fn gets the rebalance date's row of it
+                mask = {} if valid is None else {"valid": valid[event.offset]}
+                if covariance_estimator is None:
+                    with instrumentation.stage("backtest.weight_fn"):
+                        w = np.asarray(weight_fn(scores, sector_matrix, **mask), dtype=float)
+                else:
+                    # Roll the estimator forward over the returns known at this rebalance
+                    with instrumentation.stage("backtest.covariance_update"):
+                        for row in returns[fed:event.offset]:
+                            covariance_estimator.update(row)
+                    fed = max(fed, event.offset)
+                    with instrumentation.stage("backtest.weight_fn"):
+                        w = np.asarray(weight_fn(scores, sector_matrix, covariance_estimator, **mask), dtype=float)
+            if valid is not None:
+                # Only securities listed and priced on this date can be held. Weights are not
+                # rescaled here, which would break the caps weight_fn applied; only solver noise
+                # on excluded names is cleared.
+                excluded = ~valid[event.offset]
+                held = np.abs(w[excluded]) > 1e-4
+                if held.any():
+                    raise ValueError(f"Weight on {int(held.sum())} securities that are not valid on this date")
+                w = np.where(excluded, 0.0, w)
         except Exception as e:
-            #if 'weights' in locals() and (weights is None or len(weights) == 0):
-            print(f"Skipped {date}: No weights generated.")
+            # Keep drifting the previous holdings
+            if skip_log is not None:
+                skip_log.append({"date": event.date, "kind": event.kind, "reason": f"{type(e).__name__}: {e}"})
+            instrumentation.count("rebalances_skipped")
             continue
-
-    if len(portfolio_returns) == 0:
+        instrumentation.count("rebalances")
+        if event.kind != "drift":
+            target = w
+        weights[event.date] = w
+        rows.append(event.offset)
+        weight_rows.append(w)
+        applied = w
+        if progress is not None:
+            # Scheduled events done so far; drift events come on top of the total and do not
+            # count. May raise to cancel the run.
+            progress(event.step + (event.kind != "drift"), event.total)
+
+    if len(rows) == 0:
         raise ValueError("Backtest failed: No portfolio returns to concatenate.")
-
-    # elif portfolio_returns:
-    return pd.concat(portfolio_returns), weights
-    # else:
-    #     print("No portfolio returns to concatenate.")
-    #     return pd.Series(dtype=float), weights
-    
-
-def calculate_performance(portfolio_returns):
-
-    cumulative_return = (1 + portfolio_returns).cumprod()
-
-    cagr = (cumulative_return.iloc[-1]) ** (252 / len(portfolio_returns)) - 1
-
-    volatility = np.std(portfolio_returns) * np.sqrt(252)
-
-    sharpe_ratio = cagr / volatility
-
-    drawdown = cumulative_return / cumulative_return.cummax() - 1
-
-    max_drawdown = drawdown.min()
-
+    return weights, np.asarray(rows), np.vstack(weight_rows)
+
+
+def _as_scheduler(rebalance_freq, lookback):
+    if isinstance(rebalance_freq, RebalanceScheduler):
+        return rebalance_freq
+    return RebalanceScheduler(reconstitution=rebalance_freq, lookback=lookback)
+
+
+def backtest_portfolio(prices, weight_fn, rebalance_freq='D', lookback=21, covariance_estimator=None,
+                       fundamentals=None, factors=None, progress=None, skip_log=None, sector_map=None):
+    """
+    Backtest a rebalanced portfolio over a wide price panel.
+    Every rebalance date's weights are held, drifting with prices, until the next
+    rebalance, so each return row is counted exactly once.
+    Args:
+        prices (pd.DataFrame, PricePanel or AlignedPrices): Price data with datetime index and ticker
+            columns. A PricePanel is read in place; one with missing prices is aligned.
+            DataFrame dates with any missing price are dropped, unless the prices come from
+            align_prices: then every date is kept, weight_fn must only weight the securities
+            valid on each rebalance date, and positions in securities that stop trading are
+            carried at their last price until the next rebalance. Drift resets to a target
+            holding a security that is no longer valid are skipped.
+        weight_fn (callable): weight_fn(scores, sector_matrix) -> array of weights. With aligned
+                              prices it is also passed `valid=` (boolean mask of the rebalance
+                              date), e.g. for alignment.mask_weights or as per-asset caps of 0.
+        rebalance_freq (str or RebalanceScheduler): pandas resample frequency or review calendar
+                                                    ("quarterly", ...) for rebalance dates, or a scheduler
+                                                    with its own cycles, drift trigger and lookback.
+        lookback (int): Minimum number of price rows before the first rebalance.
+        covariance_estimator (RollingCovariance): If given, it is rolled forward to each rebalance
+                                                  date and passed as weight_fn's third argument.
+        fundamentals (PointInTimeFundamentals): If given, scores passed to weight_fn come from the
+                                                fundamentals available on each rebalance date.
+        factors (list): Factor definitions for those scores, defaults to scoring_engine.DEFAULT_FACTORS.
+        progress (callable): progress(done, total) after each rebalance; raising from it aborts the run.
+        skip_log (list): Skipped rebalances are appended as {"date", "kind", "reason"} dicts.
+        sector_map (dict): Ticker -> sector for the sector_matrix passed to weight_fn, e.g.
+                           data_utils.load_sector_map(csv_path); defaults to the sectors of
+                           `fundamentals`.
+    Returns:
+        (pd.Series, dict): Daily portfolio returns and the weights set at each rebalance date.
+    """
+    prices, price_matrix, valid = price_matrix_and_mask(prices)
+    # Return row i covers price rows i -> i + 1
+    ret_index = prices.index[1:]
+    weights, offsets, weight_matrix = _collect_weights(prices, price_matrix, weight_fn,
+                                                       _as_scheduler(rebalance_freq, lookback), covariance_estimator,
+                                                       fundamentals, factors, progress, skip_log, valid, sector_map)
+    pf_returns = drifted_returns(price_matrix, offsets, weight_matrix)
+    return pd.Series(pf_returns, index=ret_index[offsets[0]:]), weights
+
+
+def backtest_with_costs(prices, weight_fn, rebalance_freq='D', lookback=21, initial_capital=1_000_000.0,
+                        cost_per_trade=0.0, cost_bps=0.0, slippage_bps=0.0, covariance_estimator=None,
+                        fundamentals=None, factors=None, progress=None, skip_log=None, sector_map=None):
+    """
+    Backtest that holds share counts between rebalances and charges trading costs.
+    Args:
+        prices (pd.DataFrame, PricePanel or AlignedPrices): Price data as in backtest_portfolio.
+        weight_fn (callable): weight_fn(scores, sector_matrix) -> array of weights, as in backtest_portfolio.
+        rebalance_freq (str or RebalanceScheduler): Rebalance schedule as in backtest_portfolio.
+        lookback (int): Minimum number of price rows before the first rebalance.
+        initial_capital (float): Starting portfolio value.
+        cost_per_trade (float): Fixed charge for every security traded at a rebalance.
+        cost_bps (float): Commission in basis points of traded notional.
+        slippage_bps (float): Slippage in basis points of traded notional.
+        covariance_estimator (RollingCovariance): Passed to weight_fn as in backtest_portfolio.
+        fundamentals (PointInTimeFundamentals): Point-in-time scores as in backtest_portfolio.
+        factors (list): Factor definitions for those scores.
+        progress (callable): Progress/cancellation hook as in backtest_portfolio.
+        skip_log (list): Collects skipped rebalances as in backtest_portfolio.
+        sector_map (dict): Ticker -> sector as in backtest_portfolio.
+    Returns:
+        dict: Gross and net daily returns, per-rebalance turnover/trades/costs,
+              share counts held after each rebalance and the target weights.
+    """
+    prices, price_matrix, valid = price_matrix_and_mask(prices)
+    ret_index = prices.index[1:]
+    weights, offsets, weight_matrix = _collect_weights(prices, price_matrix, weight_fn,
+                                                       _as_scheduler(rebalance_freq, lookback), covariance_estimator,
+                                                       fundamentals, factors, progress, skip_log, valid, sector_map)
+
+    sim = simulate_holdings(price_matrix, offsets, weight_matrix, initial_capital=initial_capital,
+                            cost_per_trade=cost_per_trade, cost_bps=cost_bps, slippage_bps=slippage_bps)
+    return_index = ret_index[offsets[0]:]
+    rebalance_dates = pd.DatetimeIndex(list(weights.keys()))
     return {
+        "gross_returns": pd.Series(sim["gross_returns"], index=return_index),
+        "net_returns": pd.Series(sim["net_returns"], index=return_index),
+        "turnover": pd.Series(sim["turnover"], index=rebalance_dates),
+        "trades": pd.Series(sim["trades"], index=rebalance_dates),
+        "costs": pd.Series(sim["costs"], index=rebalance_dates),
+        "shares": pd.DataFrame(sim["shares"], index=rebalance_dates, columns=prices.columns),
+        "weights": weights,
+    }
 
-        "CAGR": round(cagr, 4),
-
-        "Volatility": round(volatility, 4),
 
-        "Sharpe Ratio": round(sharpe_ratio, 4),
+def calculate_performance(portfolio_returns):
 
-        "Max Drawdown": round(max_drawdown, 4)
+    stats = performance_stats(portfolio_returns).iloc[0]
 
-    }
+    return {key: round(float(stats[key]), 4) for key in ("CAGR", "Volatility", "Sharpe Ratio", "Max Drawdown")}
 
 def calculate_turnover(weights_dict):
 
@@ -105,22 +224,24 @@ def calculate_turnover(weights_dict):
     return np.mean(turnover)
 
 def plot_returns(portfolio_returns, benchmark_returns=None):
+    """Cumulative return chart. The figure is returned, not shown; close it with plt.close(fig) once rendered."""
+    import matplotlib.pyplot as plt
 
     cumulative = (1 + portfolio_returns).cumprod()
 
-    plt.figure(figsize=(10, 6))
+    fig, ax = plt.subplots(figsize=(10, 6))
 
-    plt.plot(cumulative, label='Fundamental Index')
+    ax.plot(cumulative, label='Fundamental Index')
 
     if benchmark_returns is not None:
 
-        plt.plot((1 + benchmark_returns).cumprod(), label='Benchmark')
+        ax.plot((1 + benchmark_returns).cumprod(), label='Benchmark')
 
-    plt.legend()
+    ax.legend()
 
-    plt.title("Cumulative Returns")
+    ax.set_title("Cumulative Returns")
 
-    plt.grid(True)
+    ax.grid(True)
 
-    plt.show()
+    return fig
  
\ No newline at end of file
@@ -0,0 +1,247 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from src.alignment import align_prices, masked_returns
+from src.analytics import performance_stats
+from src.covariance import SampleCovariance
+from src.holdings_simulator import fixed_target_returns
+from src.optimizer import optimize_weights
+from src.price_fetcher import download_price_data
+from src.price_panel import as_price_frame
+from src.rebalance_scheduler import RebalanceScheduler
+from src.scoring_engine import DEFAULT_FACTORS, compute_scores, top_k
+from src.screening import DTYPES, exclusion_reasons
+from src.weighting_stratergies import equal_weight, market_cap_weight, ff_market_cap_weight, score_weight, capped_weight
+
+# Settings of one index definition (besides its "name") and their defaults
+DEFINITION_DEFAULTS = {
+    "factors": None,                 # scoring factor definitions, defaults to DEFAULT_FACTORS
+    "screening": {},                 # eligibility filters, as for screen_universe
+    "top_n": 50,
+    "weight_strategy": "Market Cap", # "Equal", "Market Cap", "FF Market Cap", "Score Based" or "Mean-Variance"
+    "max_weight": None,
+    "rebalance_freq": "D",           # frequency or review calendar, as for backtest_portfolio
+}
+
+
+def _key(value):
+    # Hashable identity of a JSON-like setting, to share work between definitions
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _resolve(definitions):
+    resolved = []
+    for definition in definitions:
+        unknown = set(definition) - set(DEFINITION_DEFAULTS) - {"name"}
+        if "name" not in definition or unknown:
+            raise ValueError(f"Index definitions need a name and only {sorted(DEFINITION_DEFAULTS)}; "
+                             f"got {definition}")
+        resolved.append({**DEFINITION_DEFAULTS, **definition})
+    names = [definition["name"] for definition in resolved]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate index names: {names}")
+    return resolved
+
+
+def _definition_weights(strategy, selected, scores, covariance=None, max_weight=None):
+    if strategy == "Equal":
+        weights = equal_weight(len(selected))
+    elif strategy == "Market Cap":
+        weights = market_cap_weight(selected["Mcap"].to_numpy(dtype=float))
+    elif strategy == "FF Market Cap":
+        weights = ff_market_cap_weight(selected["Mcap"].to_numpy(dtype=float), selected["FF"].to_numpy(dtype=float))
+    elif strategy == "Score Based":
+        weights = score_weight(scores)
+    elif strategy == "Mean-Variance":
+        return optimize_weights(scores, covariance, max_weight=max_weight if max_weight is not None else 1.0)
+    else:
+        raise ValueError(f"Unknown weight strategy: {strategy}")
+    if max_weight is not None:
+        weights = capped_weight(weights, max_weight)
+    return weights
+
+
+def _default_covariance(n_assets):
+    return SampleCovariance(n_assets, window=252)
+
+
+def build_indices(definitions, csv_path, start_date, end_date, cache_dir=None, fetch_fn=None, offline=False,
+                  lookback=21, as_of=None, ffill_limit=5, covariance_estimator=None):
+    """
+    Build many custom indices from one fundamentals load and one price download.
+    Definitions only differ in their settings (see DEFINITION_DEFAULTS), so the work is shared:
+    eligibility is evaluated once per distinct screening, scores once per distinct
+    (factors, screening) pair, prices and returns once for the union of all constituents,
+    and the level series of all indices with the same rebalance calendar are valued together.
+    At a rebalance where some constituents have no price, an index is weighted over the
+    others with the same strategy and max_weight.
+    The "Mean-Variance" strategy is re-optimized at every rebalance with a covariance of the
+    union's daily returns up to that date only, rolled forward once per rebalance calendar.
+    Args:
+        definitions (list): Dicts with a "name" and any DEFINITION_DEFAULTS settings.
+        csv_path (str): Fundamentals CSV.
+        start_date, end_date: Price history range, end exclusive.
+        cache_dir, fetch_fn, offline: Passed to download_price_data.
+        lookback (int): Minimum number of price rows before the first rebalance.
+        as_of: Date for listing-age filters, defaults to today.
+        ffill_limit (int): Rows a missing price is carried forward, see align_prices.
+        covariance_estimator (callable): n_assets -> RollingCovariance for "Mean-Variance",
+            defaults to a 252-day SampleCovariance.
+    Returns:
+        dict: "selections" (name -> selected fundamentals rows with 'Score'), "exclusions"
+              (Index, Ticker, Reason), "weights" (indices x tickers; the latest rebalance for
+              "Mean-Variance"), "returns" and "levels" (dates x indices) and "stats"
+              (performance_stats, one row per index).
+    """
+    definitions = _resolve(definitions)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    fundamentals = pd.read_csv(csv_path, dtype={column: dtype for column, dtype in DTYPES.items() if column in header})
+    factor_sets = {_key(d["factors"]): d["factors"] or DEFAULT_FACTORS for d in definitions}
+    columns = list(dict.fromkeys(f["column"] for factors in factor_sets.values() for f in factors))
+    # Raw factor values of every security, read out of the frame once
+    values = fundamentals[columns].to_numpy(dtype=float)
+    position = {column: i for i, column in enumerate(columns)}
+
+    eligible = {}
+    exclusions = []
+    scores = {}
+    selections = {}
+    for definition in definitions:
+        screen_key = _key(definition["screening"])
+        if screen_key not in eligible:
+            reasons = exclusion_reasons(fundamentals, as_of=as_of, **definition["screening"])
+            eligible[screen_key] = (np.flatnonzero(reasons == ""), reasons)
+        rows, reasons = eligible[screen_key]
+        failed = reasons != ""
+        exclusions.append(pd.DataFrame({"Index": definition["name"], "Ticker": fundamentals["Ticker"].to_numpy()[failed],
+                                        "Reason": reasons[failed]}))
+        score_key = (_key(definition["factors"]), screen_key)
+        if score_key not in scores:
+            factors = factor_sets[score_key[0]]
+            # Cross-sectional normalization over the eligible universe, as in screen_universe
+            scores[score_key] = compute_scores(values[np.ix_(rows, [position[f["column"]] for f in factors])], factors)
+        chosen = top_k(scores[score_key], definition["top_n"])
+        selections[definition["name"]] = fundamentals.iloc[rows[chosen]].assign(Score=scores[score_key][chosen])
+
+    # One download for the union of constituents. Dates stay even where some of them have no
+    # price: each index only holds the constituents valid at each rebalance.
+    union = list(dict.fromkeys(t for selected in selections.values() for t in selected["Ticker"]))
+    if not union:
+        raise ValueError("No index definition has any eligible security.")
+    prices = as_price_frame(download_price_data(union, start=start_date, end=end_date, cache_dir=cache_dir,
+                                                fetch_fn=fetch_fn, offline=offline))
+    prices = align_prices(prices.reindex(columns=union), ffill_limit=ffill_limit)
+    price_matrix = prices.values
+    column_of = {ticker: j for j, ticker in enumerate(union)}
+    member_cols = [np.array([column_of[t] for t in selections[d["name"]]["Ticker"]], dtype=np.intp)
+                   for d in definitions]
+    optimized = [d["weight_strategy"] == "Mean-Variance" for d in definitions]
+    if any(optimized):
+        # Constituents without prices on a day do not enter the estimate with flat returns
+        returns = masked_returns(price_matrix, prices.valid)
+
+    def weigh(k, keep=None, covariance=None):
+        # Definition k's weights over its constituents, or over the `keep` subset of them
+        definition = definitions[k]
+        selected = selections[definition["name"]]
+        cols = member_cols[k]
+        if keep is not None:
+            selected, cols = selected[keep], cols[keep]
+        sub_covariance = covariance[np.ix_(cols, cols)] if covariance is not None else None
+        weights = np.zeros(len(union))
+        weights[cols] = _definition_weights(definition["weight_strategy"], selected, selected["Score"].to_numpy(),
+                                            sub_covariance, definition["max_weight"])
+        return weights
+
+    # Fixed targets; Mean-Variance indices get the weights of their latest rebalance below
+    targets = np.zeros((len(definitions), len(union)))
+    for k in range(len(definitions)):
+        if len(member_cols[k]) and not optimized[k]:
+            targets[k] = weigh(k)
+    names = [d["name"] for d in definitions]
+
+    # Indices on the same rebalance calendar are valued together
+    frames = []
+    stats = []
+    calendars = {}
+    for k, definition in enumerate(definitions):
+        calendars.setdefault(_key(definition["rebalance_freq"]), (definition["rebalance_freq"], []))[1].append(k)
+    for rebalance_freq, members in calendars.values():
+        offsets = np.array(list(RebalanceScheduler(rebalance_freq, lookback=lookback).plan(prices.index)))
+        if len(offsets) == 0:
+            raise ValueError(f"No rebalance dates for {rebalance_freq!r} in the price history.")
+        estimator = None
+        if any(optimized[k] for k in members):
+            # Rolled forward to each rebalance, so Mean-Variance weights only see earlier returns
+            estimator = (covariance_estimator or _default_covariance)(len(union))
+            fed = 0
+        # At each rebalance an index is weighted over its constituents valid on the date, with
+        # its strategy and caps applied to them alone; most dates share the full targets.
+        weighted = {}
+        period_targets = np.empty((len(offsets), len(members), len(union)))
+        for d, offset in enumerate(offsets):
+            covariance = None
+            if estimator is not None:
+                for row in returns[fed:offset]:
+                    estimator.update(row)
+                fed = max(fed, offset)
+                covariance = estimator.covariance()
+            for m, k in enumerate(members):
+                keep = prices.valid[offset, member_cols[k]]
+                if not keep.any():
+                    # No constituent with a price (or none eligible): no returns until the next rebalance
+                    period_targets[d, m] = 0.0
+                elif keep.all() and not optimized[k]:
+                    period_targets[d, m] = targets[k]
+                else:
+                    key = (k, keep.tobytes())
+                    if optimized[k] or key not in weighted:
+                        try:
+                            weighted[key] = weigh(k, None if keep.all() else keep, covariance)
+                        except ValueError as e:
+                            raise ValueError(f"Cannot weight index {names[k]!r} on {prices.index[offset].date()} "
+                                             f"over its {int(keep.sum())} constituents with prices: {e}") from e
+                    period_targets[d, m] = weighted[key]
+                    if optimized[k]:
+                        targets[k] = weighted[key]
+        frame = pd.DataFrame(fixed_target_returns(price_matrix, offsets, period_targets),
+                             index=prices.index[1:][offsets[0]:], columns=[names[k] for k in members])
+        frames.append(frame)
+        stats.append(performance_stats(frame))
+    pf_returns = pd.concat(frames, axis=1)[names]
+
+    return {
+        "selections": selections,
+        "exclusions": pd.concat(exclusions, ignore_index=True),
+        "weights": pd.DataFrame(targets, index=pd.Index(names, name="Index"), columns=union),
+        "returns": pf_returns,
+        "levels": (1 + pf_returns.fillna(0)).cumprod().where(pf_returns.notna()),
+        "stats": pd.concat(stats).loc[names],
+    }
+
+
+def write_outputs(result, output_dir):
+    """
+    Write a build_indices result into one directory: levels.csv, returns.csv and stats.csv
+    (one column or row per index), weights.csv and selections.csv in long format, and
+    exclusions.csv.
+    Returns:
+        dict: Output name -> path.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    weights = result["weights"].stack()
+    tables = {
+        "levels": result["levels"],
+        "returns": result["returns"],
+        "stats": result["stats"],
+        "weights": weights[weights > 0].rename("Weight").rename_axis(["Index", "Ticker"]).reset_index(),
+        "selections": pd.concat(result["selections"], names=["Index", None]).reset_index(level=0),
+        "exclusions": result["exclusions"],
+    }
+    paths = {}
+    for name, table in tables.items():
+        paths[name] = os.path.join(output_dir, f"{name}.csv")
+        table.to_csv(paths[name], index=name in ("levels", "returns", "stats"))
+    return paths
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+
+class LRUCache:
+    """Thread-safe dict that evicts the least recently used entry beyond `maxsize`."""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.data:
+                return default
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def get_or_compute(self, key, fn):
+        # Two threads may both compute on a miss; the results are identical so the last one wins
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+
+_HASHES = LRUCache(maxsize=256)
+_FRAMES = LRUCache(maxsize=16)
+
+
+def file_hash(source):
+    """
+    Content hash of a path or an uploaded file-like object. Paths are only rehashed
+    when their size or modification time changes.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        stat = os.stat(source)
+        key = (os.fspath(source), stat.st_size, stat.st_mtime_ns)
+
+        def digest():
+            h = hashlib.sha1()
+            with open(source, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            return h.hexdigest()
+
+        return _HASHES.get_or_compute(key, digest)
+    data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+    return hashlib.sha1(data).hexdigest()
+
+
+def frame_hash(df):
+    """Content hash of a DataFrame, for data that did not come from a file."""
+    values = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    h = hashlib.sha1(values.tobytes())
+    h.update(",".join(map(str, df.columns)).encode())
+    return h.hexdigest()
+
+
+def read_csv_cached(source, **read_kwargs):
+    """
+    pd.read_csv memoized on file content and read arguments. Callers get a copy,
+    so the cached frame is never modified.
+    """
+    key = (file_hash(source), tuple(sorted((k, repr(v)) for k, v in read_kwargs.items())))
+
+    def read():
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_csv(source, **read_kwargs)
+
+    return _FRAMES.get_or_compute(key, read).copy()
+
+
+class Cancelled(Exception):
+    """Raised inside a background job once cancel() has been requested."""
+
+
+class BackgroundJob:
+
+    def __init__(self, key):
+        self.key = key
+        self.done_steps = 0
+        self.total_steps = 0
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def report(self, done, total):
+        # Passed to the job function as `progress`; also the cancellation point
+        self.done_steps, self.total_steps = done, total
+        if self.cancel_event.is_set():
+            raise Cancelled(f"Job {self.key!r} cancelled")
+
+    @property
+    def fraction(self):
+        return self.done_steps / self.total_steps if self.total_steps else 0.0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def status(self):
+        if not self.future.done():
+            return "cancelling" if self.cancel_event.is_set() else "running"
+        if self.future.cancelled() or isinstance(self.future.exception(), Cancelled):
+            return "cancelled"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def result(self):
+        return self.future.result()
+
+
+class BackgroundRunner:
+    """
+    Runs jobs on worker threads and memoizes them by key: asking for a key that is
+    running or finished returns that job instead of recomputing. The least recently
+    used jobs are evicted beyond `max_results`.
+    """
+
+    def __init__(self, max_workers=1, max_results=16):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.jobs = LRUCache(maxsize=max_results)
+        self.lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Start fn(*args, progress=job.report, **kwargs) unless `key` is already running or done."""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and job.status in ("running", "done"):
+                return job
+            job = BackgroundJob(key)
+            job.future = self.executor.submit(fn, *args, progress=job.report, **kwargs)
+            self.jobs.put(key, job)
+            return job
+
+    def get(self, key):
+        """The job for `key`, if one was submitted and not evicted."""
+        return self.jobs.get(key)
+
+
+_RESULTS = LRUCache(maxsize=64)
+
+
+def memoize(key, fn):
+    """
+    Memoize fn() under `key` (e.g. a file hash plus parameters). The cache lives at
+    module level, so it survives Streamlit reruns of the dashboard script.
+    """
+    return _RESULTS.get_or_compute(key, fn)
@@ -0,0 +1,229 @@
+"""
+Command-line entry point for scheduled index runs.
+
+    python -m src.cli score    --config configs/tech50.yaml
+    python -m src.cli build    --config configs/tech50.yaml --output-dir out/tech50
+    python -m src.cli backtest --config configs/tech50.yaml --start 2020-01-01
+    python -m src.cli compare  --config configs/tech50.yaml --benchmark data/indxx.xlsx
+    python -m src.cli batch    --config configs/all_indices.yaml
+
+Each command writes machine-readable files to the output directory (plus run.json
+describing the run) and prints nothing but their paths, so many index definitions
+can be run side by side by cron or a job runner. Only argparse/json are imported at
+startup; pandas and the pipeline modules are imported by the command that needs them.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Run settings, in the order of main.main()
+DEFAULTS = {
+    "csv_path": "input/universe.csv",
+    "weight_strategy": "Market Cap",
+    "start_date": "2023-01-01",
+    "end_date": "2024-01-01",
+    "max_weight": 0.6,
+    "top_n": 50,
+    "screening": {},          # eligibility filters passed to screen_universe
+    "factors": None,          # scoring factor definitions, defaults to DEFAULT_FACTORS
+    "cache_dir": None,
+    "offline": False,
+    "rebalance_freq": "D",
+    "benchmark_path": None,   # Indxx file for `compare`
+    "output_dir": None,       # defaults to output/<config file name>
+    "indices": None,          # index definitions for `batch`; the settings above are their defaults
+}
+
+
+def load_config(path):
+    """Run settings from a JSON or YAML file (PyYAML is only needed for YAML)."""
+    with open(path) as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML configs requires PyYAML (pip install pyyaml); "
+                                  "JSON configs work without it.") from None
+            config = yaml.safe_load(f) or {}
+        else:
+            config = json.load(f)
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown config keys in {path}: {sorted(unknown)}")
+    return config
+
+
+def resolve_config(args):
+    config = dict(DEFAULTS)
+    if args.config:
+        config.update(load_config(args.config))
+    overrides = {
+        "csv_path": args.csv, "weight_strategy": args.weight_strategy, "start_date": args.start,
+        "end_date": args.end, "max_weight": args.max_weight, "top_n": args.top_n, "cache_dir": args.cache_dir,
+        "benchmark_path": args.benchmark, "output_dir": args.output_dir,
+    }
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    if args.offline:
+        config["offline"] = True
+    if config["output_dir"] is None:
+        name = os.path.splitext(os.path.basename(args.config))[0] if args.config else "run"
+        config["output_dir"] = os.path.join("output", name)
+    return config
+
+
+def _score(config, outputs):
+    from src.instrumentation import stage
+    from src.screening import screen_universe
+    from src.scoring_engine import DEFAULT_FACTORS
+
+    with stage("screen_universe"):
+        top_stocks, exclusions = screen_universe(config["csv_path"], top_n=config["top_n"],
+                                                 factors=config["factors"] or DEFAULT_FACTORS, **config["screening"])
+    outputs["scores"] = _write_csv(top_stocks, config, "scores.csv", index=False)
+    outputs["exclusions"] = _write_csv(exclusions, config, "exclusions.csv", index=False)
+    return top_stocks
+
+
+def _build(config, outputs):
+    import pandas as pd
+    from src.instrumentation import stage
+    from src.price_fetcher import download_price_data
+    from src.weighting_stratergies import build_weights
+
+    top_stocks = _score(config, outputs)
+    tickers = top_stocks["Ticker"].tolist()
+    with stage("download_prices"):
+        prices = download_price_data(tickers, start=config["start_date"], end=config["end_date"],
+                                     cache_dir=config["cache_dir"], offline=config["offline"])
+    with stage("weighting"):
+        weights = pd.Series(build_weights(top_stocks, config["weight_strategy"], config["max_weight"]),
+                            index=pd.Index(tickers, name="Ticker"), name="Weight")
+    outputs["weights"] = _write_csv(weights, config, "weights.csv")
+    return prices, weights, top_stocks
+
+
+def _backtest(config, outputs):
+    from src.alignment import align_prices, mask_weights
+    from src.backtester import backtest_portfolio, calculate_performance
+    from src.data_utils import sector_map_from_frame
+    from src.instrumentation import stage
+    from src.price_panel import as_price_frame
+
+    prices, weights, top_stocks = _build(config, outputs)
+    target = weights.to_numpy()
+    max_weight = config["max_weight"]
+    with stage("backtest"):
+        # Tickers that failed to download come back as empty columns, which align_prices masks
+        prices = align_prices(as_price_frame(prices).reindex(columns=weights.index))
+        # Fixed targets, re-capped over the tickers that can be held on each date
+        portfolio_returns, _ = backtest_portfolio(prices,
+                                                  lambda scores, cov_matrix, valid: mask_weights(target, valid, max_weight),
+                                                  rebalance_freq=config["rebalance_freq"],
+                                                  sector_map=sector_map_from_frame(top_stocks))
+    outputs["returns"] = _write_csv(portfolio_returns.rename("Return"), config, "returns.csv")
+    outputs["stats"] = _write_json(calculate_performance(portfolio_returns), config, "stats.json")
+    return portfolio_returns
+
+
+def _compare(config, outputs):
+    from src.analytics import compare_to_benchmark
+
+    if not config["benchmark_path"]:
+        raise ValueError("compare needs a benchmark file (--benchmark or benchmark_path in the config)")
+    portfolio_returns = _backtest(config, outputs)
+    relative, levels = compare_to_benchmark(portfolio_returns, config["benchmark_path"])
+    outputs["relative"] = _write_json(relative.iloc[0].to_dict(), config, "relative.json")
+    outputs["levels"] = _write_csv(levels, config, "levels.csv")
+
+
+def _batch(config, outputs):
+    from src.batch_builder import DEFINITION_DEFAULTS, build_indices, write_outputs
+    from src.instrumentation import stage
+
+    if not config["indices"]:
+        raise ValueError("batch needs a list of index definitions under 'indices' in the config")
+    shared = {key: config[key] for key in DEFINITION_DEFAULTS if config[key] is not None}
+    with stage("build_indices"):
+        result = build_indices([{**shared, **definition} for definition in config["indices"]], config["csv_path"],
+                               config["start_date"], config["end_date"], cache_dir=config["cache_dir"],
+                               offline=config["offline"])
+    outputs.update(write_outputs(result, config["output_dir"]))
+
+
+COMMANDS = {
+    "score": (_score, "Screen and score the universe; writes scores.csv and exclusions.csv."),
+    "build": (_build, "score, then download prices and weight the index; adds weights.csv."),
+    "backtest": (_backtest, "build, then backtest the weights; adds returns.csv and stats.json."),
+    "compare": (_compare, "backtest, then compare with the benchmark; adds relative.json and levels.csv."),
+    "batch": (_batch, "Build every index under 'indices' from one data load; writes levels, weights and stats."),
+}
+
+
+def _write_csv(data, config, name, **kwargs):
+    path = os.path.join(config["output_dir"], name)
+    data.to_csv(path, **kwargs)
+    return path
+
+
+def _write_json(data, config, name):
+    path = os.path.join(config["output_dir"], name)
+    with open(path, "w") as f:
+        json.dump({key: float(value) for key, value in data.items()}, f, indent=2)
+    return path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Build and evaluate custom indices.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        sub.add_argument("--config", help="JSON or YAML run config; flags below override it")
+        sub.add_argument("--csv", help="Fundamentals CSV")
+        sub.add_argument("--weight-strategy", choices=["Equal", "Market Cap", "FF Market Cap"])
+        sub.add_argument("--start", help="Start date (YYYY-MM-DD)")
+        sub.add_argument("--end", help="End date, exclusive")
+        sub.add_argument("--max-weight", type=float)
+        sub.add_argument("--top-n", type=int)
+        sub.add_argument("--cache-dir", help="Price cache directory")
+        sub.add_argument("--offline", action="store_true", help="Use cached prices only")
+        sub.add_argument("--benchmark", help="Indxx benchmark file (Excel or CSV)")
+        sub.add_argument("--output-dir", help="Directory for the output files")
+        sub.add_argument("--profile", action="store_true", help="Also write per-stage timings to profile.json")
+    return parser
+
+
+def run(argv=None):
+    """Parse `argv` and run one command. Returns the process exit code."""
+    args = build_parser().parse_args(argv)
+    config = resolve_config(args)
+    os.makedirs(config["output_dir"], exist_ok=True)
+    outputs = {}
+    command = COMMANDS[args.command][0]
+    start = time.perf_counter()
+    if args.profile:
+        from src.instrumentation import profiling
+
+        with profiling() as profiler:
+            command(config, outputs)
+        profiler.save(os.path.join(config["output_dir"], "profile.json"))
+        outputs["profile"] = os.path.join(config["output_dir"], "profile.json")
+    else:
+        command(config, outputs)
+    record = {
+        "command": args.command,
+        "config": config,
+        "outputs": outputs,
+        "seconds": round(time.perf_counter() - start, 3),
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(config["output_dir"], "run.json"), "w") as f:
+        json.dump(record, f, indent=2, default=str)
+    for path in outputs.values():
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,153 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from src.price_panel import PricePanel
+
+
+class RollingCovariance(ABC):
+    """
+    Covariance of the last `window` return rows, updated one day at a time.
+    Keeps a ring buffer of returns, their running column sums and the W x W Gram
+    matrix of the buffer, so each update costs O(W * N) and no estimator has to
+    form the dense N x N matrix. Every estimator implements factor(), the factored form
+    covariance = F.T @ F + diag(specific_variance).
+    """
+
+    def __init__(self, n_assets, window=63):
+        self.n_assets = n_assets
+        self.window = window
+        self._reset()
+
+    def _reset(self):
+        self.buffer = np.zeros((self.window, self.n_assets))
+        self.gram = np.zeros((self.window, self.window))
+        self.col_sum = np.zeros(self.n_assets)
+        self.count = 0
+        self.pos = 0
+
+    def update(self, returns_row):
+        """Push one day of returns, dropping the oldest day once the window is full."""
+        x = np.asarray(returns_row, dtype=float)
+        self.col_sum += x - self.buffer[self.pos]
+        self.buffer[self.pos] = x
+        # Only the Gram row and column of the replaced slot change
+        products = self.buffer @ x
+        self.gram[self.pos, :] = products
+        self.gram[:, self.pos] = products
+        self.pos = (self.pos + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        return self
+
+    def fit(self, returns_matrix):
+        """Reset and load the last `window` rows of a T x N return matrix (or a price panel's returns)."""
+        if isinstance(returns_matrix, PricePanel):
+            # Only the closes for the last window are read from the memory map
+            returns_matrix = returns_matrix.slice(start=returns_matrix.dates[-self.window - 1:][0]).returns()
+        returns_matrix = np.asarray(returns_matrix, dtype=float)[-self.window:]
+        self._reset()
+        n = len(returns_matrix)
+        self.buffer[:n] = returns_matrix
+        self.gram[:n, :n] = returns_matrix @ returns_matrix.T
+        self.col_sum = returns_matrix.sum(axis=0)
+        self.count = n
+        self.pos = n % self.window
+        return self
+
+    def _rows(self):
+        # Rows in the buffer, oldest first
+        if self.count < self.window:
+            return np.arange(self.count)
+        return (self.pos + np.arange(self.window)) % self.window
+
+    def _centered(self):
+        rows = self._rows()
+        mean = self.col_sum / self.count
+        centered = self.buffer[rows] - mean
+        # Centered Gram from the raw one: G - 1 (X m)' - (X m) 1' + (m'm) 1 1'
+        xm = self.buffer[rows] @ mean
+        gram = self.gram[np.ix_(rows, rows)] - xm[None, :] - xm[:, None] + mean @ mean
+        return centered, gram
+
+    @abstractmethod
+    def factor(self):
+        """
+        Returns:
+            (np.ndarray, np.ndarray or None): K x N factor F and length-N specific variance.
+        """
+
+    def covariance(self):
+        """Dense N x N covariance; only for small universes."""
+        factor, specific_variance = self.factor()
+        cov = factor.T @ factor
+        if specific_variance is not None:
+            cov[np.diag_indices_from(cov)] += specific_variance
+        return cov
+
+
+class SampleCovariance(RollingCovariance):
+
+    def factor(self):
+        centered, _ = self._centered()
+        return centered / np.sqrt(max(self.count - 1, 1)), None
+
+
+class LedoitWolfCovariance(RollingCovariance):
+    """
+    Ledoit-Wolf shrinkage towards a scaled identity. The shrinkage intensity is
+    computed from the W x W centered Gram matrix rather than the N x N covariance.
+    """
+
+    def shrinkage(self):
+        _, gram = self._centered()
+        n = self.count
+        mu = np.trace(gram) / (n * self.n_assets)
+        gram_norm2 = np.sum(gram ** 2)
+        # ||S - mu I||^2 with S = X'X / n and ||S||^2 = ||X X'||^2 / n^2
+        delta = gram_norm2 / n ** 2 - mu ** 2 * self.n_assets
+        beta = (np.sum(np.diag(gram) ** 2) - gram_norm2 / n) / n ** 2
+        shrink = 0.0 if delta <= 0 else min(beta, delta) / delta
+        return shrink, mu
+
+    def factor(self):
+        centered, _ = self._centered()
+        shrink, mu = self.shrinkage()
+        factor = np.sqrt((1 - shrink) / self.count) * centered
+        return factor, np.full(self.n_assets, shrink * mu)
+
+
+class EWMACovariance(RollingCovariance):
+    """Zero-mean exponentially weighted covariance over the window (RiskMetrics style)."""
+
+    def __init__(self, n_assets, window=252, decay=0.94):
+        super().__init__(n_assets, window)
+        self.decay = decay
+
+    def factor(self):
+        rows = self._rows()
+        ages = np.arange(len(rows))[::-1]
+        weights = (1 - self.decay) * self.decay ** ages
+        weights /= weights.sum()
+        return np.sqrt(weights)[:, None] * self.buffer[rows], None
+
+
+class FactorModelCovariance(RollingCovariance):
+    """
+    Low-rank statistical factor model: the top `n_factors` principal components
+    plus a diagonal of specific variances. The components come from the W x W
+    Gram matrix, so the cost is independent of N beyond O(W * N).
+    """
+
+    def __init__(self, n_assets, window=252, n_factors=5):
+        super().__init__(n_assets, window)
+        self.n_factors = n_factors
+
+    def factor(self):
+        centered, gram = self._centered()
+        scale = 1 / np.sqrt(max(self.count - 1, 1))
+        eigvals, eigvecs = np.linalg.eigh(gram)
+        top = eigvecs[:, ::-1][:, :self.n_factors]
+        # Rows are sqrt(lambda_k) * v_k', with v_k the k-th principal direction
+        factor = scale * (top.T @ centered)
+        total_variance = scale ** 2 * np.sum(centered ** 2, axis=0)
+        specific_variance = np.clip(total_variance - np.sum(factor ** 2, axis=0), 0, None)
+        return factor, specific_variance
@@ -2,15 +2,47 @@
 import numpy as np
 import pandas as pd
 
+UNKNOWN_SECTOR = "Unknown"
+
+
 def compute_fundamental_scores(latest_data):
     # Dummy scoring: Replace with real scoring like P/E, P/B, etc.
     return np.random.rand(len(latest_data))
 
-def get_sector_matrix(security_names):
-    # Dummy 3-sector one-hot encoding
-    n = len(security_names)
-    np.random.seed(42)
-    sector_labels = np.random.choice([0, 1, 2], size=n)
-    matrix = np.zeros((n, 3))
-    matrix[np.arange(n), sector_labels] = 1
-    return
+
+def sector_map_from_frame(frame, ticker_col='Ticker', sector_col='Sector'):
+    """Ticker -> sector mapping from a fundamentals frame; empty if it has no sector column."""
+    if sector_col not in frame.columns:
+        return {}
+    return dict(zip(frame[ticker_col], frame[sector_col].astype(object).fillna(UNKNOWN_SECTOR)))
+
+
+def load_sector_map(path, ticker_col='Ticker', sector_col='Sector'):
+    """Ticker -> sector mapping from the sector column of a fundamentals CSV; empty if it has none."""
+    if sector_col not in pd.read_csv(path, nrows=0).columns:
+        return {}
+    return sector_map_from_frame(pd.read_csv(path, usecols=[ticker_col, sector_col]), ticker_col, sector_col)
+
+
+def get_sector_matrix(security_names, sector_map=None, return_sectors=False):
+    """
+    Sparse sector membership matrix.
+    Args:
+        security_names (list): Tickers, in portfolio order.
+        sector_map (dict): Ticker -> sector, e.g. from load_sector_map. Securities missing
+                           from it (all of them without a map) are in UNKNOWN_SECTOR.
+        return_sectors (bool): Also return the sector label of each row.
+    Returns:
+        scipy.sparse.csr_matrix: S x N one-hot matrix with one row per sector (sorted by name)
+                                 and one column per security, so S @ w gives sector weights.
+    """
+    from scipy import sparse
+
+    sector_map = sector_map or {}
+    labels = np.array([sector_map.get(name, UNKNOWN_SECTOR) for name in security_names], dtype=object)
+    sectors, rows = np.unique(labels.astype(str), return_inverse=True)
+    n = len(labels)
+    matrix = sparse.csr_matrix((np.ones(n), (rows, np.arange(n))), shape=(len(sectors), n))
+    if return_sectors:
+        return matrix, sectors.tolist()
+    return matrix
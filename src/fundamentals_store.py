@@ -0,0 +1,126 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.data_utils import sector_map_from_frame
+
+# Days are packed below the ticker code in one int64 key, so a single searchsorted
+# finds the latest record per (ticker, date). 2**20 days is ~2,870 years past 1970.
+_DAY_BITS = 20
+
+
+class PointInTimeFundamentals:
+    """
+    Fundamentals keyed by (ticker, availability date), stored column by column.
+    A record only becomes visible on the date it was published, so as-of joins
+    on rebalance dates never see numbers the market did not have yet.
+    """
+
+    def __init__(self, tickers, ticker_codes, available, values, columns, sectors=None):
+        """
+        Args:
+            tickers (list): Ticker of each code.
+            ticker_codes, available (np.ndarray): Ticker code and availability day of every record.
+            values (np.ndarray or list): Records x columns array, or one 1-D array per column
+                                         (e.g. memory maps, which are used as they are).
+            columns (list): Column names.
+            sectors (dict): Ticker -> sector of the latest record, for sector constraints.
+        """
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.columns = list(columns)
+        if isinstance(values, np.ndarray) and values.ndim == 2:
+            values = [values[:, j] for j in range(values.shape[1])]
+        self.ticker_codes = np.asarray(ticker_codes, dtype=np.int64)
+        self.available = np.asarray(available, dtype=np.int64)
+        self.keys = (self.ticker_codes << _DAY_BITS) | self.available
+        # Saved stores are already in key order, so their columns are never copied
+        if np.any(self.keys[1:] < self.keys[:-1]):
+            order = np.argsort(self.keys, kind='stable')
+            self.keys, self.ticker_codes, self.available = self.keys[order], self.ticker_codes[order], self.available[order]
+            values = [np.asarray(column, dtype=float)[order] for column in values]
+        self._values = dict(zip(self.columns, values))
+        self._ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.sectors = dict(sectors or {})
+
+    @classmethod
+    def from_frame(cls, df, columns, ticker_col='Ticker', available_col='Available Date',
+                   report_col='Report Date', publication_lag_days=0, sector_col='Sector'):
+        """
+        Build a store from a long DataFrame with one row per (ticker, report).
+        If `available_col` is missing, availability is `report_col` plus `publication_lag_days`.
+        Each ticker's sector is taken from `sector_col` of its latest record, if the column exists.
+        """
+        if available_col in df.columns:
+            available = pd.to_datetime(df[available_col])
+        else:
+            available = pd.to_datetime(df[report_col]) + pd.Timedelta(days=publication_lag_days)
+        codes, tickers = pd.factorize(df[ticker_col], sort=True)
+        days = available.to_numpy().astype('datetime64[D]').astype(np.int64)
+        sectors = None
+        if sector_col in df.columns:
+            latest = df.assign(_available=available.to_numpy()).sort_values("_available", kind='stable')
+            sectors = sector_map_from_frame(latest, ticker_col, sector_col)
+        return cls(tickers, codes, days, df[list(columns)].to_numpy(dtype=float), columns, sectors)
+
+    @classmethod
+    def from_snapshot(cls, df, as_of, columns, ticker_col='Ticker'):
+        """Single-snapshot fundamentals (like data/dummy_fundamentals.csv) available from `as_of`."""
+        return cls.from_frame(df.assign(**{'Available Date': pd.Timestamp(as_of)}), columns, ticker_col=ticker_col)
+
+    def save(self, path):
+        """
+        One .npy file per column plus the ticker list, so columns can be memory-mapped independently.
+        Records are written in key order, so load() needs no sorting.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "ticker_codes.npy"), self.ticker_codes.astype(np.int32))
+        np.save(os.path.join(path, "available.npy"), self.available.astype(np.int32))
+        for j, column in enumerate(self.columns):
+            np.save(os.path.join(path, f"col_{j}.npy"), np.asarray(self._values[column], dtype=float))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"tickers": self.tickers.tolist(), "columns": self.columns, "sectors": self.sectors}, f)
+
+    @classmethod
+    def load(cls, path, columns=None, mmap_mode='r'):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        columns = columns or meta["columns"]
+        # Columns stay memory-mapped; asof only reads the records it returns
+        values = [np.load(os.path.join(path, f"col_{meta['columns'].index(c)}.npy"), mmap_mode=mmap_mode)
+                  for c in columns]
+        return cls(
+            meta["tickers"],
+            np.load(os.path.join(path, "ticker_codes.npy")),
+            np.load(os.path.join(path, "available.npy")),
+            values,
+            columns,
+            meta.get("sectors"),
+        )
+
+    def asof(self, dates, tickers, columns=None, max_age_days=None):
+        """
+        Latest record available on or before each date, for every ticker, in one pass.
+        Args:
+            dates (array-like): D rebalance dates.
+            tickers (list): N tickers; unknown tickers come back as NaN.
+            columns (list): Columns to return, defaults to all.
+            max_age_days (int): Treat records older than this as missing.
+        Returns:
+            np.ndarray: D x N x F array of values, NaN where nothing was available.
+        """
+        columns = columns or self.columns
+        # Records start at 1970-01-01 (day 0), so earlier query dates simply find nothing
+        days = np.maximum(pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64), 0)
+        codes = np.array([self._ticker_index.get(t, -1) for t in tickers], dtype=np.int64)
+
+        query = (np.maximum(codes, 0)[None, :] << _DAY_BITS) | days[:, None]
+        pos = np.searchsorted(self.keys, query, side='right') - 1
+        safe = np.maximum(pos, 0)
+        # The hit must belong to the same ticker (not the previous ticker's last record)
+        found = (pos >= 0) & (self.ticker_codes[safe] == codes[None, :]) & (codes[None, :] >= 0)
+        if max_age_days is not None:
+            found &= days[:, None] - self.available[safe] <= max_age_days
+
+        out = np.stack([np.asarray(self._values[c][safe], dtype=float) for c in columns], axis=-1)
+        out[~found] = np.nan
+        return out
@@ -0,0 +1,126 @@
+import numpy as np
+
+
+def holding_periods(offsets, n_rows):
+    """Index of the rebalance in force for each return row from offsets[0] + 1 to n_rows - 1."""
+    return np.repeat(np.arange(len(offsets)), np.diff(np.append(offsets, n_rows - 1)))
+
+
+def drifted_returns(price_matrix, offsets, weight_matrix):
+    """
+    Daily returns of a portfolio that is set to `weight_matrix[k]` at price row
+    `offsets[k]` and then left to drift with prices until the next rebalance.
+    Args:
+        price_matrix (np.ndarray): T x N prices.
+        offsets (np.ndarray): Increasing price rows at which the portfolio is rebalanced.
+        weight_matrix (np.ndarray): K x N target weights, one row per offset.
+    Returns:
+        np.ndarray: Portfolio returns for price rows offsets[0] + 1 .. T - 1.
+    """
+    # Shares bought per unit of capital at each rebalance
+    shares = weight_matrix / price_matrix[offsets]
+    held = shares[holding_periods(offsets, len(price_matrix))]
+    start = offsets[0]
+    value_now = np.einsum('ij,ij->i', held, price_matrix[start + 1:])
+    value_prev = np.einsum('ij,ij->i', held, price_matrix[start:-1])
+    return value_now / value_prev - 1
+
+
+def fixed_target_returns(price_matrix, offsets, targets):
+    """
+    drifted_returns for several portfolios at once, each reset to its own fixed
+    target weights at the same rebalance rows.
+    Args:
+        price_matrix (np.ndarray): T x N prices.
+        offsets (np.ndarray): Increasing price rows at which the portfolios are rebalanced.
+        targets (np.ndarray): P x N target weights, one row per portfolio, or D x P x N with
+                              the targets set at each of the D offsets (e.g. restricted to the
+                              securities valid on the date). A portfolio with no weight at an
+                              offset has NaN returns until the next one.
+    Returns:
+        np.ndarray: (T - 1 - offsets[0]) x P returns for price rows offsets[0] + 1 .. T - 1.
+    """
+    start = offsets[0]
+    if np.ndim(targets) == 3:
+        # The targets change between rebalances, so value one holding period at a time
+        out = np.empty((len(price_matrix) - 1 - start, targets.shape[1]))
+        ends = np.append(offsets[1:], len(price_matrix) - 1)
+        for offset, end, held in zip(offsets, ends, targets):
+            with np.errstate(invalid='ignore'):
+                value = (price_matrix[offset:end + 1] / price_matrix[offset]) @ held.T
+                out[offset - start:end - start] = value[1:] / value[:-1] - 1
+        return out
+    # Price relative to the last rebalance in force, so one product values every portfolio
+    base = price_matrix[offsets[holding_periods(offsets, len(price_matrix))]]
+    value_now = (price_matrix[start + 1:] / base) @ targets.T
+    value_prev = (price_matrix[start:-1] / base) @ targets.T
+    return value_now / value_prev - 1
+
+
+def simulate_holdings(price_matrix, offsets, weight_matrix, initial_capital=1_000_000.0,
+                      cost_per_trade=0.0, cost_bps=0.0, slippage_bps=0.0, trade_tol=1e-10):
+    """
+    Carry share counts forward between rebalances and charge trading costs at each one.
+    Args:
+        price_matrix (np.ndarray): T x N prices.
+        offsets (np.ndarray): Increasing price rows at which the portfolio is rebalanced.
+        weight_matrix (np.ndarray): K x N target weights, one row per offset.
+        initial_capital (float): Starting portfolio value.
+        cost_per_trade (float): Fixed charge for every security traded at a rebalance.
+        cost_bps (float): Commission in basis points of traded notional.
+        slippage_bps (float): Slippage in basis points of traded notional.
+        trade_tol (float): Weight changes at or below this are not counted as trades.
+    Returns:
+        dict: gross_returns and net_returns (for price rows offsets[0] + 1 .. T - 1),
+              turnover, trades and costs (one per rebalance) and the share counts held.
+    """
+    offsets = np.asarray(offsets)
+    weight_matrix = np.asarray(weight_matrix, dtype=float)
+    n_rebalances = len(offsets)
+    rebalance_prices = price_matrix[offsets]
+
+    # Shares per unit of capital; the capital path is applied afterwards
+    unit_shares = weight_matrix / rebalance_prices
+
+    # Weights just before each rebalance, after drifting since the previous one
+    pre_weights = np.zeros_like(weight_matrix)
+    drifted = unit_shares[:-1] * rebalance_prices[1:]
+    pre_weights[1:] = drifted / drifted.sum(axis=1, keepdims=True)
+    trade_sizes = np.abs(weight_matrix - pre_weights)
+    turnover = trade_sizes.sum(axis=1)
+    trades = (trade_sizes > trade_tol).sum(axis=1)
+
+    # Gross daily returns of the drifting holdings
+    gross_returns = drifted_returns(price_matrix, offsets, weight_matrix)
+    period = holding_periods(offsets, len(price_matrix))
+
+    # Growth of one unit of capital over each holding period
+    period_growth = np.ones(n_rebalances)
+    np.multiply.at(period_growth, period, 1 + gross_returns)
+
+    # Only the fixed charge depends on the capital level, so this is a scalar recursion over K
+    variable_rate = (cost_bps + slippage_bps) / 1e4
+    capital_before = np.empty(n_rebalances)
+    capital_after = np.empty(n_rebalances)
+    capital = initial_capital
+    for k in range(n_rebalances):
+        capital_before[k] = capital
+        capital = capital * (1 - variable_rate * turnover[k]) - cost_per_trade * trades[k]
+        capital_after[k] = capital
+        capital *= period_growth[k]
+    costs = capital_before - capital_after
+
+    # Costs come out of the first return of each holding period
+    net_returns = gross_returns.copy()
+    first_rows = offsets - offsets[0]
+    cost_rate = costs / capital_before
+    net_returns[first_rows] = (1 + gross_returns[first_rows]) * (1 - cost_rate) - 1
+
+    return {
+        "gross_returns": gross_returns,
+        "net_returns": net_returns,
+        "turnover": turnover,
+        "trades": trades,
+        "costs": costs,
+        "shares": unit_shares * capital_after[:, None],
+    }
@@ -0,0 +1,182 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+def _market_value(shares, prices):
+    # Same contiguous row reduction for one day (1-D) and a block of days (2-D), so
+    # incremental and full-history levels are bit-for-bit identical. pandas hands out
+    # column-major arrays, whose rows would be summed in a different order.
+    return np.sum(np.ascontiguousarray(shares * prices), axis=-1)
+
+
+class IndexCalculator:
+    """
+    Divisor-based index that advances one day at a time in O(N).
+    State: share counts, divisor, last closes and level, and an optional pending
+    rebalance. Level = sum(shares * closes) / divisor; rebalances and corporate
+    actions adjust the divisor so the level does not jump.
+
+    Corporate actions, applied before the close of their ex-date:
+        {"ticker": "AAPL", "type": "split", "ratio": 4}        # shares x4, previous close / 4
+        {"ticker": "AAPL", "type": "dividend", "amount": 1.5}  # special dividend, price index
+        {"ticker": "AAPL", "type": "delist"}                   # removed at its last close
+    """
+
+    def __init__(self, tickers, base_level=1000.0):
+        self.tickers = list(tickers)
+        self._index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.base_level = base_level
+        self.shares = np.zeros(len(self.tickers))
+        self.divisor = 1.0
+        self.level = base_level
+        self.last_prices = None
+        self.last_date = None
+        self.pending = None
+
+    def schedule_rebalance(self, weights, effective_date=None):
+        """Rebalance to `weights` at the close of `effective_date` (the next advance if None)."""
+        self.pending = {
+            "date": None if effective_date is None else pd.Timestamp(effective_date),
+            "weights": np.asarray(weights, dtype=float),
+        }
+
+    def _closes(self, closes):
+        if isinstance(closes, pd.Series):
+            closes = closes.reindex(self.tickers)
+        closes = np.asarray(closes, dtype=float)
+        # Removed names may stop printing; they hold no shares
+        return np.where(self.shares == 0, np.nan_to_num(closes), closes)
+
+    def _apply_actions(self, actions):
+        for action in actions:
+            i = self._index[action["ticker"]]
+            old_value = _market_value(self.shares, self.last_prices)
+            if action["type"] == "split":
+                self.shares[i] *= action["ratio"]
+                self.last_prices[i] /= action["ratio"]
+                continue
+            if action["type"] == "dividend":
+                self.last_prices[i] -= action["amount"]
+            elif action["type"] == "delist":
+                self.shares[i] = 0.0
+            else:
+                raise ValueError(f"Unknown corporate action: {action['type']}")
+            # Keep yesterday's level unchanged under the adjusted holdings
+            self.divisor *= _market_value(self.shares, self.last_prices) / old_value
+
+    def _rebalance(self, date, closes):
+        pending = self.pending
+        if pending is None or (pending["date"] is not None and date < pending["date"]):
+            return
+        old_value = _market_value(self.shares, closes)
+        weights = pending["weights"]
+        if self.last_prices is None:
+            # First day: base the index at base_level with a divisor of 1
+            self.shares = weights * self.base_level / np.where(weights > 0, closes, 1.0)
+            self.divisor = 1.0
+        else:
+            self.shares = weights * old_value / np.where(weights > 0, closes, 1.0)
+            self.divisor *= _market_value(self.shares, closes) / old_value
+        self.pending = None
+
+    def advance(self, date, closes, actions=()):
+        """
+        Move the index to the close of `date`.
+        Args:
+            date: Trading date.
+            closes (pd.Series or np.ndarray): Closes in ticker order.
+            actions (list): Corporate actions going ex on `date`.
+        Returns:
+            float: Index level at the close.
+        """
+        date = pd.Timestamp(date)
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"{date.date()} is not after the last index date {self.last_date.date()}.")
+        closes = self._closes(closes)
+        if self.last_prices is None:
+            if self.pending is None:
+                raise ValueError("Schedule the initial rebalance before the first advance.")
+            self._rebalance(date, closes)
+            self.level = _market_value(self.shares, closes) / self.divisor
+        else:
+            self._apply_actions(actions)
+            self.level = _market_value(self.shares, closes) / self.divisor
+            self._rebalance(date, closes)
+        self.last_prices = closes
+        self.last_date = date
+        return self.level
+
+    @classmethod
+    def from_history(cls, prices, rebalances, actions=None, base_level=1000.0):
+        """
+        Full recompute over a price history, vectorized between event days.
+        Args:
+            prices (pd.DataFrame): Closes with datetime index and ticker columns.
+            rebalances (dict): Date -> target weights; the first price date must be one of them.
+            actions (dict): Date -> list of corporate actions.
+            base_level (float): Level on the first date.
+        Returns:
+            (IndexCalculator, pd.Series): Calculator positioned at the last date, and the daily levels.
+        """
+        actions = actions or {}
+        calc = cls(prices.columns, base_level=base_level)
+        price_matrix = prices.to_numpy(dtype=float)
+        dates = prices.index
+        rebalances = {pd.Timestamp(d): w for d, w in rebalances.items()}
+        actions = {pd.Timestamp(d): a for d, a in actions.items()}
+        event_rows = sorted({dates.get_loc(d) for d in list(rebalances) + list(actions) if d in dates})
+        if not event_rows or event_rows[0] != 0:
+            raise ValueError("The first price date must be a rebalance date.")
+
+        levels = np.empty(len(dates))
+        for k, row in enumerate(event_rows):
+            date = dates[row]
+            if date in rebalances:
+                calc.schedule_rebalance(rebalances[date], date)
+            levels[row] = calc.advance(date, price_matrix[row], actions.get(date, ()))
+            # Days up to the next event share the same shares and divisor
+            end = event_rows[k + 1] if k + 1 < len(event_rows) else len(dates)
+            if end > row + 1:
+                block = price_matrix[row + 1:end]
+                block = np.where(calc.shares == 0, np.nan_to_num(block), block)
+                levels[row + 1:end] = _market_value(calc.shares, block) / calc.divisor
+                calc.last_prices = block[-1]
+                calc.last_date = dates[end - 1]
+                calc.level = levels[end - 1]
+        return calc, pd.Series(levels, index=dates, name="Index Level")
+
+    def save(self, path):
+        """Persist the state as JSON; floats round-trip exactly."""
+        state = {
+            "tickers": self.tickers,
+            "base_level": self.base_level,
+            "shares": self.shares.tolist(),
+            "divisor": self.divisor,
+            "level": self.level,
+            "last_prices": None if self.last_prices is None else self.last_prices.tolist(),
+            "last_date": None if self.last_date is None else self.last_date.isoformat(),
+            "pending": None if self.pending is None else {
+                "date": None if self.pending["date"] is None else self.pending["date"].isoformat(),
+                "weights": self.pending["weights"].tolist(),
+            },
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            state = json.load(f)
+        calc = cls(state["tickers"], base_level=state["base_level"])
+        calc.shares = np.array(state["shares"])
+        calc.divisor = state["divisor"]
+        calc.level = state["level"]
+        calc.last_prices = None if state["last_prices"] is None else np.array(state["last_prices"])
+        calc.last_date = None if state["last_date"] is None else pd.Timestamp(state["last_date"])
+        if state["pending"] is not None:
+            calc.schedule_rebalance(state["pending"]["weights"], state["pending"]["date"])
+        return calc
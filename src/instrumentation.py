@@ -0,0 +1,104 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Profiler collecting stage timings and counters, None when instrumentation is off.
+# The hooks below are no-ops in that case, so hot paths can call them unconditionally.
+_ACTIVE = None
+
+
+class Profiler:
+    """
+    Per-stage wall time and call counts, named counters, and (with trace_memory)
+    the peak traced memory of each stage in bytes.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+        self.peak_memory = {}
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            # Fold the enclosing stage's peak so far into it before resetting the peak
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        frame = [name, 0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+            self._stack.pop()
+            if self.trace_memory:
+                peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+    def add_time(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        """Plain dict, ready for json.dump."""
+        report = {
+            "timings": {name: round(seconds, 6) for name, seconds in self.timings.items()},
+            "calls": dict(self.calls),
+            "counters": dict(self.counters),
+        }
+        if self.trace_memory:
+            report["peak_memory_bytes"] = dict(self.peak_memory)
+        return report
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+@contextmanager
+def profiling(profiler=None, trace_memory=False):
+    """
+    Turn instrumentation on for the duration of the block.
+        with profiling() as profiler:
+            main()
+        print(profiler.report())
+    """
+    global _ACTIVE
+    profiler = profiler or Profiler(trace_memory=trace_memory)
+    previous = _ACTIVE
+    started_tracing = profiler.trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _ACTIVE = profiler
+    try:
+        yield profiler
+    finally:
+        _ACTIVE = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def stage(name):
+    """Time a block as `name` when profiling is on."""
+    return _ACTIVE.stage(name) if _ACTIVE is not None else nullcontext()
+
+
+def count(name, n=1):
+    if _ACTIVE is not None:
+        _ACTIVE.count(name, n)
+
+
+def add_time(name, seconds):
+    if _ACTIVE is not None:
+        _ACTIVE.add_time(name, seconds)
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from src.analytics import TRADING_DAYS, return_stats, tracking_error
+from src.price_panel import as_price_frame
+from src.shared_arrays import attached, map_attached, shared_arrays
+
+
+def block_bootstrap_rows(rng, n_paths, horizon, n_rows, block_size):
+    """
+    Row indices for circular block-bootstrap paths: blocks of `block_size` consecutive
+    days starting at random rows, so short-range autocorrelation and the cross-section
+    of each day are kept.
+    Returns:
+        np.ndarray: n_paths x horizon indices into the historical return rows.
+    """
+    n_blocks = -(-horizon // block_size)
+    starts = rng.integers(0, n_rows, size=(n_paths, n_blocks))
+    rows = (starts[:, :, None] + np.arange(block_size)) % n_rows
+    return rows.reshape(n_paths, -1)[:, :horizon]
+
+
+def fit_garch(returns, alpha=0.08, beta=0.9):
+    """
+    GARCH(1,1) filter for every column with variance targeting: omega is set so the
+    long-run variance equals the sample variance, alpha and beta are fixed.
+    Args:
+        returns (np.ndarray): T x N daily returns.
+    Returns:
+        dict: mean, omega, alpha, beta, the variance forecast for the next day and the
+              standardized residuals (T x N) that the simulation resamples.
+    """
+    mean = returns.mean(axis=0)
+    eps = returns - mean
+    long_run = eps.var(axis=0)
+    omega = long_run * (1 - alpha - beta)
+    variance = np.empty_like(eps)
+    variance[0] = long_run
+    for t in range(1, len(eps)):
+        variance[t] = omega + alpha * eps[t - 1] ** 2 + beta * variance[t - 1]
+    residuals = eps / np.sqrt(np.where(variance > 0, variance, 1))
+    return {"mean": mean, "omega": omega, "alpha": alpha, "beta": beta,
+            "next_variance": omega + alpha * eps[-1] ** 2 + beta * variance[-1], "residuals": residuals}
+
+
+def garch_paths(rng, model, n_paths, horizon):
+    """
+    Filtered historical simulation: whole days of standardized residuals are drawn
+    (keeping cross-sectional correlation) and rescaled by each path's own GARCH variance.
+    Returns:
+        np.ndarray: n_paths x horizon x N returns.
+    """
+    residuals = model["residuals"]
+    variance = np.broadcast_to(model["next_variance"], (n_paths, residuals.shape[1])).copy()
+    rows = rng.integers(0, len(residuals), size=(n_paths, horizon))
+    out = np.empty((n_paths, horizon, residuals.shape[1]))
+    for t in range(horizon):
+        eps = np.sqrt(variance) * residuals[rows[:, t]]
+        out[:, t] = model["mean"] + eps
+        variance = model["omega"] + model["alpha"] * eps ** 2 + model["beta"] * variance
+    return out
+
+
+def portfolio_paths(returns, weights, rebalance_every=21, cost_bps=0.0):
+    """
+    Returns of fixed-target portfolios over many paths at once. Holdings drift with
+    prices and are reset to target every `rebalance_every` days.
+    Args:
+        returns (np.ndarray): B x L x N asset returns.
+        weights (np.ndarray): K x N target weights, one row per strategy.
+        cost_bps (float): Cost in basis points of traded notional at each reset.
+    Returns:
+        np.ndarray: B x K x L portfolio returns.
+    """
+    n_paths, horizon, n = returns.shape
+    h = rebalance_every
+    n_periods = -(-horizon // h)
+    # Pad with zero returns to whole holding periods
+    padded = np.zeros((n_paths, n_periods * h, n))
+    padded[:, :horizon] = returns
+    growth = np.cumprod(1 + padded.reshape(n_paths, n_periods, h, n), axis=2)
+    # Portfolio value within each period, starting from 1
+    value = growth @ weights.T                                   # B x P x h x K
+    previous = np.concatenate([np.ones_like(value[:, :, :1]), value[:, :, :-1]], axis=2)
+    pf = value / previous - 1
+    if cost_bps:
+        # Trading back to target at the end of each period, charged on the next day
+        drifted = growth[:, :, -1, None, :] * weights             # B x P x K x N
+        drifted /= drifted.sum(axis=-1, keepdims=True)
+        turnover = np.abs(weights - drifted).sum(axis=-1)         # B x P x K
+        cost = np.zeros_like(turnover)
+        cost[:, 1:] = turnover[:, :-1] * cost_bps / 10_000
+        pf[:, :, 0] = (1 + pf[:, :, 0]) * (1 - cost) - 1
+    return pf.reshape(n_paths, n_periods * h, -1).transpose(0, 2, 1)[:, :, :horizon]
+
+
+def path_stats(pf, benchmark=None, periods_per_year=TRADING_DAYS):
+    """
+    Statistics for every path and strategy.
+    Args:
+        pf (np.ndarray): B x K x L portfolio returns.
+        benchmark (np.ndarray): B x L benchmark returns on the same paths.
+    Returns:
+        dict: Statistic name -> B x K array.
+    """
+    stats = return_stats(pf, periods_per_year)
+    if benchmark is not None:
+        stats["Tracking Error"] = tracking_error(pf - benchmark[:, None, :], periods_per_year)
+    return stats
+
+
+def run_batch(task):
+    """Simulate one batch of paths against the arrays attached in this process."""
+    seed, n_paths = task
+    rng = np.random.default_rng(seed)
+    shared = attached()
+    returns = shared["returns"]
+    horizon = shared["horizon"]
+    if shared["method"] == "garch":
+        model = dict(shared["garch"], residuals=shared["residuals"])
+        paths = garch_paths(rng, model, n_paths, horizon)
+    else:
+        paths = returns[block_bootstrap_rows(rng, n_paths, horizon, len(returns), shared["block_size"])]
+    benchmark = None
+    if shared["has_benchmark"]:
+        # The benchmark is simulated as the last column, jointly with the assets
+        paths, benchmark = paths[..., :-1], paths[..., -1]
+    pf = portfolio_paths(paths, shared["weights"], shared["rebalance_every"], shared["cost_bps"])
+    return path_stats(pf, benchmark)
+
+
+def simulate(prices, strategies, n_paths=1000, horizon=TRADING_DAYS, method="block", block_size=21,
+             rebalance_every=21, benchmark=None, cost_bps=0.0, batch_size=128, seed=0, max_workers=None,
+             garch_params=None):
+    """
+    Monte Carlo robustness study: simulate return paths from the price history and run
+    every strategy over all of them.
+    Batches get child seeds of one SeedSequence, so results depend only on `seed`,
+    `n_paths` and `batch_size`, not on how many processes run them.
+    Args:
+        prices (pd.DataFrame or PricePanel): Price history with datetime index and ticker columns.
+        strategies (dict): Strategy name -> target weights over the price columns.
+        n_paths (int): Number of simulated paths.
+        horizon (int): Days per path.
+        method (str): "block" (circular block bootstrap) or "garch" (filtered historical simulation).
+        block_size (int): Days per bootstrap block.
+        rebalance_every (int): Days between resets to target weights.
+        benchmark (pd.Series): Benchmark levels, simulated jointly for tracking error.
+        cost_bps (float): Trading cost in basis points of traded notional.
+        batch_size (int): Paths simulated together; bounds memory at about
+                          batch_size x horizon x N floats per worker.
+        seed (int): Seed of the whole study.
+        max_workers (int): Worker processes, defaults to os.cpu_count().
+        garch_params (dict): alpha and beta for fit_garch.
+    Returns:
+        dict: Statistic name -> DataFrame (paths x strategies).
+    """
+    if method not in ("block", "garch"):
+        raise ValueError(f"Unknown simulation method: {method}")
+    prices = as_price_frame(prices).dropna()
+    levels = prices.to_numpy(dtype=float)
+    if benchmark is not None:
+        bench_levels = benchmark.sort_index().reindex(prices.index).to_numpy(dtype=float)
+        levels = np.column_stack([levels, bench_levels])
+    returns = levels[1:] / levels[:-1] - 1
+    returns = returns[~np.isnan(returns).any(axis=1)]
+    names = list(strategies)
+    weights = np.vstack([np.asarray(strategies[name], dtype=float) for name in names])
+
+    arrays = {"returns": returns, "weights": weights}
+    context = {"method": method, "horizon": horizon, "block_size": block_size, "rebalance_every": rebalance_every,
+               "cost_bps": cost_bps, "has_benchmark": benchmark is not None}
+    if method == "garch":
+        model = fit_garch(returns, **(garch_params or {}))
+        arrays["residuals"] = model.pop("residuals")
+        context["garch"] = model
+
+    sizes = [min(batch_size, n_paths - start) for start in range(0, n_paths, batch_size)]
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+    with shared_arrays(arrays, context) as initargs:
+        batches = map_attached(run_batch, tasks, initargs, max_workers)
+
+    return {
+        stat: pd.DataFrame(np.concatenate([batch[stat] for batch in batches]), columns=names)
+        for stat in batches[0]
+    }
+
+
+def summarize(results, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+    """
+    Distribution summary of a simulate() result.
+    Returns:
+        pd.DataFrame: One row per (statistic, strategy) with the mean, standard deviation and quantiles.
+    """
+    rows = {}
+    for stat, frame in results.items():
+        summary = frame.quantile(list(quantiles)).T
+        summary.columns = [f"p{int(round(q * 100))}" for q in quantiles]
+        summary.insert(0, "std", frame.std())
+        summary.insert(0, "mean", frame.mean())
+        rows[stat] = summary
+    return pd.concat(rows, names=["Statistic", "Strategy"])
@@ -1,6 +1,20 @@
 import pandas as pd
 import numpy as np
-from src.backtester import backtest_portfolio, calculate_performance
+from src.analytics import performance_stats
+from src.backtester import backtest_portfolio
+
+def load_indxx_benchmark(indxx_file, column='Rebba Value'):
+    """
+    Read the Indxx 500 sheet once so it can be shared across strategy runs and sweeps.
+    Returns:
+        pd.Series: Benchmark values indexed by date.
+    """
+    indxx_df = pd.read_excel(indxx_file)
+    indxx_df['Date'] = pd.to_datetime(indxx_df['Date'])
+    indxx_df = indxx_df.set_index('Date')
+    indxx_df = indxx_df.sort_index()
+    return indxx_df[column]
+
 
 def run_multiple_strategies(prices, scores, sector_matrix, indxx_file):
     """
@@ -9,16 +23,16 @@ def run_multiple_strategies(prices, scores, sector_matrix, indxx_file):
         prices (pd.DataFrame): Price data with datetime index and ticker columns.
         scores (pd.Series): Fundamental score for each ticker.
         sector_matrix (pd.DataFrame): Ticker vs sector matrix.
-        indxx_file (str or BytesIO): Path or uploaded file for Indxx 500 final analysis sheet.
+        indxx_file (str, BytesIO or pd.Series): Path or uploaded file for Indxx 500 final analysis sheet,
+            or the series already returned by load_indxx_benchmark.
     Returns:
         dict: Dictionary with output for each strategy including universe, weights, index series, performance metrics.
     """
     tickers = prices.columns.tolist()
-    indxx_df = pd.read_excel(indxx_file)
-    indxx_df['Date'] = pd.to_datetime(indxx_df['Date'])
-    indxx_df = indxx_df.set_index('Date')
-    indxx_df = indxx_df.sort_index()
-    rebba_series = indxx_df['Rebba Value']
+    if isinstance(indxx_file, pd.Series):
+        rebba_series = indxx_file
+    else:
+        rebba_series = load_indxx_benchmark(indxx_file)
 
     strategies = {
         "Equal Weight": pd.Series(1 / len(tickers), index=tickers),
@@ -28,6 +42,7 @@ def run_multiple_strategies(prices, scores, sector_matrix, indxx_file):
     }
 
     final_outputs = {}
+    strategy_returns = {}
     for strategy_name, weights in strategies.items():
         weights = weights.reindex(tickers).fillna(0)
         weights = weights / weights.sum()
@@ -37,23 +52,22 @@ def run_multiple_strategies(prices, scores, sector_matrix, indxx_file):
             "Sector Matrix Shape": sector_matrix.shape
         }
         weight_dict = weights.round(6).to_dict()
-        returns, daily_weights = backtest_portfolio(prices, lambda *_: weights, rebalance_freq='M')
+        returns, daily_weights = backtest_portfolio(prices, lambda *_: weights, rebalance_freq='ME')
+        strategy_returns[strategy_name] = returns
         index_value = (1 + returns).cumprod()
         index_value.name = strategy_name
-        combined = pd.DataFrame({
-            "Strategy Index": index_value,
-            "Rebba Value": rebba_series
-        }).dropna()
-        perf = calculate_performance(combined["Strategy Index"])
-        perf.update({
-            "Correlation with Rebba": combined["Strategy Index"].corr(combined["Rebba Value"]),
-            "Tracking Error": np.sqrt(((combined["Strategy Index"] - combined["Rebba Value"]) ** 2).mean())
-        })
         final_outputs[strategy_name] = {
             "Universe": universe,
             "Parameter Values": parameter_values,
             "Weights": weight_dict,
             "Index Value Series": index_value,
-            "Performance Analysis": perf
         }
+
+    # All strategies against the benchmark's daily returns in one pass
+    strategy_returns = pd.DataFrame(strategy_returns)
+    stats = performance_stats(strategy_returns, benchmark=rebba_series.pct_change())
+    for strategy_name, row in stats.round(4).iterrows():
+        perf = row.to_dict()
+        perf["Correlation with Rebba"] = perf.pop("Correlation")
+        final_outputs[strategy_name]["Performance Analysis"] = perf
     return final_outputs
@@ -1,7 +1,13 @@
-import cvxpy as cp
+import time
 import numpy as np
+from src import instrumentation
+from src.price_panel import PricePanel
 
-def optimize_weights(expected_returns, covariance_matrix, max_weight=0.6):
+def optimize_weights(expected_returns, covariance_matrix, max_weight=0.6, sector_matrix=None, sector_cap=None,
+                     factor_exposures=None, factor_bounds=None):
+    import cvxpy as cp  # imported on first use, it dominates startup time
+
+    covariance_matrix = _as_covariance(covariance_matrix)
     # Ensure covariance_matrix is symmetric
     covariance_matrix = 0.5 * (covariance_matrix + covariance_matrix.T)
     n = len(expected_returns)
@@ -16,14 +22,199 @@ def optimize_weights(expected_returns, covariance_matrix, max_weight=0.6):
         weights >= 0,
         weights <= max_weight
     ]
+    constraints += _sector_factor_constraints(weights, sector_matrix, sector_cap, factor_exposures, factor_bounds)
 
     problem = cp.Problem(objective, constraints)
+    start = time.perf_counter()
     problem.solve()
+    instrumentation.add_time("optimizer.solve", time.perf_counter() - start)
 
     if weights.value is not None:
         return weights.value
-    else:
-        print("expected_returns:", expected_returns)
-        print("covariance_matrix:", covariance_matrix)
-        print("max_weight:", max_weight)
-        raise ValueError("Optimization failed. Check your input data.")
+    raise ValueError(f"Optimization failed ({problem.status}). Check your input data: "
+                     f"expected_returns={np.round(expected_returns, 4).tolist()}, "
+                     f"covariance_matrix of shape {covariance_matrix.shape}, max_weight={max_weight}, "
+                     f"sector_cap={sector_cap}, factor_bounds={factor_bounds}")
+
+
+def _sector_factor_constraints(weights, sector_matrix=None, sector_cap=None, factor_exposures=None, factor_bounds=None):
+    # sector_matrix is the sparse S x N one-hot from get_sector_matrix, so this adds S rows, not N
+    constraints = []
+    if sector_matrix is not None and sector_cap is not None:
+        constraints.append(sector_matrix @ weights <= sector_cap)
+    if factor_exposures is not None and factor_bounds is not None:
+        lower, upper = factor_bounds
+        exposure = np.asarray(factor_exposures) @ weights
+        if lower is not None:
+            constraints.append(exposure >= lower)
+        if upper is not None:
+            constraints.append(exposure <= upper)
+    return constraints
+
+
+def _as_covariance(covariance_matrix):
+    # A price panel stands for the sample covariance of its daily returns
+    if isinstance(covariance_matrix, PricePanel):
+        returns = covariance_matrix.returns()
+        return np.cov(returns[~np.isnan(returns).any(axis=1)], rowvar=False)
+    return covariance_matrix
+
+
+def covariance_factor(covariance_matrix):
+    """
+    Factor F with F.T @ F equal to the PSD part of a covariance matrix.
+    Negative eigenvalues from noisy estimates are clipped to zero.
+    """
+    covariance_matrix = 0.5 * (covariance_matrix + covariance_matrix.T)
+    eigvals, eigvecs = np.linalg.eigh(covariance_matrix)
+    return np.sqrt(np.clip(eigvals, 0, None))[:, None] * eigvecs.T
+
+
+class MeanVarianceOptimizer:
+    """
+    Long-only mean-variance problem built once and re-solved with new data.
+    Expected returns, the covariance factor and the per-asset caps are cvxpy
+    Parameters, so repeated solves skip problem construction and canonicalization
+    and are warm-started from the previous solution.
+    """
+
+    def __init__(self, n_assets, n_factors=None, risk_aversion=0.1, solver=None, sector_matrix=None,
+                 n_exposures=0):
+        """
+        Args:
+            n_assets (int): Number of securities.
+            n_factors (int): Rows of the covariance factor, defaults to n_assets.
+            risk_aversion (float): Weight of the variance term.
+            solver (str): cvxpy solver name, e.g. "OSQP" or "CLARABEL".
+            sector_matrix (scipy.sparse matrix): S x N sector membership, fixed for the universe.
+            n_exposures (int): Number of factor-exposure constraints to reserve.
+        """
+        import cvxpy as cp
+
+        self.n_assets = n_assets
+        self.n_factors = n_factors or n_assets
+        self.solver = solver
+        self.weights = cp.Variable(n_assets)
+        self.expected_returns = cp.Parameter(n_assets)
+        # Covariance = factor.T @ factor, so the risk term never needs the dense N x N matrix
+        self.factor = cp.Parameter((self.n_factors, n_assets))
+        # Square root of the diagonal specific variance, for factor-model covariances
+        self.specific_risk = cp.Parameter(n_assets, nonneg=True)
+        self.caps = cp.Parameter(n_assets, nonneg=True)
+
+        risk = cp.sum_squares(self.factor @ self.weights) + cp.sum_squares(cp.multiply(self.specific_risk, self.weights))
+        objective = cp.Maximize(self.expected_returns @ self.weights - risk_aversion * risk)
+        constraints = [
+            cp.sum(self.weights) == 1,
+            self.weights >= 0,
+            self.weights <= self.caps,
+        ]
+        self.sector_caps = None
+        if sector_matrix is not None:
+            # Uncapped sectors are given a cap of 1, which never binds
+            self.sector_caps = cp.Parameter(sector_matrix.shape[0], nonneg=True)
+            constraints.append(sector_matrix @ self.weights <= self.sector_caps)
+        self.exposures = None
+        if n_exposures:
+            self.exposures = cp.Parameter((n_exposures, n_assets))
+            self.exposure_lower = cp.Parameter(n_exposures)
+            self.exposure_upper = cp.Parameter(n_exposures)
+            constraints += [
+                self.exposures @ self.weights >= self.exposure_lower,
+                self.exposures @ self.weights <= self.exposure_upper,
+            ]
+        self.problem = cp.Problem(objective, constraints)
+        self.stats = {"solves": 0, "setup_time": 0.0, "solve_time": 0.0, "wall_time": 0.0}
+
+    def _set_factor(self, covariance_matrix=None, factor=None, specific_variance=None):
+        if factor is None:
+            factor = covariance_factor(np.asarray(_as_covariance(covariance_matrix), dtype=float))
+        factor = np.asarray(factor, dtype=float)
+        if factor.shape[0] > self.n_factors:
+            raise ValueError(f"Covariance factor has {factor.shape[0]} rows, optimizer was built for {self.n_factors}.")
+        if factor.shape[0] < self.n_factors:
+            # Pad low-rank factors with zero rows to the parameter shape
+            factor = np.vstack([factor, np.zeros((self.n_factors - factor.shape[0], self.n_assets))])
+        self.factor.value = factor
+        if specific_variance is None:
+            self.specific_risk.value = np.zeros(self.n_assets)
+        else:
+            self.specific_risk.value = np.sqrt(np.asarray(specific_variance, dtype=float))
+
+    def solve(self, expected_returns, covariance_matrix=None, factor=None, max_weight=0.6, sector_cap=1.0,
+              factor_exposures=None, factor_bounds=None, specific_variance=None):
+        """
+        Args:
+            expected_returns (np.ndarray): Length-N expected returns or scores.
+            covariance_matrix (np.ndarray or PricePanel): N x N covariance, or a price panel whose
+                daily return covariance is used; ignored when `factor` is given.
+            factor (np.ndarray): K x N covariance factor with covariance = factor.T @ factor.
+            max_weight (float or np.ndarray): Cap for every asset or per asset.
+            sector_cap (float or np.ndarray): Cap for every sector or per sector.
+            factor_exposures (np.ndarray): n_exposures x N exposures of each security.
+            factor_bounds (tuple): (lower, upper) bounds on the portfolio exposures.
+            specific_variance (np.ndarray): Length-N diagonal added to factor.T @ factor,
+                                            as returned by the covariance estimators.
+        Returns:
+            np.ndarray: Optimal weights.
+        """
+        self.expected_returns.value = np.asarray(expected_returns, dtype=float)
+        self._set_factor(covariance_matrix, factor, specific_variance)
+        self.caps.value = np.broadcast_to(np.asarray(max_weight, dtype=float), (self.n_assets,)).copy()
+        if self.sector_caps is not None:
+            self.sector_caps.value = np.broadcast_to(np.asarray(sector_cap, dtype=float), self.sector_caps.shape).copy()
+        if self.exposures is not None:
+            n_exposures = self.exposures.shape[0]
+            lower, upper = factor_bounds if factor_bounds is not None else (None, None)
+            self.exposures.value = np.asarray(factor_exposures, dtype=float).reshape(n_exposures, self.n_assets)
+            self.exposure_lower.value = np.full(n_exposures, -1e6) if lower is None else np.broadcast_to(lower, (n_exposures,)).astype(float)
+            self.exposure_upper.value = np.full(n_exposures, 1e6) if upper is None else np.broadcast_to(upper, (n_exposures,)).astype(float)
+
+        start = time.perf_counter()
+        self.problem.solve(solver=self.solver, warm_start=True)
+        elapsed = time.perf_counter() - start
+        self.stats["wall_time"] += elapsed
+        instrumentation.add_time("optimizer.solve", elapsed)
+        self.stats["solves"] += 1
+        solver_stats = self.problem.solver_stats
+        if solver_stats is not None:
+            self.stats["setup_time"] += solver_stats.setup_time or 0.0
+            self.stats["solve_time"] += solver_stats.solve_time or 0.0
+
+        if self.weights.value is None or self.problem.status not in ("optimal", "optimal_inaccurate"):
+            raise ValueError(f"Optimization failed ({self.problem.status}). Check your input data.")
+        return self.weights.value.copy()
+
+    def solve_batch(self, expected_returns, covariance_matrices=None, factors=None, max_weight=0.6, sector_cap=1.0,
+                    specific_variances=None):
+        """
+        Solve every rebalance date of a backtest in one call.
+        Args:
+            expected_returns (np.ndarray): D x N expected returns, one row per date.
+            covariance_matrices (np.ndarray): D x N x N covariances, ignored when `factors` is given.
+            factors (np.ndarray): D x K x N covariance factors.
+            max_weight (float or np.ndarray): Scalar, length-N or D x N caps.
+            sector_cap (float or np.ndarray): Cap for every sector or per sector.
+            specific_variances (np.ndarray): D x N diagonals that go with `factors`.
+        Returns:
+            np.ndarray: D x N optimal weights.
+        """
+        expected_returns = np.asarray(expected_returns, dtype=float)
+        caps = np.broadcast_to(np.asarray(max_weight, dtype=float), expected_returns.shape)
+        weights = np.empty_like(expected_returns)
+        for d in range(len(expected_returns)):
+            weights[d] = self.solve(
+                expected_returns[d],
+                covariance_matrix=None if covariance_matrices is None else covariance_matrices[d],
+                factor=None if factors is None else factors[d],
+                max_weight=caps[d],
+                sector_cap=sector_cap,
+                specific_variance=None if specific_variances is None else specific_variances[d],
+            )
+        return weights
+
+    def summary(self):
+        """Solve counts and cumulative timings in seconds."""
+        stats = dict(self.stats)
+        stats["mean_wall_time"] = stats["wall_time"] / stats["solves"] if stats["solves"] else 0.0
+        return stats
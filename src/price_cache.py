@@ -0,0 +1,167 @@
+import os
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = "data/price_cache"
+
+
+def _to_day(value):
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+def _ticker_path(cache_dir, ticker):
+    return os.path.join(cache_dir, f"{ticker.replace('/', '_')}.npy")
+
+
+# Each ticker is one float64 .npy of shape (M + 1, 2): row 0 holds the fetched
+# [covered_start, covered_end) range and rows 1.. hold (day, close), with days
+# counted from 1970-01-01. Plain .npy loads several times faster than .npz.
+def read_ticker(cache_dir, ticker):
+    """
+    Read one ticker's cached closes.
+    Returns:
+        dict or None: dates (datetime64[D]), close (float64) and the [covered_start, covered_end)
+                      range that has already been fetched, or None if the ticker is not cached.
+    """
+    path = _ticker_path(cache_dir, ticker)
+    if not os.path.exists(path):
+        return None
+    table = np.load(path)
+    covered = table[0].astype(np.int64).astype('datetime64[D]')
+    return {
+        "dates": table[1:, 0].astype(np.int64).astype('datetime64[D]'),
+        "close": table[1:, 1],
+        "covered_start": covered[0],
+        "covered_end": covered[1],
+    }
+
+
+def write_ticker(cache_dir, ticker, dates, close, covered_start, covered_end):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _ticker_path(cache_dir, ticker)
+    table = np.empty((len(dates) + 1, 2))
+    table[0] = np.array([covered_start, covered_end], dtype='datetime64[D]').astype(np.int64)
+    table[1:, 0] = dates.astype('datetime64[D]').astype(np.int64)
+    table[1:, 1] = close
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, table)
+    # Atomic swap so a crashed refresh never leaves a half-written file
+    os.replace(tmp_path, path)
+
+
+def missing_ranges(entry, start, end):
+    """
+    Half-open [start, end) ranges not yet covered by a cache entry. A request that does
+    not touch the covered range is extended up to it, so the entry always covers one
+    contiguous range and no gap is ever marked as fetched.
+    """
+    if entry is None:
+        return [(start, end)]
+    ranges = []
+    if start < entry["covered_start"]:
+        ranges.append((start, entry["covered_start"]))
+    if end > entry["covered_end"]:
+        ranges.append((entry["covered_end"], end))
+    return ranges
+
+
+def _merge(entry, fetched, start, end):
+    dates = fetched.index.values.astype('datetime64[D]')
+    close = fetched.to_numpy(dtype=float)
+    keep = ~np.isnan(close)
+    dates, close = dates[keep], close[keep]
+    if entry is None or start >= entry["covered_end"]:
+        # A range reaching past the last close returned (into the future, or a day the source
+        # has not published yet) only counts as fetched up to that close and never past today,
+        # so the next refresh asks for the closes after it
+        last = dates.max() + 1 if len(dates) else start
+        end = min(end, last, _to_day(pd.Timestamp.today()))
+    if entry is None:
+        return dates, close, start, end
+    # missing_ranges only hands out ranges adjacent to the covered one, so the union stays contiguous
+    # Fresh values go first so np.unique keeps them over cached ones on the same date
+    all_dates = np.concatenate([dates, entry["dates"]])
+    all_close = np.concatenate([close, entry["close"]])
+    all_dates, first = np.unique(all_dates, return_index=True)
+    return (all_dates, all_close[first],
+            min(start, entry["covered_start"]), max(end, entry["covered_end"]))
+
+
+def refresh_cache(tickers, start, end, fetch_fn, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Fetch only the date ranges that are not cached yet and store them.
+    Tickers with identical missing ranges are fetched in one fetch_fn call.
+    Args:
+        tickers (list): Ticker symbols.
+        start, end: Requested [start, end) date range.
+        fetch_fn (callable): fetch_fn(tickers, start, end) -> wide DataFrame of closes.
+        cache_dir (str): Directory holding one .npy file per ticker.
+    Returns:
+        dict: Cache entries keyed by ticker.
+    """
+    start, end = _to_day(start), _to_day(end)
+    entries = {ticker: read_ticker(cache_dir, ticker) for ticker in tickers}
+
+    requests = {}
+    for ticker, entry in entries.items():
+        for gap in missing_ranges(entry, start, end):
+            requests.setdefault(gap, []).append(ticker)
+
+    for (gap_start, gap_end), batch in requests.items():
+        fetched = fetch_fn(batch, pd.Timestamp(gap_start), pd.Timestamp(gap_end))
+        for ticker in batch:
+            # Tickers the source did not return (yfinance gives failed downloads as all-NaN
+            # columns) stay uncovered and are retried next time
+            if ticker not in fetched.columns:
+                continue
+            series = fetched[ticker].loc[pd.Timestamp(gap_start):pd.Timestamp(gap_end) - pd.Timedelta(days=1)]
+            if series.isna().all():
+                continue
+            merged = _merge(entries[ticker], series, gap_start, gap_end)
+            write_ticker(cache_dir, ticker, *merged)
+            entries[ticker] = dict(zip(("dates", "close", "covered_start", "covered_end"), merged))
+    return entries
+
+
+def load_cached_prices(tickers, start, end, cache_dir=DEFAULT_CACHE_DIR, entries=None):
+    """
+    Assemble a wide close-price DataFrame for [start, end) from the cache only.
+    """
+    start, end = _to_day(start), _to_day(end)
+    if entries is None:
+        entries = {ticker: read_ticker(cache_dir, ticker) for ticker in tickers}
+    slices = {}
+    for ticker in tickers:
+        entry = entries.get(ticker)
+        if entry is None:
+            continue
+        lo, hi = np.searchsorted(entry["dates"], [start, end])
+        slices[ticker] = (entry["dates"][lo:hi], entry["close"][lo:hi])
+    if not slices:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="Date"))
+
+    # Align every ticker on the union of dates with one preallocated matrix
+    all_dates = None
+    for dates, _ in slices.values():
+        # Most tickers share a calendar, so only merge when the dates differ
+        if all_dates is None:
+            all_dates = dates
+        elif not np.array_equal(all_dates, dates):
+            all_dates = np.union1d(all_dates, dates)
+    matrix = np.full((len(all_dates), len(slices)), np.nan)
+    for j, (dates, close) in enumerate(slices.values()):
+        matrix[np.searchsorted(all_dates, dates), j] = close
+    return pd.DataFrame(matrix, index=pd.DatetimeIndex(all_dates, name="Date"), columns=list(slices))
+
+
+def csv_price_source(path):
+    """
+    Offline fetch_fn backed by a wide `data/price_data.csv`-style file (Date + one column per ticker).
+    """
+    prices = pd.read_csv(path, parse_dates=["Date"]).set_index("Date").sort_index()
+
+    def fetch(tickers, start, end):
+        window = prices.loc[start:end - pd.Timedelta(days=1)]
+        return window[[t for t in tickers if t in window.columns]]
+
+    return fetch
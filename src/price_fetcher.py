@@ -1,9 +1,166 @@
-import yfinance as yf
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
+from src.price_cache import load_cached_prices, refresh_cache
+
+FMP_BASE_URL = "https://financialmodelingprep.com/api/v3"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: at most `rate` acquisitions per second on average,
+    with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchError(Exception):
+    """A fetch that should not be retried (bad ticker, malformed payload, 4xx)."""
+
+
+def pooled_session(max_workers):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_concurrently(batches, fetch_batch, max_workers=8, rate_limiter=None, retries=3, backoff=0.5):
+    """
+    Run fetch_batch over ticker batches on a thread pool.
+    Args:
+        batches (list): Lists of tickers; each list is one request.
+        fetch_batch (callable): fetch_batch(tickers) -> wide DataFrame of closes.
+        max_workers (int): Maximum number of requests in flight.
+        rate_limiter (TokenBucket): Acquired once per request attempt, including retries.
+        retries (int): Extra attempts after a retryable failure.
+        backoff (float): Base delay in seconds, doubled after each failed attempt.
+    Returns:
+        (pd.DataFrame, dict): Closes for every ticker that came back and an error message per failed ticker.
+    """
+    def run(batch):
+        for attempt in range(retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                return fetch_batch(batch), None
+            except FetchError as e:
+                return None, str(e)
+            except Exception as e:
+                if attempt == retries:
+                    return None, f"{type(e).__name__}: {e}"
+                time.sleep(backoff * 2 ** attempt)
+
+    frames = []
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for batch, (frame, error) in zip(batches, pool.map(run, batches)):
+            if error is not None:
+                failures.update({ticker: error for ticker in batch})
+                continue
+            # yfinance reports unknown tickers as all-NaN columns rather than errors
+            frame = frame.dropna(axis=1, how='all')
+            frames.append(frame)
+            failures.update({ticker: "No data returned" for ticker in batch if ticker not in frame.columns})
+    prices = pd.concat(frames, axis=1, sort=True) if frames else pd.DataFrame()
+    return prices, failures
+
+
+def fmp_close(session, tickers, start, end, api_key, base_url=FMP_BASE_URL, timeout=10):
+    # The history endpoint takes comma-separated symbols; several come back as a "historicalStockList"
+    url = f"{base_url}/historical-price-full/{','.join(tickers)}"
+    params = {"from": pd.Timestamp(start).date(), "to": pd.Timestamp(end).date(), "apikey": api_key}
+    r = session.get(url, params=params, timeout=timeout)
+    if r.status_code in RETRYABLE_STATUS:
+        r.raise_for_status()
+    if r.status_code != 200:
+        raise FetchError(f"HTTP {r.status_code}")
+    data = r.json()
+    records = data.get('historicalStockList', [data] if 'historical' in data else [])
+    records = [record for record in records if record.get('historical')]
+    if not records:
+        raise FetchError("Data not available")
+    closes = []
+    for record in records:
+        hist = pd.DataFrame(record['historical'], columns=['date', 'close'])
+        closes.append(pd.Series(hist['close'].to_numpy(dtype=float), index=pd.to_datetime(hist['date']),
+                                name=record['symbol']).sort_index())
+    return pd.concat(closes, axis=1, sort=True)
+
+
+def fmp_price_data(tickers, start, end, api_key, base_url=FMP_BASE_URL, batch_size=5, max_workers=8,
+                   requests_per_second=2.5, burst=150, retries=3, backoff=0.5):
+    """
+    Close prices from Financial Modeling Prep, `batch_size` tickers per pooled request.
+    FMP limits calls per minute (300 on the Starter plan). The token bucket lets `burst`
+    calls go out at once and refills at `requests_per_second`, so no 60-second window sees
+    more than burst + 60 * requests_per_second = 300 calls. A 500-ticker refresh is then 100
+    batched calls that fit in the burst and finish in a few seconds with 8 in flight, where
+    one ticker per call at 5 calls/s took 100 s. Raise both limits on larger plans. Batching
+    means a failed or retried call covers every ticker in it; batch_size=1 isolates tickers
+    at five times the calls.
+    Returns:
+        (pd.DataFrame, dict): Closes and an error message per failed ticker.
+    """
+    session = pooled_session(max_workers)
+    limiter = TokenBucket(requests_per_second, capacity=burst)
+    try:
+        return fetch_concurrently(
+            [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)],
+            lambda batch: fmp_close(session, batch, start, end, api_key, base_url=base_url),
+            max_workers=max_workers, rate_limiter=limiter, retries=retries, backoff=backoff,
+        )
+    finally:
+        session.close()
+
+
+def yfinance_price_data(tickers, start, end, batch_size=50, threads=True,
+                        requests_per_second=2, retries=3, backoff=1.0):
+    """
+    Close prices from yfinance in batches of `batch_size` tickers.
+    yf.download keeps its results in module-level state, so batches run one at a time
+    and the tickers within a batch are downloaded by yfinance's own threads.
+    Returns:
+        (pd.DataFrame, dict): Closes and an error message per failed ticker.
+    """
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    return fetch_concurrently(
+        batches,
+        lambda batch: yfinance_close(batch, start, end, threads=threads),
+        max_workers=1, rate_limiter=TokenBucket(requests_per_second), retries=retries, backoff=backoff,
+    )
+
+
+def yfinance_close(tickers, start, end, threads=True):
+    import yfinance as yf
 
-def download_price_data(tickers, start, end):
     print(f"Downloading data for: {tickers}")
-    data = yf.download(tickers, start=start, end=end, group_by='ticker', auto_adjust=False)
+    data = yf.download(tickers, start=start, end=end, group_by='ticker', auto_adjust=False, threads=threads)
     # Handle multi and single ticker differently
     if isinstance(data.columns, pd.MultiIndex):
         try:
@@ -17,3 +174,26 @@ def download_price_data(tickers, start, end):
         close = data[['Close']]
         close.columns = tickers  # Set column name to ticker
     return close
+
+
+def download_price_data(tickers, start, end, cache_dir=None, fetch_fn=None, offline=False):
+    """
+    Close prices for `tickers` over [start, end).
+    Args:
+        tickers (list): Ticker symbols.
+        start, end: Date range, end exclusive as in yf.download.
+        cache_dir (str): If given, prices are served from the on-disk cache and only
+                         missing date ranges are fetched. Use price_cache.DEFAULT_CACHE_DIR for the shared one.
+        fetch_fn (callable): fetch_fn(tickers, start, end) -> wide DataFrame, defaults to yfinance.
+                             Pass price_cache.csv_price_source(path) to read from local files.
+        offline (bool): Read from the cache only, never fetching.
+    Returns:
+        pd.DataFrame: Close prices with datetime index and ticker columns.
+    """
+    fetch_fn = fetch_fn or yfinance_close
+    if cache_dir is None:
+        return fetch_fn(tickers, start, end)
+    if offline:
+        return load_cached_prices(tickers, start, end, cache_dir=cache_dir)
+    entries = refresh_cache(tickers, start, end, fetch_fn, cache_dir=cache_dir)
+    return load_cached_prices(tickers, start, end, cache_dir=cache_dir, entries=entries)
@@ -0,0 +1,153 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+class PricePanel:
+    """
+    Dates x tickers closes in a memory-mapped .npy file, with the date and ticker
+    indexes stored next to it:
+
+        <path>/values.npy   T x N float32 or float64, row-major
+        <path>/dates.npy    T datetime64[D]
+        <path>/meta.json    {"tickers": [...]}
+
+    Slicing by date range is always a view. Ticker subsets are views when the tickers
+    are adjacent columns; otherwise the column indices are kept and only the selected
+    block is read when the panel is materialized with to_numpy() or to_frame().
+    """
+
+    def __init__(self, values, dates, tickers, columns=None, path=None):
+        self.values = values
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.tickers = list(tickers)
+        # None, or integer positions in `values` still to be gathered
+        self.columns = columns
+        self.path = path
+
+    @property
+    def shape(self):
+        return len(self.dates), len(self.tickers)
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.dates.astype('datetime64[ns]'), name="Date")
+
+    @property
+    def cache_key(self):
+        """Identifies the panel's contents for memoization without hashing the values file."""
+        stat = os.stat(os.path.join(self.path, "values.npy")) if self.path else None
+        return (self.path, stat and stat.st_mtime_ns, str(self.dates[0]), str(self.dates[-1]), tuple(self.tickers))
+
+    @classmethod
+    def create(cls, path, dates, tickers, dtype=np.float32):
+        """New panel on disk, filled with NaN and opened for writing."""
+        os.makedirs(path, exist_ok=True)
+        dates = pd.DatetimeIndex(dates).values.astype('datetime64[D]')
+        np.save(os.path.join(path, "dates.npy"), dates)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"tickers": list(map(str, tickers))}, f)
+        values = np.lib.format.open_memmap(os.path.join(path, "values.npy"), mode='w+', dtype=dtype,
+                                           shape=(len(dates), len(tickers)))
+        values[:] = np.nan
+        return cls(values, dates, tickers, path=path)
+
+    @classmethod
+    def open(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode)
+        return cls(values, np.load(os.path.join(path, "dates.npy")), meta["tickers"], path=path)
+
+    @classmethod
+    def from_frame(cls, prices, path, dtype=np.float32):
+        """Write a wide price DataFrame (datetime index, ticker columns) as a panel."""
+        prices = prices.sort_index()
+        panel = cls.create(path, prices.index, prices.columns, dtype=dtype)
+        panel.values[:] = prices.to_numpy(dtype=dtype)
+        panel.values.flush()
+        return cls.open(path)
+
+    def slice(self, start=None, end=None, tickers=None):
+        """
+        Sub-panel for dates in [start, end] and the given tickers, without copying prices.
+        Args:
+            start, end: Inclusive date bounds, None for open ends.
+            tickers (list): Tickers to keep, in the order given; None keeps all.
+        Returns:
+            PricePanel: Panel backed by the same memory map.
+        """
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), 'D'), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), 'D'),
+                                                                 side='right')
+        values = self.values[lo:hi]
+        columns = self.columns
+        names = self.tickers
+        if tickers is not None:
+            position = {ticker: i for i, ticker in enumerate(self.tickers)}
+            missing = [t for t in tickers if t not in position]
+            if missing:
+                raise KeyError(f"Tickers not in the price panel: {missing}")
+            picked = np.array([position[t] for t in tickers], dtype=np.intp)
+            if columns is not None:
+                columns = columns[picked]
+            elif len(picked) and np.array_equal(picked, np.arange(picked[0], picked[0] + len(picked))):
+                # Adjacent columns: a strided view of the memory map
+                values = values[:, picked[0]:picked[0] + len(picked)]
+            else:
+                columns = picked
+            names = list(tickers)
+        return PricePanel(values, self.dates[lo:hi], names, columns=columns, path=self.path)
+
+    def to_numpy(self, dtype=None):
+        """Materialize the selected block; a contiguous selection is returned as a view."""
+        values = self.values if self.columns is None else self.values[:, self.columns]
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def returns(self, dtype=float):
+        """Simple daily returns, (T - 1) x N."""
+        values = self.to_numpy(dtype)
+        return values[1:] / values[:-1] - 1
+
+    def to_frame(self, dtype=float):
+        return pd.DataFrame(self.to_numpy(dtype), index=self.index, columns=self.tickers, copy=False)
+
+
+def as_price_frame(prices):
+    """Wide DataFrame from either a DataFrame or a PricePanel, for code that needs pandas."""
+    return prices.to_frame() if isinstance(prices, PricePanel) else prices
+
+
+def import_prices(source, path, dtype=np.float32, chunksize=100_000, sheet_name=0):
+    """
+    Convert a wide price file (first column dates, one column per ticker) into a panel.
+    CSV files are streamed in row chunks straight into the memory map, so the whole
+    file never sits in memory as a DataFrame; Excel sheets are read in one go.
+    Args:
+        source (str): CSV or Excel file.
+        path (str): Output directory.
+        dtype: float32 halves the size; float64 keeps prices exact.
+        chunksize (int): CSV rows per chunk.
+        sheet_name: Excel sheet with the prices.
+    Returns:
+        PricePanel: The imported panel, opened read-only.
+    """
+    if str(source).lower().endswith((".xlsx", ".xls")):
+        prices = pd.read_excel(source, sheet_name=sheet_name, index_col=0, parse_dates=True)
+        return PricePanel.from_frame(prices, path, dtype=dtype)
+
+    # First pass reads only the date column, to size the memory map and find the row order
+    tickers = pd.read_csv(source, nrows=0).columns[1:]
+    dates = pd.to_datetime(pd.read_csv(source, usecols=[0]).iloc[:, 0]).to_numpy().astype('datetime64[D]')
+    order = np.argsort(dates, kind='stable')
+    panel = PricePanel.create(path, dates[order], tickers, dtype=dtype)
+    # Row position of each file row in the date-sorted panel
+    target = np.empty(len(order), dtype=np.intp)
+    target[order] = np.arange(len(order))
+    row = 0
+    for chunk in pd.read_csv(source, usecols=range(1, len(tickers) + 1), dtype=np.float64, chunksize=chunksize):
+        panel.values[target[row:row + len(chunk)]] = chunk.to_numpy(dtype=dtype)
+        row += len(chunk)
+    panel.values.flush()
+    return PricePanel.open(path)
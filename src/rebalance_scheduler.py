@@ -0,0 +1,186 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Index-review calendars: the months in which a review takes place
+CALENDARS = {
+    "monthly": tuple(range(1, 13)),
+    "quarterly": (3, 6, 9, 12),
+    "semi-annual": (6, 12),
+    "annual": (12,),
+}
+
+
+class RebalanceEvent(NamedTuple):
+    date: pd.Timestamp
+    offset: int   # first return row the new weights apply to (= price row of the close traded at)
+    kind: str     # "reconstitution", "reweight" or "drift"
+    step: int     # scheduled events before this one, for progress reporting
+    total: int    # scheduled events in the whole run (drift events come on top)
+
+
+def rebalance_offsets(index, rebalance_freq='D', lookback=21):
+    """
+    Map rebalance dates to row offsets in a return index.
+    Args:
+        index (pd.DatetimeIndex): Dates of the return rows.
+        rebalance_freq (str): pandas resample frequency.
+        lookback (int): Minimum number of price rows required before the first rebalance.
+    Returns:
+        (pd.DatetimeIndex, np.ndarray): Rebalance dates and the first return row each one applies to.
+    """
+    dates, offsets = _frequency_rows(index, rebalance_freq)
+    # Price row `offset` is the last close known on the rebalance date, which
+    # gives offset + 1 price rows of history
+    keep = offsets + 1 >= lookback
+    return dates[keep], offsets[keep]
+
+
+def _frequency_rows(index, rebalance_freq):
+    # Every resample label with the return row it applies to, before the lookback cut
+    dates = pd.Series(0, index=index).resample(rebalance_freq).first().index
+    offsets = index.searchsorted(dates, side='left')
+    keep = offsets < len(index)
+    dates, offsets = dates[keep], offsets[keep]
+    # Several calendar labels can land on the same trading row (weekends, holidays)
+    offsets, first = np.unique(offsets, return_index=True)
+    return dates[first], offsets
+
+
+def review_rows(index, months=None, business_day=1):
+    """
+    Rows of the Nth trading day of each review month.
+    Args:
+        index (pd.DatetimeIndex): Trading dates.
+        months (tuple): Review months (1-12), None for every month.
+        business_day (int): 1 for the first trading day, 3 for the third, -1 for the last.
+    Returns:
+        np.ndarray: Row positions in `index`.
+    """
+    index = pd.DatetimeIndex(index)
+    period = index.year.to_numpy() * 12 + index.month.to_numpy()
+    starts = np.flatnonzero(np.r_[True, period[1:] != period[:-1]])
+    ends = np.r_[starts[1:], len(index)]
+    rows = starts + business_day - 1 if business_day > 0 else ends + business_day
+    # Months too short for the rule (or cut off by the data) have no review
+    keep = (rows >= starts) & (rows < ends)
+    if months is not None:
+        keep &= np.isin(index.month.to_numpy()[starts], months)
+    return rows[keep]
+
+
+def _drift_row(price_matrix, start, stop, weights, threshold, first=None):
+    # First price row in [first, stop) where holdings set at the close of `start` have
+    # drifted more than `threshold` (one-way turnover to get back to target) from weights
+    first = start + 1 if first is None else first
+    if stop <= first:
+        return None
+    growth = price_matrix[first:stop] / price_matrix[start]
+    value = weights * growth
+    drifted = value / value.sum(axis=1, keepdims=True)
+    distance = 0.5 * np.abs(drifted - weights).sum(axis=1)
+    hit = np.flatnonzero(distance > threshold)
+    return first + hit[0] if len(hit) else None
+
+
+class RebalanceScheduler:
+    """
+    Walk-forward rebalance calendar with separate reconstitution (rescore and reselect)
+    and reweighting (reset weights on the current scores) cycles, plus optional drift
+    triggers that reset the holdings to their last target in between.
+
+    Cycles are a calendar name ("monthly", "quarterly", "semi-annual", "annual"), a
+    tuple of review months, or a pandas frequency string such as 'D' or 'ME' (which
+    keeps the resample behaviour of rebalance_offsets). Calendar reviews trade at the
+    close of the `business_day`-th trading day of the review month.
+    """
+
+    def __init__(self, reconstitution="quarterly", reweighting=None, business_day=1, drift_threshold=None,
+                 lookback=21):
+        self.reconstitution = reconstitution
+        self.reweighting = reweighting
+        self.business_day = business_day
+        self.drift_threshold = drift_threshold
+        self.lookback = lookback
+
+    def _cycle(self, cycle, price_index):
+        # Price rows (= return offsets) and event dates for one cycle
+        ret_index = price_index[1:]
+        if isinstance(cycle, str) and cycle not in CALENDARS:
+            dates, offsets = rebalance_offsets(ret_index, cycle, self.lookback)
+            return offsets, dates
+        months = CALENDARS[cycle] if isinstance(cycle, str) else tuple(cycle)
+        rows = review_rows(price_index, months, self.business_day)
+        rows = rows[(rows + 1 >= self.lookback) & (rows < len(ret_index))]
+        return rows, price_index[rows]
+
+    def _cycles(self):
+        cycles = [("reconstitution", self.reconstitution)]
+        if self.reweighting is not None:
+            cycles.append(("reweight", self.reweighting))
+        return cycles
+
+    def plan(self, price_index):
+        """
+        Scheduled (calendar) events without drift triggers, computed up front.
+        Returns:
+            dict: Return offset -> (date, kind), in date order.
+        """
+        scheduled = {}
+        for kind, cycle in reversed(self._cycles()):
+            # Reconstitution wins when both cycles land on the same row
+            offsets, dates = self._cycle(cycle, pd.DatetimeIndex(price_index))
+            scheduled.update({int(o): (d, kind) for o, d in zip(offsets, dates)})
+        return dict(sorted(scheduled.items()))
+
+    def events(self, price_index, price_matrix=None, skip_log=None):
+        """
+        Lazily yield RebalanceEvents in date order. Send back the weights applied at
+        each event (None if it was skipped): drift is measured from the last weights
+        that were actually applied.
+            gen = scheduler.events(prices.index, prices.to_numpy())
+            event = next(gen)
+            event = gen.send(weights)
+        Args:
+            price_index (pd.DatetimeIndex): Dates of the price rows.
+            price_matrix (np.ndarray): T x N prices, needed for drift triggers.
+            skip_log (list): Review dates dropped for lack of history are appended as dicts.
+        """
+        price_index = pd.DatetimeIndex(price_index)
+        scheduled = self.plan(price_index)
+        if skip_log is not None:
+            for kind, cycle in self._cycles():
+                if isinstance(cycle, str) and cycle not in CALENDARS:
+                    dates, rows = _frequency_rows(price_index[1:], cycle)
+                else:
+                    months = CALENDARS[cycle] if isinstance(cycle, str) else tuple(cycle)
+                    rows = review_rows(price_index, months, self.business_day)
+                    dates = price_index[rows]
+                for date, row in zip(dates, rows):
+                    if row + 1 < self.lookback:
+                        skip_log.append({"date": date, "kind": kind,
+                                         "reason": f"fewer than {self.lookback} price rows of history"})
+
+        rows = sorted(scheduled)
+        end = len(price_index) - 1
+        weights = applied_at = None
+        for step, row in enumerate(rows + [end]):
+            # Drift checks between the last applied weights and the next scheduled review
+            scan_from = None
+            while self.drift_threshold is not None and weights is not None:
+                drift = _drift_row(price_matrix, applied_at, row, weights, self.drift_threshold, scan_from)
+                if drift is None:
+                    break
+                sent = yield RebalanceEvent(price_index[drift], drift, "drift", step, len(rows))
+                if sent is not None:
+                    weights, applied_at, scan_from = np.asarray(sent, dtype=float), drift, None
+                else:
+                    # Still holding the old, drifting weights
+                    scan_from = drift + 1
+            if row == end:
+                return
+            date, kind = scheduled[row]
+            sent = yield RebalanceEvent(date, row, kind, step, len(rows))
+            if sent is not None:
+                weights, applied_at = np.asarray(sent, dtype=float), row
@@ -1,24 +1,122 @@
-from sklearn.preprocessing import MinMaxScaler
+import numpy as np
+import pandas as pd
 
-#invert ratios where lower is better
+# Declarative factor definitions:
+#   column        - fundamentals column
+#   weight        - weight in the composite score
+#   direction     - 1 if higher is better, -1 if lower is better
+#   invert        - score 1/x instead of x; non-positive values (e.g. negative earnings) count as missing
+#   normalization - "minmax", "zscore", "rank" or "winsorized" (z-score after clipping at `limits` quantiles)
+# Missing values get the worst normalized value of their cross-section.
 #PE and DE ratios are inverted because lower values are better
 #PE: Price to Earnings ratio, DE: Debt to Equity ratio
-def score_stocks(df):
-    df['inv_PE'] = 1 / df['PE']
-    df['inv_DE'] = 1 / df['DE']
-
-    # Normalize the scores
-    scaler = MinMaxScaler()
-    df[['norm_ROE', 'norm_inv_PE', 'norm_inv_DE']] = scaler.fit_transform(
-        df[['ROE', 'inv_PE', 'inv_DE']]
-    )
-
-    #Composite score calculation
-    #Weights: ROE 40%, inverted PE 30%, inverted DE 30%
-    df['Score'] = (
-        0.4 * df['norm_ROE'] +
-        0.3 * df['norm_inv_PE'] +
-        0.3 * df['norm_inv_DE']
-    )
-
-    return df.sort_values(by='Score', ascending=False)
+DEFAULT_FACTORS = [
+    {"column": "ROE", "weight": 0.4, "direction": 1, "normalization": "minmax"},
+    {"column": "PE", "weight": 0.3, "direction": 1, "invert": True, "normalization": "minmax"},
+    {"column": "DE", "weight": 0.3, "direction": 1, "invert": True, "normalization": "minmax"},
+]
+
+
+def _normalize(values, method, limits=(0.01, 0.99)):
+    # values: (..., N) cross-sections along the last axis, NaN for missing
+    if method == "minmax":
+        lo = np.nanmin(values, axis=-1, keepdims=True)
+        span = np.nanmax(values, axis=-1, keepdims=True) - lo
+        return np.divide(values - lo, span, out=np.zeros_like(values), where=span > 0)
+    if method == "winsorized":
+        lo, hi = np.nanquantile(values, limits, axis=-1, keepdims=True)
+        values = np.clip(values, lo, hi)
+        method = "zscore"
+    if method == "zscore":
+        std = np.nanstd(values, axis=-1, keepdims=True)
+        centered = values - np.nanmean(values, axis=-1, keepdims=True)
+        return np.divide(centered, std, out=np.zeros_like(values), where=std > 0)
+    if method == "rank":
+        missing = np.isnan(values)
+        ranks = np.argsort(np.argsort(np.where(missing, -np.inf, values), axis=-1), axis=-1).astype(float)
+        n_missing = missing.sum(axis=-1, keepdims=True)
+        n_valid = values.shape[-1] - n_missing
+        # Missing values sort first, so shift them out of the valid ranks
+        ranks = np.divide(ranks - n_missing, n_valid - 1, out=np.zeros_like(values), where=n_valid > 1)
+        return np.where(missing, np.nan, ranks)
+    raise ValueError(f"Unknown normalization: {method}")
+
+
+def compute_scores(factor_values, factors=DEFAULT_FACTORS):
+    """
+    Composite scores from a factor array in one vectorized pass.
+    Args:
+        factor_values (np.ndarray): (..., N, F) raw factor values, one slice per factor
+                                    definition; leading axes are e.g. rebalance dates.
+        factors (list): Factor definitions, in the order of the last axis.
+    Returns:
+        np.ndarray: (..., N) composite scores.
+    """
+    values = np.asarray(factor_values, dtype=float)
+    score = np.zeros(values.shape[:-1])
+    if score.size == 0:
+        # No securities (e.g. nothing passed screening): the cross-section reductions need at least one
+        return score
+    for f, factor in enumerate(factors):
+        x = values[..., f]
+        if factor.get("invert"):
+            x = np.where(x > 0, 1 / np.where(x > 0, x, 1), np.nan)
+        x = factor.get("direction", 1) * x
+        with np.errstate(invalid='ignore', divide='ignore'):
+            norm = _normalize(x, factor.get("normalization", "minmax"), factor.get("limits", (0.01, 0.99)))
+        # Missing values score as the worst name in their cross-section
+        missing = np.isnan(norm)
+        if missing.any():
+            worst = np.nanmin(np.where(missing, np.inf, norm), axis=-1, keepdims=True)
+            # A cross-section with no values at all scores 0, as minmax and zscore do
+            worst = np.where(np.isfinite(worst), worst, 0.0)
+            norm = np.where(missing, np.broadcast_to(worst, norm.shape), norm)
+        score += factor["weight"] * norm
+    return score
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores along the last axis, best first,
+    using argpartition instead of a full sort.
+    """
+    scores = np.asarray(scores)
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(part, order, axis=-1)
+
+
+def score_stocks(df, factors=DEFAULT_FACTORS, top_n=None):
+    """
+    Score a fundamentals snapshot without modifying it.
+    Args:
+        df (pd.DataFrame): One row per security with the factor columns.
+        factors (list): Factor definitions.
+        top_n (int): Only return the top_n securities.
+    Returns:
+        pd.DataFrame: Copy of df with a 'Score' column, best first.
+    """
+    values = df[[factor["column"] for factor in factors]].to_numpy(dtype=float)
+    scores = compute_scores(values, factors)
+    order = top_k(scores, top_n if top_n is not None else len(scores))
+    return df.iloc[order].assign(Score=scores[order])
+
+
+def score_panel(panel, factors=DEFAULT_FACTORS, date_col='Date', ticker_col='Ticker'):
+    """
+    Score every date's cross-section of a long (date, ticker) fundamentals panel at once.
+    Rows are scattered into a D x N x F array by their date/ticker codes, so there is
+    no per-date filtering.
+    Returns:
+        pd.Series: Score for every row of `panel`, aligned to its index.
+    """
+    date_codes, dates = pd.factorize(panel[date_col], sort=True)
+    ticker_codes, tickers = pd.factorize(panel[ticker_col], sort=True)
+    cube = np.full((len(dates), len(tickers), len(factors)), np.nan)
+    cube[date_codes, ticker_codes] = panel[[factor["column"] for factor in factors]].to_numpy(dtype=float)
+    scores = compute_scores(cube, factors)
+    # Absent (date, ticker) cells score as worst-in-cross-section but are never returned
+    return pd.Series(scores[date_codes, ticker_codes], index=panel.index, name="Score")
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from src.scoring_engine import DEFAULT_FACTORS, top_k
+
+# Column types for the fundamentals file; anything else is read as float64
+DTYPES = {"Ticker": "string", "Sector": "category", "Listing Date": "string"}
+
+
+def _filter_columns(min_mcap, min_free_float, min_liquidity, min_listing_days, excluded_sectors,
+                    mcap_col, ff_col, liquidity_col, listing_col, sector_col):
+    columns = []
+    if min_mcap is not None:
+        columns.append(mcap_col)
+    if min_free_float is not None:
+        columns.append(ff_col)
+    if min_liquidity is not None:
+        columns.append(liquidity_col)
+    if min_listing_days is not None:
+        columns.append(listing_col)
+    if excluded_sectors:
+        columns.append(sector_col)
+    return columns
+
+
+def exclusion_reasons(frame, min_mcap=None, min_free_float=None, min_liquidity=None, min_listing_days=None,
+                      excluded_sectors=(), as_of=None, mcap_col='Mcap', ff_col='FF', liquidity_col='ADV',
+                      listing_col='Listing Date', sector_col='Sector'):
+    """
+    Eligibility filters of screen_universe applied to an in-memory fundamentals frame.
+    A missing value never passes a threshold.
+    Args:
+        frame (pd.DataFrame): One row per security.
+        min_mcap, min_free_float, min_liquidity, min_listing_days, excluded_sectors: Filters,
+            None (or empty) to skip one.
+        as_of: Date listing ages are measured at, defaults to today.
+        mcap_col, ff_col, liquidity_col, listing_col, sector_col: Column names.
+    Returns:
+        np.ndarray: Every failed filter of each row joined by "; ", "" for eligible rows.
+    """
+    as_of = pd.Timestamp.today().normalize() if as_of is None else as_of
+    checks = []
+    if min_mcap is not None:
+        checks.append((~(frame[mcap_col].to_numpy(dtype=float) >= min_mcap), f"{mcap_col} below {min_mcap:g}"))
+    if min_free_float is not None:
+        checks.append((~(frame[ff_col].to_numpy(dtype=float) >= min_free_float), f"{ff_col} below {min_free_float:g}"))
+    if min_liquidity is not None:
+        checks.append((~(frame[liquidity_col].to_numpy(dtype=float) >= min_liquidity),
+                       f"{liquidity_col} below {min_liquidity:g}"))
+    if min_listing_days is not None:
+        listed = pd.to_datetime(frame[listing_col], errors='coerce')
+        age = (pd.Timestamp(as_of) - listed).dt.days.to_numpy(dtype=float)
+        checks.append((~(age >= min_listing_days), f"listed less than {min_listing_days} days"))
+    if excluded_sectors:
+        checks.append((frame[sector_col].isin(excluded_sectors).to_numpy(dtype=bool), "excluded sector"))
+    reasons = np.full(len(frame), "", dtype=object)
+    for failed, label in checks:
+        reasons[failed] = np.where(reasons[failed] == "", label, reasons[failed] + "; " + label)
+    return reasons
+
+
+def _factor_values(chunk, factors):
+    # Raw factor values with inversion and direction applied, as in compute_scores
+    values = np.empty((len(chunk), len(factors)))
+    for f, factor in enumerate(factors):
+        x = chunk[factor["column"]].to_numpy(dtype=float)
+        if factor.get("invert"):
+            with np.errstate(divide='ignore'):
+                x = np.where(x > 0, 1 / np.where(x > 0, x, 1), np.nan)
+        values[:, f] = factor.get("direction", 1) * x
+    return values
+
+
+def _normalize(values, stats, factors):
+    # Normalize with whole-universe statistics; missing values get the universe's worst value
+    out = np.empty_like(values)
+    for f, factor in enumerate(factors):
+        s = stats[f]
+        x = values[:, f]
+        if s["count"] == 0:
+            norm, worst = np.zeros_like(x), 0.0
+        elif factor.get("normalization", "minmax") == "minmax":
+            span = s["max"] - s["min"]
+            norm = (x - s["min"]) / span if span > 0 else np.zeros_like(x)
+            worst = 0.0
+        else:
+            mean = s["sum"] / s["count"]
+            std = np.sqrt(max(s["sum_sq"] / s["count"] - mean ** 2, 0.0))
+            norm = (x - mean) / std if std > 0 else np.zeros_like(x)
+            worst = (s["min"] - mean) / std if std > 0 else 0.0
+        out[:, f] = np.where(np.isnan(x), worst, norm)
+    return out
+
+
+def screen_universe(path, top_n=50, factors=DEFAULT_FACTORS, min_mcap=None, min_free_float=None, min_liquidity=None,
+                    min_listing_days=None, excluded_sectors=(), as_of=None, chunksize=50_000, keep_columns=None,
+                    ticker_col='Ticker', mcap_col='Mcap', ff_col='FF', liquidity_col='ADV',
+                    listing_col='Listing Date', sector_col='Sector'):
+    """
+    Screen a fundamentals CSV in chunks and keep the top_n eligible securities by score.
+    The file is read twice: the first pass collects whole-universe normalization
+    statistics of the eligible rows, the second scores each chunk with them and merges
+    it into a running top-N. Memory is bounded by one chunk plus the top-N rows, and the
+    scores equal score_stocks on the eligible universe.
+    Args:
+        path (str): Fundamentals CSV, one row per security.
+        top_n (int): Securities to keep.
+        factors (list): Factor definitions; only "minmax" and "zscore" normalizations
+                        can be computed from streamed statistics.
+        min_mcap, min_free_float, min_liquidity (float): Minimum market cap, free-float
+                        factor and average daily traded value.
+        min_listing_days (int): Minimum days since listing on `as_of`.
+        excluded_sectors (list): Sectors to leave out.
+        as_of: Date for the listing-age filter, defaults to today.
+        chunksize (int): Rows per chunk.
+        keep_columns (list): Columns of the returned rows, defaults to every column in the file.
+    Returns:
+        (pd.DataFrame, pd.DataFrame): The top_n rows with a 'Score' column, best first, and
+        one row per excluded security with its Ticker and Reason.
+    """
+    for factor in factors:
+        if factor.get("normalization", "minmax") not in ("minmax", "zscore"):
+            raise ValueError(f"Normalization {factor['normalization']!r} needs the whole universe in memory; "
+                             "use score_stocks instead.")
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    filters = dict(min_mcap=min_mcap, min_free_float=min_free_float, min_liquidity=min_liquidity,
+                   min_listing_days=min_listing_days, excluded_sectors=list(excluded_sectors))
+    names = dict(mcap_col=mcap_col, ff_col=ff_col, liquidity_col=liquidity_col, listing_col=listing_col,
+                 sector_col=sector_col)
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    keep_columns = header if keep_columns is None else list(keep_columns)
+    factor_columns = [factor["column"] for factor in factors]
+    usecols = list(dict.fromkeys([ticker_col] + keep_columns + factor_columns
+                                 + _filter_columns(**filters, **names)))
+    dtype = {column: DTYPES.get(column, "float64") for column in usecols if column in header}
+    dtype[ticker_col] = "string"
+
+    def chunks():
+        return pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+
+    # Pass 1: eligibility and running statistics per factor
+    stats = [{"count": 0, "sum": 0.0, "sum_sq": 0.0, "min": np.inf, "max": -np.inf} for _ in factors]
+    excluded = []
+    for chunk in chunks():
+        reasons = exclusion_reasons(chunk, **filters, as_of=as_of, **names)
+        eligible = reasons == ""
+        if not eligible.all():
+            excluded.append(pd.DataFrame({"Ticker": chunk[ticker_col].to_numpy()[~eligible],
+                                          "Reason": reasons[~eligible]}))
+        values = _factor_values(chunk[eligible], factors)
+        for f, s in enumerate(stats):
+            x = values[:, f][~np.isnan(values[:, f])]
+            if len(x):
+                s["count"] += len(x)
+                s["sum"] += x.sum()
+                s["sum_sq"] += (x ** 2).sum()
+                s["min"] = min(s["min"], x.min())
+                s["max"] = max(s["max"], x.max())
+
+    # Pass 2: score eligible rows and merge each chunk into the running top-N
+    best = None
+    scored = []
+    for chunk in chunks():
+        chunk = chunk[exclusion_reasons(chunk, **filters, as_of=as_of, **names) == ""]
+        scored.append(chunk[ticker_col].to_numpy())
+        scores = _normalize(_factor_values(chunk, factors), stats, factors) @ np.array(
+            [factor["weight"] for factor in factors])
+        chunk = chunk[list(dict.fromkeys([ticker_col] + keep_columns))].assign(Score=scores)
+        candidates = chunk if best is None else pd.concat([best, chunk], ignore_index=True)
+        best = candidates.iloc[top_k(candidates["Score"].to_numpy(), top_n)].reset_index(drop=True)
+
+    if best is None:
+        best = pd.DataFrame(columns=list(dict.fromkeys([ticker_col] + keep_columns)) + ["Score"])
+    # Eligible securities that did not make the cut
+    scored = np.concatenate(scored) if scored else np.array([], dtype=object)
+    outscored = scored[~np.isin(scored, best[ticker_col].to_numpy())]
+    excluded.append(pd.DataFrame({"Ticker": outscored, "Reason": f"score outside the top {top_n}"}))
+    return best, pd.concat(excluded, ignore_index=True)
@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Arrays and context values attached in this process, plus the handles behind the arrays
+_ATTACHED = {}
+_HANDLES = []
+
+
+def attached():
+    """
+    Arrays and context values attached in this process, by name. Worker functions read
+    their inputs from it and may keep per-process caches in it.
+    """
+    return _ATTACHED
+
+
+def attach(specs, context):
+    """Process-pool initializer: map the shared arrays described by `specs` and add `context`."""
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        # Keep the handle alive as long as the view is used
+        _HANDLES.append(shm)
+        _ATTACHED[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    _ATTACHED.update(context)
+
+
+def detach():
+    """Drop everything attached in this process, views before the handles they point into."""
+    _ATTACHED.clear()
+    while _HANDLES:
+        _HANDLES.pop().close()
+
+
+@contextmanager
+def shared_arrays(arrays, context=None):
+    """
+    Copy numpy arrays into shared memory for the duration of the block.
+        with shared_arrays({"prices": matrix}, {"lookback": 21}) as initargs:
+            rows = map_attached(run_task, tasks, initargs, max_workers=4)
+    Yields the arguments for attach(). On exit the arrays are detached from this
+    process and their shared memory blocks are freed.
+    """
+    handles = []
+    specs = {}
+    try:
+        for key, array in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            handles.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+            specs[key] = (shm.name, array.shape, array.dtype.str)
+        yield specs, dict(context or {})
+    finally:
+        detach()
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+
+def map_attached(fn, tasks, initargs, max_workers=None, chunksize=1):
+    """
+    fn over tasks in a process pool whose workers attach `initargs` (from shared_arrays),
+    or in this process when max_workers is 1.
+    Returns:
+        list: Results in task order.
+    """
+    max_workers = max_workers or os.cpu_count()
+    if max_workers == 1:
+        attach(*initargs)
+        return [fn(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=attach, initargs=initargs) as pool:
+        return list(pool.map(fn, tasks, chunksize=chunksize))
@@ -0,0 +1,118 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+from src.analytics import return_stats, tracking_error
+from src.holdings_simulator import simulate_holdings
+from src.rebalance_scheduler import rebalance_offsets
+from src.shared_arrays import attached, map_attached, shared_arrays
+from src.weighting_stratergies import equal_weight, market_cap_weight, ff_market_cap_weight, score_weight, capped_weight
+
+STRATEGIES = ("Equal Weight", "Market Cap Weight", "Free Float Market Cap", "Score Based")
+
+
+def _strategy_weights(strategy, scores, mcaps, ff):
+    if strategy == "Equal Weight":
+        return equal_weight(len(scores))
+    if strategy == "Market Cap Weight":
+        return market_cap_weight(mcaps)
+    if strategy == "Free Float Market Cap":
+        return ff_market_cap_weight(mcaps, ff)
+    if strategy == "Score Based":
+        return score_weight(scores)
+    raise ValueError(f"Unknown weight strategy: {strategy}")
+
+
+def run_config(config):
+    """
+    Backtest one sweep configuration against the arrays attached in this process.
+    Returns:
+        dict: The configuration plus performance statistics.
+    """
+    shared = attached()
+    prices = shared["prices"]
+    scores = shared["scores"]
+    row = dict(config)
+    try:
+        # Top-N by score with argpartition, then weights for that subset
+        top_n = config["top_n"] or len(scores)
+        top_n = min(top_n, len(scores))
+        selected = np.argpartition(-scores, top_n - 1)[:top_n] if top_n < len(scores) else np.arange(len(scores))
+        mcaps = shared["mcaps"][selected] if "mcaps" in shared else None
+        ff = shared["ff"][selected] if "ff" in shared else None
+        target = _strategy_weights(config["strategy"], scores[selected], mcaps, ff)
+        if config["max_weight"] is not None:
+            target = capped_weight(target, config["max_weight"])
+
+        # Rebalance rows only depend on the frequency, so compute them once per process
+        key = ("offsets", config["rebalance_freq"])
+        if key not in shared:
+            shared[key] = rebalance_offsets(shared["dates"][1:], config["rebalance_freq"], shared["lookback"])[1]
+        offsets = shared[key]
+        sub_prices = prices[:, selected]
+        sim = simulate_holdings(sub_prices, offsets, np.tile(target, (len(offsets), 1)),
+                                cost_bps=shared["cost_bps"])
+        returns = sim["net_returns"]
+    except Exception as e:
+        row["Error"] = f"{type(e).__name__}: {e}"
+        return row
+
+    row.update({name: float(value) for name, value in return_stats(returns).items()})
+    row.update({
+        # The first rebalance buys from cash, so it is not counted as turnover
+        "Average Turnover": np.mean(sim["turnover"][1:]) if len(offsets) > 1 else 0.0,
+        "Rebalances": len(offsets),
+    })
+    if "benchmark_returns" in shared:
+        active = returns - shared["benchmark_returns"][offsets[0]:]
+        row["Tracking Error"] = float(tracking_error(active))
+    return row
+
+
+def run_sweep(prices, scores, mcaps=None, ff=None, strategies=STRATEGIES, max_weights=(None,),
+              rebalance_freqs=("ME",), top_ns=(None,), benchmark=None, lookback=21, cost_bps=0.0,
+              max_workers=None):
+    """
+    Backtest every combination of strategy, max_weight, rebalance frequency and top-N
+    across a process pool. The price matrix and benchmark returns live in shared
+    memory, so each task only pickles its small configuration dict.
+    Args:
+        prices (pd.DataFrame): Price data with datetime index and ticker columns (no gaps).
+        scores (pd.Series): Fundamental score for each ticker.
+        mcaps (pd.Series): Market caps, needed for the market-cap strategies.
+        ff (pd.Series): Free-float factors, needed for "Free Float Market Cap".
+        strategies, max_weights, rebalance_freqs, top_ns: Grid values; None means no cap / all names.
+        benchmark (pd.Series): Benchmark levels (e.g. Indxx 500), loaded once by the caller.
+        lookback (int): Minimum number of price rows before the first rebalance.
+        cost_bps (float): Trading cost in basis points of traded notional.
+        max_workers (int): Worker processes, defaults to os.cpu_count().
+    Returns:
+        pd.DataFrame: One row per configuration with its performance statistics.
+    """
+    prices = prices.dropna()
+    tickers = prices.columns
+    arrays = {
+        "prices": prices.to_numpy(dtype=float),
+        "scores": scores.reindex(tickers).to_numpy(dtype=float),
+    }
+    if mcaps is not None:
+        arrays["mcaps"] = mcaps.reindex(tickers).to_numpy(dtype=float)
+    if ff is not None:
+        arrays["ff"] = ff.reindex(tickers).to_numpy(dtype=float)
+    if benchmark is not None:
+        # Return-based benchmark aligned to the return rows of the price panel
+        levels = benchmark.sort_index().reindex(prices.index).to_numpy(dtype=float)
+        arrays["benchmark_returns"] = levels[1:] / levels[:-1] - 1
+    context = {"dates": prices.index, "lookback": lookback, "cost_bps": cost_bps}
+
+    configs = [
+        {"strategy": s, "max_weight": m, "rebalance_freq": f, "top_n": n}
+        for s, m, f, n in itertools.product(strategies, max_weights, rebalance_freqs, top_ns)
+    ]
+
+    max_workers = max_workers or os.cpu_count()
+    with shared_arrays(arrays, context) as initargs:
+        rows = map_attached(run_config, configs, initargs, max_workers,
+                            chunksize=max(1, len(configs) // (4 * max_workers)))
+    return pd.DataFrame(rows)
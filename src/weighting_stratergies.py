@@ -1,8 +1,127 @@
 import numpy as np
+# Base weights work on (..., N) arrays, so every rebalance date can be weighted at once
 def equal_weight(n):
    return np.ones(n) / n
 def market_cap_weight(mcaps):
-   return mcaps / np.sum(mcaps)
+   return mcaps / np.sum(mcaps, axis=-1, keepdims=True)
 def ff_market_cap_weight(mcaps, ff_factors):
    ff_mcap = mcaps * ff_factors
-   return ff_mcap / np.sum(ff_mcap)
\ No newline at end of file
+   return ff_mcap / np.sum(ff_mcap, axis=-1, keepdims=True)
+def score_weight(scores):
+   scores = np.clip(scores, 0, None)
+   return scores / np.sum(scores, axis=-1, keepdims=True)
+def score_tilted_weight(base_weights, scores, tilt=1.0):
+   # Tilt base weights (e.g. market cap) towards high scores: w ~ base * max(score, 0) ** tilt
+   tilted = np.asarray(base_weights, dtype=float) * np.clip(scores, 0, None) ** tilt
+   return tilted / np.sum(tilted, axis=-1, keepdims=True)
+def capped_weight(weights, max_weight, max_iter=100):
+   # Cap each weight at max_weight and hand the excess to uncapped names pro rata
+   if max_weight * np.shape(weights)[-1] < 1:
+      raise ValueError("max_weight too small for the number of securities.")
+   return constrained_weight(weights, max_weight=max_weight, max_iter=max_iter)
+def build_weights(top_stocks, weight_strategy, max_weight=None):
+   """
+   Index weights for the selected stocks.
+   Args:
+      top_stocks (pd.DataFrame): Selected securities with 'Mcap' (and 'FF') columns.
+      weight_strategy (str): "Equal", "Market Cap" or "FF Market Cap".
+      max_weight (float): Single-name cap, excess redistributed pro rata.
+   Returns:
+      np.ndarray: Weights in the row order of top_stocks.
+   """
+   if weight_strategy == "Equal":
+      weights = equal_weight(len(top_stocks))
+   elif weight_strategy == "Market Cap":
+      weights = market_cap_weight(top_stocks["Mcap"].to_numpy(dtype=float))
+   elif weight_strategy == "FF Market Cap":
+      weights = ff_market_cap_weight(top_stocks["Mcap"].to_numpy(dtype=float), top_stocks["FF"].to_numpy(dtype=float))
+   else:
+      raise ValueError("Unknown weight strategy!")
+   if max_weight is not None:
+      weights = capped_weight(weights, max_weight)
+   return weights
+def _group_sum(values, keys, size):
+   return np.bincount(keys, weights=values, minlength=size)
+def _fill(base, lower, upper, keys, targets, max_iter, tol):
+   # Find one multiplier per group so that sum(clip(multiplier * base, lower, upper)) hits the
+   # group's target. Each step clips at the bounds and hands the excess (or shortfall) to the
+   # names still between their bounds, pro rata to base weight. That is a Newton step on a
+   # piecewise-linear function, so it stops after a few steps; a bisection bracket catches
+   # the rare step that overshoots when both floors and caps bind.
+   shape = base.shape
+   # Flat, contiguous copies once, so the group sums below never copy
+   base, lower, upper = (np.ascontiguousarray(x).ravel() for x in (base, lower, upper))
+   keys = np.ascontiguousarray(keys).ravel()
+   size = targets.size
+   if np.any(_group_sum(upper, keys, size) < targets - tol) or np.any(_group_sum(lower, keys, size) > targets + tol):
+      raise ValueError("Weight constraints are infeasible: caps too tight or minimum weights too large.")
+   base_sum = _group_sum(base, keys, size)
+   lo = np.zeros(size)
+   hi = np.zeros(size)
+   np.maximum.at(hi, keys, upper / np.where(base > 0, base, 1))
+   lam = np.divide(targets, base_sum, out=np.zeros(size), where=base_sum > 0)
+   for _ in range(max_iter):
+      w = np.clip(lam[keys] * base, lower, upper)
+      excess = _group_sum(w, keys, size) - targets
+      if np.all(np.abs(excess) <= tol):
+         break
+      hi = np.where(excess > 0, lam, hi)
+      lo = np.where(excess < 0, lam, lo)
+      slope = _group_sum(base * ((w > lower) & (w < upper)), keys, size)
+      step = lam - np.divide(excess, slope, out=np.zeros(size), where=slope > 0)
+      lam = np.where((slope > 0) & (step > lo) & (step < hi), step, 0.5 * (lo + hi))
+   return w.reshape(shape)
+def constrained_weight(base_weights, max_weight=None, min_weight=None, sector_matrix=None, sector_cap=None,
+                       liquidity=None, liquidity_multiple=None, max_iter=100, tol=1e-10):
+   """
+   Index weights under single-name, sector and liquidity caps and minimum weights,
+   with capped excess redistributed pro rata, without an optimizer.
+   Args:
+      base_weights (np.ndarray): (N,) or (D, N) uncapped weights (any scale), one row per rebalance date.
+                                 Names with zero base weight stay out of the index.
+      max_weight (float or np.ndarray): Single-name cap, scalar or broadcastable to base_weights.
+      min_weight (float or np.ndarray): Minimum weight of every name in the index.
+      sector_matrix (scipy.sparse matrix): S x N sector membership from get_sector_matrix.
+      sector_cap (float or np.ndarray): Cap on every sector's total weight, scalar or (S,).
+      liquidity (np.ndarray): Average daily traded value, broadcastable to base_weights.
+      liquidity_multiple (float): A name may weigh at most this multiple of its share of total liquidity.
+   Returns:
+      np.ndarray: Weights with the shape of base_weights, each row summing to 1.
+   """
+   base = np.asarray(base_weights, dtype=float)
+   squeeze = base.ndim == 1
+   base = np.atleast_2d(base)
+   n_rows, n = base.shape
+   eligible = base > 0
+   upper = np.ones_like(base) if max_weight is None else np.broadcast_to(np.asarray(max_weight, dtype=float), base.shape)
+   if liquidity is not None and liquidity_multiple is not None:
+      liquidity = np.broadcast_to(np.asarray(liquidity, dtype=float), base.shape)
+      upper = np.minimum(upper, liquidity_multiple * liquidity / np.sum(liquidity * eligible, axis=-1, keepdims=True))
+   upper = np.where(eligible, upper, 0.0)
+   lower = np.zeros_like(base) if min_weight is None else np.broadcast_to(np.asarray(min_weight, dtype=float), base.shape)
+   lower = np.where(eligible, np.minimum(lower, upper), 0.0)
+   rows = np.arange(n_rows)[:, None]
+
+   if sector_matrix is None or sector_cap is None:
+      w = _fill(base, lower, upper, np.broadcast_to(rows, base.shape), np.ones(n_rows), max_iter, tol)
+      return w[0] if squeeze else w
+
+   # Sectors over their cap are pinned at the cap with their own multiplier; everything
+   # else shares the remaining weight. Capping a sector only pushes weight into the
+   # others, so at most S rounds are needed.
+   sector_of = np.asarray(sector_matrix.argmax(axis=0)).ravel()
+   n_sectors = sector_matrix.shape[0]
+   caps = np.broadcast_to(np.asarray(sector_cap, dtype=float), (n_sectors,))
+   capped = np.zeros((n_rows, n_sectors), dtype=bool)
+   sector_keys = (rows * n_sectors + sector_of).ravel()
+   for _ in range(n_sectors + 1):
+      group = np.where(capped[:, sector_of], sector_of, n_sectors)
+      targets = np.where(capped, caps, 0.0)
+      targets = np.column_stack([targets, 1 - targets.sum(axis=1)])
+      w = _fill(base, lower, upper, rows * (n_sectors + 1) + group, targets.ravel(), max_iter, tol)
+      sector_weights = _group_sum(w.ravel(), sector_keys, n_rows * n_sectors).reshape(n_rows, n_sectors)
+      over = ~capped & (sector_weights > caps + tol)
+      if not over.any():
+         break
+      capped |= over
+   return w[0] if squeeze else w
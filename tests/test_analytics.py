@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analytics import TRADING_DAYS, performance_stats, return_stats, rolling_stats, tracking_error
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", periods=300)
+    benchmark = pd.Series(rng.normal(0.0003, 0.01, len(dates)), index=dates)
+    frame = pd.DataFrame({
+        "Index": 1.1 * benchmark + rng.normal(0.0002, 0.004, len(dates)),
+        "Other": rng.normal(0.0005, 0.02, len(dates)),
+    }, index=dates)
+    return frame, benchmark
+
+
+def max_drawdown(r):
+    growth = np.cumprod(np.r_[1.0, 1 + r])
+    return (growth / np.maximum.accumulate(growth) - 1).min()
+
+
+def test_rolling_stats_match_pandas_rolling(returns):
+    frame, benchmark = returns
+    window = 63
+    stats = rolling_stats(frame, window, benchmark=benchmark)
+    rolling = frame.rolling(window)
+    annualize = np.sqrt(TRADING_DAYS)
+
+    expected = {
+        "Volatility": rolling.std(ddof=0) * annualize,
+        "Tracking Error": frame.sub(benchmark, axis=0).rolling(window).std(ddof=0) * annualize,
+        "Beta": rolling.cov(benchmark).div(benchmark.rolling(window).var(), axis=0),
+        "Correlation": rolling.corr(benchmark),
+        "CAGR": (1 + frame).rolling(window).apply(np.prod, raw=True) ** (TRADING_DAYS / window) - 1,
+        "Max Drawdown": rolling.apply(max_drawdown, raw=True),
+    }
+    for name, frame_expected in expected.items():
+        pd.testing.assert_frame_equal(stats[name], frame_expected.iloc[window - 1:], check_freq=False,
+                                      check_names=False, rtol=1e-9, atol=1e-12, obj=name)
+
+
+def test_performance_stats_match_pandas(returns):
+    frame, benchmark = returns
+    stats = performance_stats(frame, benchmark=benchmark)
+    growth = (1 + frame).cumprod()
+    cagr = growth.iloc[-1] ** (TRADING_DAYS / len(frame)) - 1
+    volatility = frame.std(ddof=0) * np.sqrt(TRADING_DAYS)
+    np.testing.assert_allclose(stats["CAGR"], cagr, rtol=1e-12)
+    np.testing.assert_allclose(stats["Sharpe Ratio"], cagr / volatility, rtol=1e-12)
+    np.testing.assert_allclose(stats["Max Drawdown"], (growth / growth.cummax() - 1).min(), rtol=1e-12)
+    np.testing.assert_allclose(stats["Beta"], frame.apply(lambda column: column.cov(benchmark)) / benchmark.var(),
+                               rtol=1e-12)
+
+
+def test_return_stats_cover_any_leading_axes(returns):
+    frame, benchmark = returns
+    paths = frame.to_numpy().T.reshape(2, 1, -1).repeat(3, axis=1)   # 2 x 3 x T
+    stats = return_stats(paths)
+    expected = performance_stats(frame, benchmark=benchmark)
+    for name, values in stats.items():
+        assert values.shape == (2, 3)
+        np.testing.assert_allclose(values[:, 0], expected[name], rtol=1e-12, err_msg=name)
+    active = frame.sub(benchmark, axis=0)
+    gapped = active.to_numpy(copy=True).T
+    gapped[0, :10] = np.nan
+    np.testing.assert_allclose(tracking_error(gapped), [active.iloc[10:, 0].std(ddof=0) * np.sqrt(TRADING_DAYS),
+                                                        expected["Tracking Error"].iloc[1]], rtol=1e-12)
+    assert np.isnan(tracking_error(np.full(5, np.nan)))
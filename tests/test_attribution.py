@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.attribution import attribution_report, brinson, risk_contributions
+from src.backtester import backtest_portfolio
+from src.rebalance_scheduler import RebalanceScheduler
+
+
+def random_prices(n_days=300, tickers="ABCD", seed=0, vol=0.02):
+    rng = np.random.default_rng(seed)
+    levels = 100 * np.exp(np.cumsum(rng.normal(0, vol, (n_days, len(tickers))), axis=0))
+    return pd.DataFrame(levels, index=pd.bdate_range("2022-01-03", periods=n_days), columns=list(tickers))
+
+
+def test_risk_contributions_match_the_sample_covariance():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0, 0.01, (200, 6))
+    benchmark = returns.mean(axis=1) + rng.normal(0, 0.002, 200)
+    offsets = np.array([10, 63, 100, 199])
+    weight_matrix = rng.dirichlet(np.ones(6), size=len(offsets))
+    # Bound the batches so they are split across dates
+    risk = risk_contributions(returns, offsets, weight_matrix, window=63, benchmark_returns=benchmark, max_elements=400)
+    assert np.isnan(risk["volatility"][0]) and np.isnan(risk["contributions"][0]).all()
+    for d, (offset, w) in enumerate(zip(offsets[1:], weight_matrix[1:]), start=1):
+        window = returns[offset - 63:offset]
+        cov = np.cov(window, rowvar=False)
+        vol = np.sqrt(w @ cov @ w)
+        np.testing.assert_allclose(risk["volatility"][d], vol, rtol=1e-12)
+        np.testing.assert_allclose(risk["contributions"][d], w * (cov @ w) / vol, rtol=1e-12)
+        bench = benchmark[offset - 63:offset]
+        np.testing.assert_allclose(risk["beta"][d], np.cov(window @ w, bench)[0, 1] / np.var(bench, ddof=1), rtol=1e-12)
+
+
+def test_brinson_terms_add_up_to_the_active_return():
+    rng = np.random.default_rng(0)
+    period_returns = rng.normal(0.01, 0.05, (5, 6))
+    weights = rng.dirichlet(np.ones(6), size=5)
+    weights[:, 5] = 0   # the portfolio leaves a sector out
+    weights /= weights.sum(axis=1, keepdims=True)
+    benchmark = rng.dirichlet(np.ones(6), size=5)
+    sector_matrix = np.array([[1, 1, 0, 0, 0, 0], [0, 0, 1, 1, 0, 0], [0, 0, 0, 0, 1, 1]], dtype=float)
+    terms = brinson(period_returns, weights, benchmark, sector_matrix)
+    active = np.einsum('dn,dn->d', weights - benchmark, period_returns)
+    total = terms["allocation"] + terms["selection"] + terms["interaction"]
+    np.testing.assert_allclose(total.sum(axis=1), active, rtol=0, atol=1e-15)
+    np.testing.assert_allclose(terms["portfolio"] - terms["benchmark"], active, rtol=0, atol=1e-15)
+    # Reference: textbook Brinson-Fachler for one period and sector
+    d, s = 2, 1
+    members = sector_matrix[s] > 0
+    wp, wb = weights[d, members].sum(), benchmark[d, members].sum()
+    rp = weights[d, members] @ period_returns[d, members] / wp
+    rb = benchmark[d, members] @ period_returns[d, members] / wb
+    assert terms["allocation"][d, s] == pytest.approx((wp - wb) * (rb - benchmark[d] @ period_returns[d]))
+    assert terms["selection"][d, s] == pytest.approx(wb * (rp - rb))
+    assert terms["interaction"][d, s] == pytest.approx((wp - wb) * (rp - rb))
+
+
+def test_report_accepts_the_backtest_scheduler():
+    prices = random_prices()
+    scheduler = RebalanceScheduler("quarterly", drift_threshold=0.02)
+    returns, weights = backtest_portfolio(prices, lambda scores, sector_matrix: np.full(4, 0.25),
+                                          rebalance_freq=scheduler)
+    report = attribution_report(weights, prices, rebalance_freq=scheduler)
+    assert list(report["risk"].index) == sorted(weights)
+
+    # Holding periods start at the rows the backtest traded at, drift rebalances included
+    assert len(weights) > len(scheduler.plan(prices.index))
+    growth = (1 + report["risk"]["Portfolio Return"]).prod()
+    np.testing.assert_allclose(growth, (1 + returns).prod(), rtol=1e-12)
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.alignment import align_prices, mask_weights
+from src.backtester import backtest_portfolio, backtest_with_costs
+from src.fundamentals_store import PointInTimeFundamentals
+from src.holdings_simulator import drifted_returns, fixed_target_returns
+from src.rebalance_scheduler import RebalanceScheduler
+
+
+def random_prices(n_days=120, tickers="ABCD", seed=0, vol=0.01):
+    rng = np.random.default_rng(seed)
+    levels = 100 * np.exp(np.cumsum(rng.normal(0, vol, (n_days, len(tickers))), axis=0))
+    return pd.DataFrame(levels, index=pd.bdate_range("2022-01-03", periods=n_days), columns=list(tickers))
+
+
+def loop_returns(price_matrix, offsets, weight_matrix):
+    # Reference: buy shares at each rebalance close and value them day by day
+    returns = []
+    shares = None
+    for row in range(offsets[0], len(price_matrix) - 1):
+        if row in offsets:
+            shares = weight_matrix[list(offsets).index(row)] / price_matrix[row]
+        returns.append(shares @ price_matrix[row + 1] / (shares @ price_matrix[row]) - 1)
+    return np.array(returns)
+
+
+def test_drifted_returns_match_day_by_day_holdings():
+    prices = random_prices().to_numpy()
+    offsets = np.array([5, 6, 30, 61, 100])
+    weight_matrix = np.random.default_rng(1).dirichlet(np.ones(4), size=len(offsets))
+    expected = loop_returns(prices, offsets, weight_matrix)
+    np.testing.assert_allclose(drifted_returns(prices, offsets, weight_matrix), expected, rtol=0, atol=1e-14)
+
+
+@pytest.mark.parametrize("freq", ["D", "ME"])
+def test_backtest_portfolio_counts_each_return_row_once(freq):
+    prices = random_prices()
+    target = np.array([0.1, 0.2, 0.3, 0.4])
+    returns, weights = backtest_portfolio(prices, lambda scores, sector_matrix: target, rebalance_freq=freq)
+    plan = RebalanceScheduler(freq, lookback=21).plan(prices.index)
+    offsets = np.array(list(plan))
+    assert list(weights) == [date for date, _ in plan.values()]
+    assert returns.index.equals(prices.index[offsets[0] + 1:])
+    np.testing.assert_allclose(returns.to_numpy(), loop_returns(prices.to_numpy(), offsets, np.tile(target, (len(offsets), 1))),
+                               rtol=0, atol=1e-14)
+
+
+def test_backtest_with_costs_without_costs_matches_backtest_portfolio():
+    prices = random_prices()
+    target = np.array([0.25, 0.25, 0.25, 0.25])
+    returns, _ = backtest_portfolio(prices, lambda scores, sector_matrix: target, rebalance_freq="ME")
+    result = backtest_with_costs(prices, lambda scores, sector_matrix: target, rebalance_freq="ME")
+    np.testing.assert_allclose(result["net_returns"].to_numpy(), returns.to_numpy(), rtol=0, atol=1e-12)
+
+
+def test_fixed_target_returns_match_drifted_returns():
+    prices = random_prices().to_numpy()
+    offsets = np.array([21, 40, 63, 90])
+    targets = np.array([[0.25, 0.25, 0.25, 0.25], [0.7, 0.1, 0.1, 0.1]])
+    together = fixed_target_returns(prices, offsets, targets)
+    for p, target in enumerate(targets):
+        np.testing.assert_allclose(together[:, p], drifted_returns(prices, offsets, np.tile(target, (len(offsets), 1))),
+                                   rtol=0, atol=1e-14)
+    per_period = fixed_target_returns(prices, offsets, np.repeat(targets[None], len(offsets), axis=0))
+    np.testing.assert_allclose(per_period, together, rtol=0, atol=1e-14)
+
+
+def test_progress_stays_within_total_with_drift_events():
+    prices = random_prices(n_days=300, vol=0.03)
+    seen = []
+    backtest_portfolio(prices, lambda scores, sector_matrix: np.full(4, 0.25),
+                       rebalance_freq=RebalanceScheduler("quarterly", drift_threshold=0.02),
+                       progress=lambda done, total: seen.append((done, total)))
+    done = [d for d, _ in seen]
+    assert len(seen) > 4, "the drift trigger should fire between quarterly reviews"
+    assert all(d <= t for d, t in seen)
+    assert done == sorted(done)
+    assert seen[-1][0] == seen[-1][1]
+
+
+def test_masked_weights_keep_the_cap_on_the_valid_names():
+    prices = random_prices(tickers="ABCDE")
+    prices.iloc[:60, 4] = np.nan
+    aligned = align_prices(prices)
+    target = np.array([0.3, 0.3, 0.2, 0.1, 0.1])
+    _, weights = backtest_portfolio(aligned, lambda scores, sector_matrix, valid: mask_weights(target, valid, 0.3),
+                                    rebalance_freq="ME")
+    offsets = np.array(list(RebalanceScheduler("ME", lookback=21).plan(aligned.index)))
+    for offset, w in zip(offsets, weights.values()):
+        assert w.max() <= 0.3 + 1e-12
+        assert w.sum() == pytest.approx(1.0)
+        if not aligned.valid[offset, 4]:
+            assert w[4] == 0
+    assert not aligned.valid[offsets[0], 4] and aligned.valid[offsets[-1], 4]
+
+
+def test_infeasible_cap_after_masking_skips_the_rebalance():
+    prices = random_prices()
+    prices.iloc[:60, 2:] = np.nan
+    aligned = align_prices(prices)
+    target = np.array([0.3, 0.3, 0.2, 0.2])
+    skip_log = []
+    _, weights = backtest_portfolio(aligned, lambda scores, sector_matrix, valid: mask_weights(target, valid, 0.3),
+                                    rebalance_freq="ME", skip_log=skip_log)
+    # Two valid names cannot hold 100% under a 30% cap, so that rebalance is skipped
+    assert [entry["date"] for entry in skip_log if "history" not in entry["reason"]] == [pd.Timestamp("2022-02-28")]
+    assert all(np.allclose(w, target) for w in weights.values())
+
+
+def test_weight_on_invalid_names_is_rejected():
+    prices = random_prices()
+    prices.iloc[:60, 3] = np.nan
+    skip_log = []
+    _, weights = backtest_portfolio(align_prices(prices), lambda scores, sector_matrix, valid: np.full(4, 0.25),
+                                    rebalance_freq="ME", skip_log=skip_log)
+    skipped = [entry for entry in skip_log if "history" not in entry["reason"]]
+    assert len(skipped) == 1 and "not valid" in skipped[0]["reason"]
+    assert pd.Timestamp("2022-02-28") not in weights
+
+
+@pytest.mark.parametrize("freq", ["D", "ME", "monthly"])
+def test_rebalances_without_enough_history_are_logged(freq):
+    prices = random_prices()
+    skip_log = []
+    _, weights = backtest_portfolio(prices, lambda scores, sector_matrix: np.full(4, 0.25), rebalance_freq=freq,
+                                    lookback=30, skip_log=skip_log)
+    assert skip_log and all(entry["reason"] == "fewer than 30 price rows of history" for entry in skip_log)
+    # Each dropped review is logged once, before the first one that is held
+    assert len({entry["date"] for entry in skip_log}) == len(skip_log)
+    assert max(entry["date"] for entry in skip_log) < min(weights)
+    if freq == "D":
+        assert len(skip_log) == 29
+
+
+def test_sector_matrix_comes_from_the_backtested_fundamentals(tmp_path, monkeypatch):
+    # No file is read from the working directory
+    monkeypatch.chdir(tmp_path)
+    prices = random_prices()
+    seen = []
+
+    def weight_fn(scores, sector_matrix):
+        seen.append(sector_matrix.toarray())
+        return np.full(4, 0.25)
+
+    backtest_portfolio(prices, weight_fn, rebalance_freq="ME", sector_map={"A": "Energy", "B": "Energy", "C": "Financials"})
+    np.testing.assert_array_equal(seen[0], [[1, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])  # D is Unknown
+
+    fundamentals = PointInTimeFundamentals.from_frame(pd.DataFrame({
+        "Ticker": ["A", "B", "B"], "ROE": [1.0, 2.0, 3.0], "Sector": ["Energy", "Energy", "Utilities"],
+        "Available Date": ["2021-01-04", "2021-01-04", "2021-06-01"],
+    }), ["ROE"])
+    seen.clear()
+    backtest_portfolio(prices, weight_fn, rebalance_freq="ME", fundamentals=fundamentals,
+                       factors=[{"column": "ROE", "weight": 1.0}])
+    np.testing.assert_array_equal(seen[0], [[1, 0, 0, 0], [0, 0, 1, 1], [0, 1, 0, 0]])
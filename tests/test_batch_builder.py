@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.alignment import align_prices, mask_weights
+from src.backtester import backtest_portfolio
+from src.batch_builder import build_indices
+
+
+@pytest.fixture
+def fundamentals_csv(tmp_path):
+    frame = pd.DataFrame({
+        "Ticker": ["AAA", "BBB", "CCC", "DDD", "EEE", "FFF"],
+        "ROE": [20.0, 15.0, 30.0, 8.0, 12.0, 25.0],
+        "PE": [15.0, 22.0, 18.0, 9.0, 40.0, 30.0],
+        "DE": [0.5, 1.2, 0.8, 0.4, 0.3, 2.0],
+        "Mcap": [900.0, 300.0, 2_000.0, 150.0, 400.0, 250.0],
+    })
+    path = tmp_path / "fundamentals.csv"
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def fetch(tickers, start, end):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(start, end, inclusive="left")
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), len(tickers))), axis=0)),
+                          index=dates, columns=list(tickers))
+    # CCC lists late, so the first rebalances cannot hold it
+    if "CCC" in prices:
+        prices.iloc[:70, prices.columns.get_loc("CCC")] = np.nan
+    return prices
+
+
+@pytest.mark.parametrize("strategy", ["Equal", "Market Cap"])
+def test_indices_match_the_backtester_under_gaps(fundamentals_csv, strategy):
+    definition = {"name": "idx", "top_n": 5, "weight_strategy": strategy, "max_weight": 0.3, "rebalance_freq": "ME"}
+    result = build_indices([definition], fundamentals_csv, "2023-01-01", "2023-12-31", fetch_fn=fetch)
+
+    target = result["weights"].loc["idx"]
+    prices = align_prices(fetch(list(target.index), pd.Timestamp("2023-01-01"), pd.Timestamp("2023-12-31")))
+    expected, weights = backtest_portfolio(
+        prices, lambda scores, sector_matrix, valid: mask_weights(target.to_numpy(), valid, 0.3), rebalance_freq="ME")
+    assert all(w.max() <= 0.3 + 1e-12 for w in weights.values())
+    np.testing.assert_allclose(result["returns"]["idx"].to_numpy(), expected.to_numpy(), rtol=0, atol=1e-14)
+
+
+def test_mean_variance_weights_only_use_past_returns(fundamentals_csv, monkeypatch):
+    definition = {"name": "mv", "top_n": 5, "weight_strategy": "Mean-Variance", "max_weight": 0.4,
+                  "rebalance_freq": "ME"}
+    cutoff = pd.Timestamp("2023-09-01")
+
+    def shocked(tickers, start, end):
+        # Same history up to the cutoff, a different future after it
+        prices = fetch(tickers, start, end)
+        after = prices.index >= cutoff
+        noise = np.random.default_rng(1).normal(0, 0.03, (after.sum(), len(tickers)))
+        prices.loc[after] *= np.exp(np.cumsum(noise, axis=0))
+        return prices
+
+    def run(fetch_fn):
+        seen = []
+
+        def record(expected_returns, covariance_matrix, max_weight=0.6):
+            seen.append(covariance_matrix.copy())
+            return np.full(len(expected_returns), 1 / len(expected_returns))
+
+        monkeypatch.setattr("src.batch_builder.optimize_weights", record)
+        build_indices([definition], fundamentals_csv, "2023-01-01", "2023-12-31", fetch_fn=fetch_fn)
+        return seen
+
+    base, other = run(fetch), run(shocked)
+    # Rebalances at the ends of February to August only see returns before the cutoff
+    assert len(base) == len(other) == 11
+    for before, after in zip(base[:7], other[:7]):
+        np.testing.assert_allclose(after, before, rtol=0, atol=1e-15)
+    assert not np.allclose(base[-1], other[-1])
+
+
+def test_definition_with_no_eligible_security(fundamentals_csv):
+    definitions = [{"name": "all", "top_n": 5, "weight_strategy": "Equal"},
+                   {"name": "none", "top_n": 5, "weight_strategy": "Equal", "screening": {"min_mcap": 1e12}}]
+    result = build_indices(definitions, fundamentals_csv, "2023-01-01", "2023-12-31", fetch_fn=fetch)
+    assert result["selections"]["none"].empty
+    assert result["returns"]["none"].isna().all() and result["returns"]["all"].notna().any()
+    assert (result["weights"].loc["none"] == 0).all()
+    with pytest.raises(ValueError, match="No index definition has any eligible security"):
+        build_indices(definitions[1:], fundamentals_csv, "2023-01-01", "2023-12-31", fetch_fn=fetch)
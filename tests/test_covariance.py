@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from sklearn.covariance import ledoit_wolf
+
+from src.covariance import EWMACovariance, FactorModelCovariance, LedoitWolfCovariance, SampleCovariance
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    # A common factor plus noise, with fewer days than assets in the last window
+    market = rng.normal(0, 0.01, (200, 1))
+    return market * rng.uniform(0.5, 1.5, 80) + rng.normal(0, 0.02, (200, 80))
+
+
+def test_ledoit_wolf_matches_sklearn(returns):
+    for window in (40, 120):
+        estimator = LedoitWolfCovariance(returns.shape[1], window=window).fit(returns)
+        expected, shrinkage = ledoit_wolf(returns[-window:])
+        assert estimator.shrinkage()[0] == pytest.approx(shrinkage, rel=1e-10)
+        np.testing.assert_allclose(estimator.covariance(), expected, rtol=0, atol=1e-14)
+
+
+def test_rolling_updates_match_a_refit(returns):
+    for estimator_class in (SampleCovariance, LedoitWolfCovariance, EWMACovariance, FactorModelCovariance):
+        rolled = estimator_class(returns.shape[1], window=50)
+        for row in returns[:130]:
+            rolled.update(row)
+        refit = estimator_class(returns.shape[1], window=50).fit(returns[:130])
+        np.testing.assert_allclose(rolled.covariance(), refit.covariance(), rtol=0, atol=1e-13,
+                                   err_msg=estimator_class.__name__)
+
+
+def test_sample_covariance_matches_numpy(returns):
+    estimator = SampleCovariance(returns.shape[1], window=63).fit(returns)
+    np.testing.assert_allclose(estimator.covariance(), np.cov(returns[-63:], rowvar=False), rtol=0, atol=1e-15)
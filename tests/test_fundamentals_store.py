@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.fundamentals_store import PointInTimeFundamentals
+
+
+@pytest.fixture
+def records():
+    # Quarterly reports for three tickers; BBB restates its 2023-03-31 report in July
+    return pd.DataFrame({
+        "Ticker": ["BBB", "AAA", "AAA", "BBB", "BBB", "AAA", "CCC", "BBB"],
+        "Report Date": ["2023-03-31", "2023-03-31", "2023-06-30", "2023-06-30", "2023-03-31", "2023-09-30",
+                        "2023-06-30", "2023-09-30"],
+        "Available Date": ["2023-05-10", "2023-05-02", "2023-08-01", "2023-08-08", "2023-07-20", "2023-11-01",
+                           "2023-08-15", "2023-11-07"],
+        "ROE": [10.0, 20.0, 21.0, 12.0, 9.0, 22.0, 5.0, 13.0],
+        "PE": [15.0, 30.0, 31.0, 16.0, 14.0, 29.0, np.nan, 17.0],
+        "Sector": ["Energy", "Financials", "Financials", "Energy", "Energy", "Financials", "Utilities", "Utilities"],
+    })
+
+
+def loop_asof(records, dates, tickers, columns, max_age_days=None):
+    # Reference: scan every record for every (date, ticker)
+    available = pd.to_datetime(records["Available Date"])
+    out = np.full((len(dates), len(tickers), len(columns)), np.nan)
+    for d, date in enumerate(pd.to_datetime(dates)):
+        for n, ticker in enumerate(tickers):
+            visible = records[(records["Ticker"] == ticker) & (available <= date)]
+            if visible.empty:
+                continue
+            latest = visible.loc[available[visible.index].sort_values(kind="stable").index[-1]]
+            if max_age_days is None or (date - pd.Timestamp(latest["Available Date"])).days <= max_age_days:
+                out[d, n] = latest[columns].to_numpy(dtype=float)
+    return out
+
+
+DATES = ["2023-01-31", "2023-05-02", "2023-05-31", "2023-07-20", "2023-07-31", "2023-08-31", "2023-12-31"]
+TICKERS = ["CCC", "AAA", "ZZZ", "BBB"]
+
+
+def test_asof_matches_the_record_scan(records):
+    store = PointInTimeFundamentals.from_frame(records, ["ROE", "PE"])
+    np.testing.assert_array_equal(store.asof(DATES, TICKERS), loop_asof(records, DATES, TICKERS, ["ROE", "PE"]))
+    np.testing.assert_array_equal(store.asof(DATES, TICKERS, ["PE"], max_age_days=60),
+                                  loop_asof(records, DATES, TICKERS, ["PE"], max_age_days=60))
+
+
+def test_restatements_only_show_from_their_publication(records):
+    store = PointInTimeFundamentals.from_frame(records, ["ROE"])
+    bbb = store.asof(["2023-07-19", "2023-07-20", "2023-08-08"], ["BBB"])[:, 0, 0]
+    # The original 10.0, the restated 9.0, then the next quarter
+    np.testing.assert_array_equal(bbb, [10.0, 9.0, 12.0])
+    assert store.sectors == {"AAA": "Financials", "BBB": "Utilities", "CCC": "Utilities"}
+
+
+def test_saved_store_loads_memory_mapped(records, tmp_path):
+    store = PointInTimeFundamentals.from_frame(records, ["ROE", "PE"])
+    store.save(str(tmp_path / "store"))
+    loaded = PointInTimeFundamentals.load(str(tmp_path / "store"), columns=["PE"])
+    assert isinstance(loaded._values["PE"], np.memmap)
+    np.testing.assert_array_equal(loaded.asof(DATES, TICKERS), store.asof(DATES, TICKERS, ["PE"]))
+    assert loaded.sectors == store.sectors
+
+    lagged = PointInTimeFundamentals.from_frame(records.drop(columns="Available Date"), ["ROE"], publication_lag_days=45)
+    expected = records.assign(**{"Available Date": pd.to_datetime(records["Report Date"]) + pd.Timedelta(days=45)})
+    np.testing.assert_array_equal(lagged.asof(DATES, TICKERS), loop_asof(expected, DATES, TICKERS, ["ROE"]))
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.index_calculator import IndexCalculator
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    levels = 50 * np.exp(np.cumsum(rng.normal(0, 0.01, (40, 3)), axis=0))
+    return pd.DataFrame(levels, index=pd.bdate_range("2024-01-02", periods=40), columns=["AAA", "BBB", "CCC"])
+
+
+@pytest.fixture
+def rebalances(prices):
+    return {prices.index[0]: np.array([0.5, 0.3, 0.2]), prices.index[20]: np.array([0.2, 0.2, 0.6])}
+
+
+def test_levels_follow_the_drifting_portfolio(prices, rebalances):
+    _, levels = IndexCalculator.from_history(prices, rebalances)
+    # Reference: the level grows with the value of the shares bought at each rebalance close
+    expected = []
+    shares = None
+    for row, date in enumerate(prices.index):
+        closes = prices.iloc[row].to_numpy()
+        level = 1000.0 if shares is None else shares @ closes
+        if date in rebalances:
+            shares = level * rebalances[date] / closes
+        expected.append(level)
+    np.testing.assert_allclose(levels.to_numpy(), expected, rtol=1e-13)
+
+
+def test_incremental_levels_equal_the_full_recompute(prices, rebalances, tmp_path):
+    actions = {prices.index[30]: [{"ticker": "BBB", "type": "split", "ratio": 2}]}
+    split = prices.copy()
+    split.loc[prices.index[30]:, "BBB"] /= 2
+    _, full = IndexCalculator.from_history(split, rebalances, actions)
+
+    calc, _ = IndexCalculator.from_history(split.iloc[:10], rebalances)
+    path = str(tmp_path / "state.json")
+    for date, closes in split.iloc[10:].iterrows():
+        # Persist and reload every day, as the daily job does
+        calc.save(path)
+        calc = IndexCalculator.load(path)
+        if date in rebalances:
+            calc.schedule_rebalance(rebalances[date], date)
+        calc.advance(date, closes, actions.get(date, ()))
+        assert calc.level == full[date]
+
+
+def test_split_does_not_move_the_level(prices, rebalances):
+    actions = {prices.index[30]: [{"ticker": "BBB", "type": "split", "ratio": 2}]}
+    split = prices.copy()
+    split.loc[prices.index[30]:, "BBB"] /= 2
+    _, unsplit_levels = IndexCalculator.from_history(prices, rebalances)
+    _, split_levels = IndexCalculator.from_history(split, rebalances, actions)
+    np.testing.assert_allclose(split_levels.to_numpy(), unsplit_levels.to_numpy(), rtol=1e-13)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+from src.data_utils import get_sector_matrix
+from src.optimizer import MeanVarianceOptimizer, optimize_weights
+
+
+def reference_weights(expected_returns, covariance, max_weight, sector_matrix=None, sector_cap=None):
+    # Reference: the same mean-variance problem solved with SLSQP
+    n = len(expected_returns)
+    constraints = [{"type": "eq", "fun": lambda w: w.sum() - 1}]
+    if sector_matrix is not None:
+        constraints.append({"type": "ineq", "fun": lambda w: sector_cap - sector_matrix @ w})
+    result = minimize(lambda w: 0.1 * w @ covariance @ w - expected_returns @ w, np.full(n, 1 / n),
+                      jac=lambda w: 0.2 * covariance @ w - expected_returns, bounds=[(0, max_weight)] * n,
+                      constraints=constraints, method="SLSQP", options={"ftol": 1e-14, "maxiter": 1_000})
+    assert result.success
+    return result.x
+
+
+@pytest.fixture
+def problem():
+    rng = np.random.default_rng(0)
+    n = 8
+    # Risk on the scale of the scores, so the covariance matters
+    loadings = rng.normal(0, 1, (12, n))
+    return rng.normal(0.5, 0.3, n), loadings.T @ loadings / 4 + np.diag(rng.uniform(1, 4, n))
+
+
+def test_optimizer_matches_the_reference(problem):
+    expected_returns, covariance = problem
+    expected = reference_weights(expected_returns, covariance, 0.3)
+    np.testing.assert_allclose(optimize_weights(expected_returns, covariance, max_weight=0.3), expected, atol=1e-4)
+
+    optimizer = MeanVarianceOptimizer(len(expected_returns))
+    np.testing.assert_allclose(optimizer.solve(expected_returns, covariance, max_weight=0.3), expected, atol=1e-4)
+    # Warm-started solves with new data agree with a fresh problem
+    shifted = expected_returns[::-1].copy()
+    np.testing.assert_allclose(optimizer.solve(shifted, covariance, max_weight=0.3),
+                               reference_weights(shifted, covariance, 0.3), atol=1e-4)
+    assert optimizer.summary()["solves"] == 2
+
+
+def test_sector_caps_bind_as_in_the_reference(problem):
+    expected_returns, covariance = problem
+    sector_matrix = get_sector_matrix(list("ABCDEFGH"), {"A": "Energy", "E": "Energy", "F": "Financials", "G": "Energy"})
+    uncapped = sector_matrix @ optimize_weights(expected_returns, covariance, max_weight=0.3)
+    assert uncapped.max() > 0.45, "the cap below should bind"
+
+    expected = reference_weights(expected_returns, covariance, 0.3, sector_matrix.toarray(), 0.45)
+    weights = optimize_weights(expected_returns, covariance, max_weight=0.3, sector_matrix=sector_matrix, sector_cap=0.45)
+    np.testing.assert_allclose(weights, expected, atol=1e-4)
+    assert (sector_matrix @ weights).max() <= 0.45 + 1e-6
+
+    optimizer = MeanVarianceOptimizer(len(expected_returns), sector_matrix=sector_matrix)
+    np.testing.assert_allclose(optimizer.solve(expected_returns, covariance, max_weight=0.3, sector_cap=0.45),
+                               expected, atol=1e-4)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.price_cache import load_cached_prices, refresh_cache
+
+
+@pytest.fixture
+def source():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2024-01-01", "2024-12-31")
+    prices = pd.DataFrame(100 + rng.normal(0, 1, (len(dates), 2)).cumsum(axis=0), index=dates, columns=["AAA", "BBB"])
+    calls = []
+
+    def fetch(tickers, start, end):
+        calls.append((tuple(tickers), start, end))
+        return prices.loc[start:end - pd.Timedelta(days=1), list(tickers)]
+
+    return prices, fetch, calls
+
+
+def test_second_refresh_only_fetches_the_missing_tail(source, tmp_path):
+    prices, fetch, calls = source
+    refresh_cache(["AAA", "BBB"], "2024-01-01", "2024-07-01", fetch, cache_dir=str(tmp_path))
+    refresh_cache(["AAA", "BBB"], "2024-03-01", "2024-10-01", fetch, cache_dir=str(tmp_path))
+    # Covered up to the day after the last close returned (Friday 2024-06-28)
+    assert calls[1] == (("AAA", "BBB"), pd.Timestamp("2024-06-29"), pd.Timestamp("2024-10-01"))
+    loaded = load_cached_prices(["AAA", "BBB"], "2024-01-01", "2024-10-01", cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(loaded, prices.loc["2024-01-01":"2024-09-30"], check_names=False, check_freq=False,
+                                  check_index_type=False)
+
+
+def test_disjoint_request_fetches_the_gap_too(source, tmp_path):
+    prices, fetch, calls = source
+    refresh_cache(["AAA"], "2024-01-01", "2024-03-01", fetch, cache_dir=str(tmp_path))
+    refresh_cache(["AAA"], "2024-09-01", "2024-10-01", fetch, cache_dir=str(tmp_path))
+    # The cached range stays contiguous: the request is extended back to where the cache ends
+    assert calls[1] == (("AAA",), pd.Timestamp("2024-03-01"), pd.Timestamp("2024-10-01"))
+    loaded = load_cached_prices(["AAA"], "2024-01-01", "2024-10-01", cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(loaded, prices.loc["2024-01-01":"2024-09-30", ["AAA"]], check_names=False,
+                                  check_freq=False, check_index_type=False)
+
+
+def test_tickers_the_source_does_not_return_are_retried(source, tmp_path):
+    prices, fetch, calls = source
+    refresh_cache(["AAA", "ZZZ"], "2024-01-01", "2024-02-01", lambda t, s, e: fetch([x for x in t if x != "ZZZ"], s, e),
+                  cache_dir=str(tmp_path))
+    entries = refresh_cache(["AAA", "ZZZ"], "2024-01-01", "2024-02-01", lambda t, s, e: prices.loc[[], []],
+                            cache_dir=str(tmp_path))
+    assert entries["ZZZ"] is None and entries["AAA"] is not None
+
+
+def test_range_past_the_last_close_is_fetched_again(source, tmp_path):
+    prices, fetch, calls = source
+    # The source only has closes up to 2024-06-28 on the first run, as if that were today
+    published = {"until": pd.Timestamp("2024-06-28")}
+
+    def live_fetch(tickers, start, end):
+        return fetch(tickers, start, min(end, published["until"] + pd.Timedelta(days=1)))
+
+    refresh_cache(["AAA"], "2024-01-01", "2025-01-01", live_fetch, cache_dir=str(tmp_path))
+    published["until"] = pd.Timestamp("2024-07-31")
+    entries = refresh_cache(["AAA"], "2024-01-01", "2025-01-01", live_fetch, cache_dir=str(tmp_path))
+    assert calls[1][1] == pd.Timestamp("2024-06-29")
+    assert entries["AAA"]["dates"][-1] == np.datetime64("2024-07-31")
+    assert entries["AAA"]["covered_end"] == np.datetime64("2024-08-01")
+
+
+def test_covered_range_never_reaches_past_today(tmp_path):
+    today = pd.Timestamp.today().normalize()
+    dates = pd.bdate_range(today - pd.Timedelta(days=30), today + pd.Timedelta(days=30))
+    # A source that (wrongly) returns future rows must not mark the future as fetched
+    fetch = lambda tickers, start, end: pd.DataFrame(1.0, index=dates, columns=list(tickers)).loc[start:end]
+    entries = refresh_cache(["AAA"], today - pd.Timedelta(days=30), today + pd.Timedelta(days=365), fetch,
+                            cache_dir=str(tmp_path))
+    assert entries["AAA"]["covered_end"] <= np.datetime64(today.date(), "D")
+
+
+def test_all_nan_columns_are_not_cached(source, tmp_path):
+    prices, fetch, calls = source
+    # yfinance returns failed downloads as all-NaN columns
+    failed = lambda tickers, start, end: fetch(tickers, start, end).assign(BBB=np.nan)
+    entries = refresh_cache(["AAA", "BBB"], "2024-01-01", "2024-02-01", failed, cache_dir=str(tmp_path))
+    assert entries["BBB"] is None
+    refresh_cache(["AAA", "BBB"], "2024-01-01", "2024-02-01", fetch, cache_dir=str(tmp_path))
+    assert calls[-1][0] == ("BBB",)
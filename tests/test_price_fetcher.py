@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from src.price_fetcher import fmp_price_data
+
+HISTORY = {
+    "AAA": [{"date": "2024-01-03", "close": 11.0}, {"date": "2024-01-02", "close": 10.0}],
+    "BBB": [{"date": "2024-01-02", "close": 20.0}, {"date": "2024-01-03", "close": 21.0}],
+    "FLAKY": [{"date": "2024-01-02", "close": 5.0}],
+}
+
+
+@pytest.fixture
+def stub_fmp():
+    state = {"requests": {}, "calls": 0, "in_flight": 0, "max_in_flight": 0, "history": dict(HISTORY), "latency": 0.0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            tickers = urlparse(self.path).path.rsplit("/", 1)[-1].split(",")
+            with lock:
+                state["calls"] += 1
+                for ticker in tickers:
+                    state["requests"][ticker] = state["requests"].get(ticker, 0) + 1
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            try:
+                time.sleep(state["latency"])
+                if "FLAKY" in tickers and state["requests"]["FLAKY"] == 1:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                # Like FMP: unknown symbols are left out, one symbol is not wrapped in a list
+                records = [{"symbol": t, "historical": state["history"][t]} for t in tickers if t in state["history"]]
+                if len(tickers) > 1:
+                    payload = {"historicalStockList": records}
+                else:
+                    payload = records[0] if records else {}
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with lock:
+                    state["in_flight"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("batch_size, missing", [(1, "Data not available"), (2, "No data returned")])
+def test_fmp_price_data_against_stub_server(stub_fmp, batch_size, missing):
+    base_url, state = stub_fmp
+    prices, failures = fmp_price_data(["AAA", "BBB", "FLAKY", "MISSING"], "2024-01-01", "2024-01-04", api_key="test",
+                                      base_url=base_url, batch_size=batch_size, max_workers=2,
+                                      requests_per_second=100, backoff=0.01)
+
+    assert list(prices.columns) == ["AAA", "BBB", "FLAKY"]
+    assert prices["AAA"].tolist() == [10.0, 11.0]
+    assert prices["BBB"].tolist() == [20.0, 21.0]
+    # Retryable status codes are retried (with the rest of their batch), missing data is not
+    assert state["requests"]["FLAKY"] == 2
+    assert failures == {"MISSING": missing}
+    assert state["requests"]["MISSING"] == batch_size
+    assert state["max_in_flight"] <= 2
+
+
+def test_full_refresh_with_default_limits_takes_seconds(stub_fmp):
+    base_url, state = stub_fmp
+    tickers = [f"T{i:03d}" for i in range(500)]
+    state["history"].update({t: HISTORY["BBB"] for t in tickers})
+    state["latency"] = 0.05
+    started = time.perf_counter()
+    prices, failures = fmp_price_data(tickers, "2024-01-01", "2024-01-04", api_key="test", base_url=base_url)
+    elapsed = time.perf_counter() - started
+
+    assert not failures and list(prices.columns) == tickers
+    assert state["calls"] == 100 and state["max_in_flight"] <= 8
+    # One ticker per call at 5 calls/s took 100 s
+    assert elapsed < 10
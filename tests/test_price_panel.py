@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.price_panel import PricePanel, import_prices
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    levels = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (60, 5)), axis=0))
+    return pd.DataFrame(levels, index=pd.bdate_range("2024-01-02", periods=60), columns=list("ABCDE"))
+
+
+def test_slices_match_pandas_selection(prices, tmp_path):
+    panel = PricePanel.from_frame(prices, str(tmp_path / "panel"), dtype=np.float64)
+    # Index resolution differs between pandas versions; the dates themselves must match
+    pd.testing.assert_frame_equal(panel.to_frame(), prices.rename_axis("Date"), check_freq=False,
+                                  check_index_type=False)
+
+    for tickers in (["B", "C", "D"], ["E", "A", "C"], None):
+        sub = panel.slice("2024-01-10", "2024-02-15", tickers)
+        expected = prices.loc["2024-01-10":"2024-02-15", tickers if tickers else slice(None)]
+        pd.testing.assert_frame_equal(sub.to_frame(), expected.rename_axis("Date"), check_freq=False,
+                                      check_index_type=False)
+        np.testing.assert_allclose(sub.returns(), expected.pct_change().to_numpy()[1:], rtol=1e-12)
+    # Adjacent tickers stay a view of the memory map
+    assert np.shares_memory(panel.slice(tickers=["B", "C"]).to_numpy(), panel.values)
+    with pytest.raises(KeyError, match="ZZZ"):
+        panel.slice(tickers=["A", "ZZZ"])
+
+
+def test_streamed_csv_import_matches_read_csv(prices, tmp_path):
+    # Rows out of date order and split across chunks
+    shuffled = prices.sample(frac=1, random_state=0)
+    source = tmp_path / "prices.csv"
+    shuffled.to_csv(source, index_label="Date")
+    panel = import_prices(str(source), str(tmp_path / "panel"), dtype=np.float64, chunksize=7)
+    expected = pd.read_csv(source, index_col=0, parse_dates=True).sort_index()
+    pd.testing.assert_frame_equal(panel.to_frame(), expected, check_freq=False, check_names=False,
+                                  check_index_type=False)
+
+    single = import_prices(str(source), str(tmp_path / "single"), dtype=np.float32)
+    np.testing.assert_allclose(single.to_numpy(), expected.to_numpy(), rtol=1e-6)
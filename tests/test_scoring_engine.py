@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.scoring_engine import compute_scores, score_panel, score_stocks, top_k
+
+FACTORS = [
+    {"column": "ROE", "weight": 0.5, "direction": 1, "normalization": "rank"},
+    {"column": "PE", "weight": 0.3, "direction": 1, "invert": True, "normalization": "zscore"},
+    {"column": "DE", "weight": 0.2, "direction": -1, "normalization": "minmax"},
+]
+
+
+def loop_scores(frame, factors):
+    # Reference: one factor and one security at a time
+    score = np.zeros(len(frame))
+    for factor in factors:
+        x = frame[factor["column"]].to_numpy(dtype=float)
+        if factor.get("invert"):
+            x = np.array([1 / v if v > 0 else np.nan for v in x])
+        x = factor.get("direction", 1) * x
+        present = x[~np.isnan(x)]
+        norm = np.full(len(x), np.nan)
+        for i, v in enumerate(x):
+            if np.isnan(v):
+                continue
+            if factor["normalization"] == "minmax":
+                span = present.max() - present.min()
+                norm[i] = (v - present.min()) / span if span > 0 else 0.0
+            elif factor["normalization"] == "zscore":
+                norm[i] = (v - present.mean()) / present.std() if present.std() > 0 else 0.0
+            else:
+                norm[i] = np.sum(present < v) / (len(present) - 1) if len(present) > 1 else 0.0
+        worst = np.nanmin(norm) if len(present) else 0.0
+        score += factor["weight"] * np.where(np.isnan(norm), worst, norm)
+    return score
+
+
+@pytest.fixture
+def snapshot():
+    return pd.DataFrame({
+        "Ticker": ["A", "B", "C", "D", "E", "F"],
+        "ROE": [12.0, np.nan, 30.0, 5.0, 18.0, 25.0],
+        "PE": [15.0, 22.0, -4.0, 9.0, np.nan, 30.0],
+        "DE": [0.5, 1.2, 0.8, np.nan, 0.3, 2.0],
+    })
+
+
+def test_scores_match_the_per_security_reference(snapshot):
+    np.testing.assert_allclose(compute_scores(snapshot[["ROE", "PE", "DE"]].to_numpy(), FACTORS),
+                               loop_scores(snapshot, FACTORS), rtol=1e-12)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_all_missing_cross_section_scores_zero(snapshot):
+    for normalization in ("minmax", "zscore", "rank", "winsorized"):
+        factors = [dict(FACTORS[0], normalization=normalization), FACTORS[1]]
+        values = snapshot[["ROE", "PE"]].to_numpy(copy=True)
+        values[:, 0] = np.nan
+        with np.errstate(all="ignore"):
+            scores = compute_scores(values, factors)
+        assert np.isfinite(scores).all(), normalization
+        np.testing.assert_allclose(scores, compute_scores(values[:, 1:], factors[1:]))
+
+
+def test_score_stocks_ranks_best_first_without_modifying_input(snapshot):
+    before = snapshot.copy()
+    top = score_stocks(snapshot, FACTORS, top_n=3)
+    pd.testing.assert_frame_equal(snapshot, before)
+    expected = np.argsort(-loop_scores(snapshot, FACTORS), kind="stable")[:3]
+    assert top["Ticker"].tolist() == snapshot["Ticker"].iloc[expected].tolist()
+    assert list(top_k(np.array([3.0, 1.0, 2.0]), 2)) == [0, 2]
+
+
+def test_score_panel_matches_scoring_each_date(snapshot):
+    later = snapshot.assign(ROE=snapshot["ROE"] * 1.1, PE=snapshot["PE"][::-1].to_numpy()).iloc[1:]
+    panel = pd.concat([snapshot.assign(Date="2024-03-31"), later.assign(Date="2024-06-30")], ignore_index=True)
+    scores = score_panel(panel, FACTORS)
+    for _, rows in panel.groupby("Date"):
+        np.testing.assert_allclose(scores[rows.index].to_numpy(), loop_scores(rows, FACTORS), rtol=1e-12)
+
+
+def test_empty_universe_scores_to_an_empty_frame(snapshot):
+    empty = snapshot.iloc[:0]
+    top = score_stocks(empty, FACTORS, top_n=3)
+    assert top.empty and list(top.columns) == list(snapshot.columns) + ["Score"]
+    assert compute_scores(np.empty((0, 3)), FACTORS).shape == (0,)
+    assert compute_scores(np.empty((2, 0, 3)), FACTORS).shape == (2, 0)
+    assert top_k(np.empty(0), 5).shape == (0,)
+    assert top_k(np.array([1.0, 2.0]), 0).shape == (0,)
+    assert score_panel(empty.assign(Date=pd.Series(dtype=object)), FACTORS).empty
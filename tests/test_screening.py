@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.scoring_engine import DEFAULT_FACTORS, score_stocks
+from src.screening import exclusion_reasons, screen_universe
+
+FILTERS = {"min_mcap": 1_000, "min_free_float": 0.2, "min_listing_days": 365, "excluded_sectors": ["Utilities"]}
+AS_OF = "2024-06-30"
+
+
+@pytest.fixture
+def fundamentals_csv(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 40
+    frame = pd.DataFrame({
+        "Ticker": [f"T{i:02d}" for i in range(n)],
+        "ROE": rng.normal(15, 8, n),
+        "PE": rng.normal(20, 10, n),   # some negative: missing after inversion
+        "DE": rng.uniform(0.1, 2.0, n),
+        "Mcap": rng.uniform(200, 5_000, n),
+        "FF": rng.uniform(0.05, 1.0, n),
+        "Listing Date": rng.choice(["2010-01-04", "2024-03-01"], n, p=[0.85, 0.15]),
+        "Sector": rng.choice(["Information Technology", "Financials", "Utilities"], n),
+    })
+    frame.loc[[3, 17], "ROE"] = np.nan
+    frame.loc[[5], "DE"] = np.nan
+    path = tmp_path / "fundamentals.csv"
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunksize", [7, 1_000])
+def test_streamed_screen_matches_score_stocks(fundamentals_csv, chunksize):
+    top, excluded = screen_universe(fundamentals_csv, top_n=6, as_of=AS_OF, chunksize=chunksize, **FILTERS)
+
+    frame = pd.read_csv(fundamentals_csv)
+    reasons = exclusion_reasons(frame, as_of=pd.Timestamp(AS_OF), **FILTERS)
+    expected = score_stocks(frame[reasons == ""], DEFAULT_FACTORS, top_n=6)
+    assert top["Ticker"].tolist() == expected["Ticker"].tolist()
+    np.testing.assert_allclose(top["Score"].to_numpy(), expected["Score"].to_numpy(), rtol=1e-12)
+
+    filtered = dict(zip(frame["Ticker"][reasons != ""], reasons[reasons != ""]))
+    assert dict(zip(excluded["Ticker"], excluded["Reason"])) == {
+        **filtered,
+        **{t: "score outside the top 6" for t in frame["Ticker"][reasons == ""] if t not in set(top["Ticker"])},
+    }
+
+
+def test_screen_with_no_eligible_rows(fundamentals_csv):
+    top, excluded = screen_universe(fundamentals_csv, top_n=5, as_of=AS_OF, min_mcap=1e12)
+    assert top.empty and "Score" in top.columns
+    assert len(excluded) == 40
@@ -0,0 +1,66 @@
+import cvxpy as cp
+import numpy as np
+import pytest
+
+from src.data_utils import get_sector_matrix
+from src.weighting_stratergies import capped_weight, constrained_weight
+
+
+def reference_weights(base, max_weight=1.0, min_weight=0.0, sector_matrix=None, sector_cap=None):
+    # Reference: capping and pro-rata redistribution keep w / base equal among the names
+    # strictly between their bounds, which is the solution of min sum(w ** 2 / base)
+    w = cp.Variable(len(base))
+    constraints = [cp.sum(w) == 1, w >= min_weight, w <= max_weight]
+    if sector_matrix is not None:
+        constraints.append(sector_matrix @ w <= sector_cap)
+    cp.Problem(cp.Minimize(cp.sum(cp.multiply(1 / base, cp.square(w)))), constraints).solve(solver=cp.CLARABEL)
+    return w.value
+
+
+def loop_capped(weights, max_weight):
+    # Reference: cap the largest names one round at a time
+    weights = weights / weights.sum()
+    while weights.max() > max_weight + 1e-12:
+        over = weights >= max_weight
+        excess = np.sum(weights[over] - max_weight)
+        weights[over] = max_weight
+        free = ~over
+        weights[free] += excess * weights[free] / weights[free].sum()
+    return weights
+
+
+@pytest.fixture
+def base():
+    return np.random.default_rng(0).lognormal(0, 1, (4, 12))
+
+
+def test_capped_weight_matches_the_redistribution_loop(base):
+    capped = capped_weight(base / base.sum(axis=1, keepdims=True), 0.12)
+    for row, weights in zip(base, capped):
+        np.testing.assert_allclose(weights, loop_capped(row.copy(), 0.12), rtol=0, atol=1e-9)
+    with pytest.raises(ValueError, match="too small"):
+        capped_weight(base[0], 0.05)
+
+
+def test_constrained_weight_matches_the_qp(base):
+    sectors = {t: s for t, s in zip("ABCDEFGHIJKL", ["Energy"] * 5 + ["Financials"] * 4 + ["Utilities"] * 3)}
+    sector_matrix = get_sector_matrix(list("ABCDEFGHIJKL"), sectors)
+    weights = constrained_weight(base, max_weight=0.15, min_weight=0.02, sector_matrix=sector_matrix, sector_cap=0.4)
+    for row, w in zip(base, weights):
+        expected = reference_weights(row, 0.15, 0.02, sector_matrix.toarray(), 0.4)
+        np.testing.assert_allclose(w, expected, rtol=0, atol=1e-5)
+        assert w.sum() == pytest.approx(1.0)
+        assert (sector_matrix @ w).max() <= 0.4 + 1e-9
+    # Each row is weighted on its own
+    np.testing.assert_allclose(
+        constrained_weight(base[1], max_weight=0.15, min_weight=0.02, sector_matrix=sector_matrix, sector_cap=0.4),
+        weights[1], rtol=0, atol=1e-12)
+
+
+def test_liquidity_caps_and_infeasible_constraints(base):
+    liquidity = np.random.default_rng(1).lognormal(0, 1, 12)
+    weights = constrained_weight(base[0], max_weight=0.2, liquidity=liquidity, liquidity_multiple=3)
+    upper = np.minimum(0.2, 3 * liquidity / liquidity.sum())
+    np.testing.assert_allclose(weights, reference_weights(base[0], upper), rtol=0, atol=1e-5)
+    with pytest.raises(ValueError, match="infeasible"):
+        constrained_weight(base[0], max_weight=0.05)